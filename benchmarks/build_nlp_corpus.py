@@ -0,0 +1,303 @@
+"""
+Sinh bộ câu lệnh mẫu (golden corpus) cho nlp_parser: benchmarks/nlp_corpus.jsonl.
+
+    python -m benchmarks.build_nlp_corpus
+
+Mỗi câu được ghép từ các thành phần (từ kích hoạt, tên sự kiện, cụm thời gian, địa
+điểm, nhắc trước) và kết quả mong đợi được tính từ chính các thành phần đó theo ý
+nghĩa ĐÚNG của câu — không lấy từ output của parser — so với mốc giờ cố định CORPUS_NOW
+(case có trường "now" riêng thì so với mốc đó, VD các câu gõ quanh nửa đêm).
+Sinh lại được y hệt (seed cố định); đổi nội dung thì tăng CORPUS_VERSION.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from unidecode import unidecode
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(BENCH_DIR, "nlp_corpus.jsonl")
+CORPUS_VERSION = 2
+# Thứ 4, 10:00 giờ Việt Nam
+CORPUS_NOW = datetime(2025, 3, 12, 10, 0, 0)
+CORPUS_TIMEZONE = "Asia/Ho_Chi_Minh"
+CORPUS_SIZE = 3000
+SEED = 20250312
+# Tỉ lệ câu gõ không dấu
+NO_DIACRITICS_RATIO = 0.3
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+TRIGGERS = ("", "", "", "", "Nhắc tôi ", "nhắc tôi ", "Nhắc em ", "Đặt lịch ", "đặt lịch giùm ",
+            "Tạo sự kiện ", "Tôi sẽ ", "mình sẽ ")
+EVENTS = (
+    "họp nhóm", "họp giao ban", "học tiếng Anh", "học lập trình Python", "khám răng", "khám sức khỏe",
+    "đi chợ", "gặp khách hàng", "nộp báo cáo", "phỏng vấn ứng viên", "đón con", "tập gym", "chạy bộ",
+    "đá banh", "cà phê với Lan", "sinh nhật mẹ", "đám cưới anh Minh", "bảo vệ đồ án", "ôn thi cuối kỳ",
+    "đóng tiền điện", "thuyết trình", "sửa xe", "cắt tóc", "đi siêu thị", "học nhóm", "gọi điện cho bố",
+    "uống thuốc", "họp phụ huynh", "đi bơi", "tập yoga", "xem phim", "đưa bà đi khám", "nhận bưu phẩm",
+    "rút tiền", "trả sách thư viện", "học piano", "dọn nhà", "khám mắt", "chụp ảnh kỷ yếu",
+    "nộp hồ sơ xin việc", "gặp thầy hướng dẫn", "tiệc tất niên", "họp lớp", "gửi email cho sếp",
+    "làm bài tập", "đăng ký học phần", "meeting với team", "call với khách", "review code", "đi đám giỗ",
+)
+LOCATIONS = (
+    "phòng họp 3", "công ty", "nhà", "quán cà phê Highlands", "trường", "Đại học Bách khoa",
+    "bệnh viện Chợ Rẫy", "sân bóng Phú Thọ", "thư viện", "nhà văn hóa Thanh Niên", "phòng 201",
+    "Landmark 81", "chợ Bến Thành", "Vincom Đồng Khởi", "nha khoa Kim", "trung tâm VUS",
+)
+# Địa điểm có dấu phẩy: cả cụm là MỘT địa điểm
+COMMA_LOCATIONS = (
+    "268 Lý Thường Kiệt, Quận 10", "nhà hàng Hoa Sen, Quận 3", "phòng 201, tòa A",
+    "số 1 Đại Cồ Việt, Hai Bà Trưng, Hà Nội", "Vincom, 72 Lê Thánh Tôn",
+)
+LOCATION_MARKERS = ("ở", "tại")
+# (mẫu, số phút trên 1 đơn vị)
+REMINDER_FORMS = (("nhắc trước {n} phút", 1), ("nhắc trước {n}p", 1), ("nhắc trước {n} tiếng", 60),
+                  ("nhắc trước {n}h", 60), ("báo trước {n} phút", 1), ("nhac truoc {n} tieng", 60))
+REMINDER_AMOUNTS = {1: (5, 10, 15, 30, 45), 60: (1, 2)}
+WEEKDAYS = (  # (cách viết, thứ 0=Thứ 2..6=CN)
+    ("thứ 2", 0), ("thứ hai", 0), ("thứ 3", 1), ("thứ ba", 1), ("thứ 4", 2), ("thứ tư", 2),
+    ("thứ 5", 3), ("thứ năm", 3), ("thứ 6", 4), ("thứ sáu", 4), ("thứ 7", 5), ("thứ bảy", 5),
+)
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+DAYPARTS = (("sáng", 8), ("trưa", 12), ("chiều", 16), ("tối", 19))
+RELATIVE_DAYS = (("nay", 0), ("mai", 1), ("kia", 2))
+HOURS = tuple(range(6, 23))
+MINUTES = (15, 20, 30, 45, 50)
+
+# --- Kết quả mong đợi của cụm thời gian ---
+def _at(day_offset, hour, minute=0):
+    return (CORPUS_NOW + timedelta(days=day_offset)).replace(hour=hour, minute=minute, second=0)
+
+def _next_clock(hour, minute=0):
+    """Giờ chưa qua thì là hôm nay, đã qua thì ngày mai."""
+    candidate = _at(0, hour, minute)
+    return candidate if candidate >= CORPUS_NOW else candidate + timedelta(days=1)
+
+def _next_weekday(weekday):
+    """Thứ đó của tuần này nếu còn ở phía trước, trùng hôm nay thì tuần sau."""
+    return (weekday - CORPUS_NOW.weekday()) % 7 or 7
+
+def _first_weekly(weekdays, hour, minute=0):
+    for offset in range(8):
+        candidate = _at(offset, hour, minute)
+        if candidate.weekday() in weekdays and candidate >= CORPUS_NOW:
+            return candidate
+    raise AssertionError(weekdays)
+
+def _time_phrases(rng):
+    """1 cụm thời gian ngẫu nhiên -> (chuỗi, nhãn, kỳ vọng {start_time|start_date, rrule}, có 'lúc/vào' đứng đầu)."""
+    hour, minute = rng.choice(HOURS), rng.choice(MINUTES)
+    clock = _next_clock(hour)
+    clock_min = _next_clock(hour, minute)
+    weekday_text, weekday = rng.choice(WEEKDAYS)
+    part_text, part_hour = rng.choice(DAYPARTS)
+    day_text, day_offset = rng.choice(RELATIVE_DAYS)
+    evening_hour = rng.choice((6, 7, 8, 9))
+    weekday_date = _at(_next_weekday(weekday), 0)
+    choices = (
+        # (trọng số, chuỗi, nhãn, thời điểm, chỉ có ngày?, luật lặp lại, mở đầu bằng lúc/vào)
+        (10, f"lúc {hour}h", "clock_h", clock, False, None, True),
+        (6, f"{hour}h", "clock_h", clock, False, None, False),
+        (5, f"lúc {hour} giờ", "clock_gio", clock, False, None, True),
+        (4, f"vào {hour}h", "clock_h", clock, False, None, True),
+        (5, f"{hour} giờ {minute} phút", "clock_gio_phut", clock_min, False, None, False),
+        (6, f"lúc {hour}h{minute}", "clock_hm", clock_min, False, None, True),
+        (5, f"{hour}:{minute}", "clock_colon", clock_min, False, None, False),
+        (4, f"lúc {hour}:{minute}", "clock_colon", clock_min, False, None, True),
+        (4, f"{hour}h {minute}p", "clock_h_p", clock_min, False, None, False),
+        (3, f"{hour}h{minute}p", "clock_h_p", clock_min, False, None, False),
+        (6, f"{part_text} {day_text}", "daypart_day", _at(day_offset, part_hour), False, None, False),
+        (4, f"{evening_hour} giờ sáng mai", "hour_daypart_day", _at(1, evening_hour), False, None, False),
+        (4, f"{evening_hour} giờ tối mai", "hour_daypart_day", _at(1, evening_hour + 12), False, None, False),
+        (5, f"{hour}h{minute} {weekday_text}", "clock_weekday",
+         weekday_date.replace(hour=hour, minute=minute), False, None, False),
+        (5, weekday_text, "weekday", weekday_date, True, None, False),
+        (3, "cuối tuần", "weekend", _at(_next_weekday(5), 0), True, None, False),
+        (2, "cuối tuần này", "weekend", _at(_next_weekday(5), 0), True, None, False),
+        (3, f"lúc {hour}h ngày mai", "clock_tomorrow", _at(1, hour), False, None, True),
+        (2, f"{weekday_text} lúc {hour}h", "weekday_clock",
+         weekday_date.replace(hour=hour), False, None, False),
+        (3, f"mỗi {weekday_text} lúc {hour}h", "recurrence_weekday",
+         _first_weekly({weekday}, hour), False, f"FREQ=WEEKLY;BYDAY={WEEKDAY_CODES[weekday]}", False),
+        (2, f"hằng ngày lúc {hour}h", "recurrence_daily", clock, False, "FREQ=DAILY", False),
+        (1, f"mỗi ngày lúc {hour}:{minute}", "recurrence_daily", clock_min, False, "FREQ=DAILY", False),
+        (1, "mỗi cuối tuần", "recurrence_weekend", _first_weekly({5, 6}, 8), False, "FREQ=WEEKLY;BYDAY=SA,SU", False),
+        (2, f"hàng tuần vào thứ 3 và thứ 5 lúc {hour}h", "recurrence_byday",
+         _first_weekly({1, 3}, hour), False, "FREQ=WEEKLY;BYDAY=TU,TH", False),
+        (8, "", "no_time", None, False, None, False),
+    )
+    weight, text, tag, when, date_only, rrule, leading = rng.choices(choices, [c[0] for c in choices])[0]
+    expected = {"rrule": rrule}
+    if when is None:
+        expected["start_time"] = None
+    elif date_only:
+        expected["start_date"] = when.strftime("%Y-%m-%d")
+    else:
+        expected["start_time"] = when.strftime(TIME_FORMAT)
+    return text, tag, expected, leading
+
+def _location(rng):
+    if rng.random() < 0.45:
+        return None, None
+    if rng.random() < 0.2:
+        return rng.choice(COMMA_LOCATIONS), "comma_location"
+    return rng.choice(LOCATIONS), "location"
+
+def _reminder(rng):
+    if rng.random() < 0.5:
+        return "", 0
+    form, unit = rng.choice(REMINDER_FORMS)
+    amount = rng.choice(REMINDER_AMOUNTS[unit])
+    separator = rng.choice((" ", ", "))
+    return separator + form.format(n=amount), amount * unit
+
+def _capitalize(text):
+    return text[:1].upper() + text[1:]
+
+def generate_case(rng):
+    trigger = rng.choice(TRIGGERS)
+    event = rng.choice(EVENTS)
+    time_text, time_tag, expected_time, leading = _time_phrases(rng)
+    location, location_tag = _location(rng)
+    reminder_text, reminder_minutes = _reminder(rng)
+    location_text = f"{rng.choice(LOCATION_MARKERS)} {location}" if location else ""
+    tags = [time_tag]
+
+    # Thứ tự: sự kiện - thời gian - địa điểm; địa điểm trước "lúc/vào ..."; hoặc thời gian đứng đầu
+    order = rng.random()
+    if location_text and leading and order < 0.3:
+        parts = [event, location_text, time_text]
+        tags.append("location_before_time")
+    elif time_text and not location_text and not trigger and order < 0.1:
+        parts = [time_text, event]
+        tags.append("time_first")
+    else:
+        parts = [event, time_text, location_text]
+    text = trigger + " ".join(part for part in parts if part) + reminder_text
+    expected_event = event
+    if not trigger and rng.random() < 0.5:
+        text = _capitalize(text)
+        if parts[0] == event:
+            expected_event = _capitalize(event)
+    if rng.random() < 0.05:
+        text += rng.choice((".", "!", " !!"))
+
+    if location_tag:
+        tags.append(location_tag)
+    if reminder_minutes:
+        tags.append("reminder")
+    expected = {"event": expected_event, "location": location, "reminder_minutes": reminder_minutes, **expected_time}
+    if rng.random() < NO_DIACRITICS_RATIO:
+        text = unidecode(text)
+        expected["event"] = unidecode(expected["event"])
+        if location:
+            expected["location"] = unidecode(location)
+        tags.append("no_diacritics")
+    return {"text": text, "expected": expected, "tags": tags}
+
+# Các câu viết tay (gồm cả các câu mẫu cũ trong nlp_parser.__main__)
+HANDWRITTEN = (
+    ("nhắc tôi họp vào lúc 19 giờ 50 phút nhắc trước 1 phút",
+     {"event": "họp", "location": None, "reminder_minutes": 1, "start_time": "2025-03-12 19:50:00", "rrule": None}),
+    ("Nhắc tôi đi họp lúc 14h, nhắc trước 15p",
+     {"event": "đi họp", "location": None, "reminder_minutes": 15, "start_time": "2025-03-12 14:00:00", "rrule": None}),
+    ("Học bài nhắc trước 30 phút",
+     {"event": "Học bài", "location": None, "reminder_minutes": 30, "start_time": None, "rrule": None}),
+    ("Đi đá banh lúc 17h 30p",
+     {"event": "Đi đá banh", "location": None, "reminder_minutes": 0, "start_time": "2025-03-12 17:30:00", "rrule": None}),
+    ("Nhắc tôi họp nhóm lúc 14h ở phòng họp 3, nhắc trước 15 phút",
+     {"event": "họp nhóm", "location": "phòng họp 3", "reminder_minutes": 15, "start_time": "2025-03-12 14:00:00", "rrule": None}),
+    ("nhac toi hop nhom luc 14h o phong hop 3 nhac truoc 15p",
+     {"event": "hop nhom", "location": "phong hop 3", "reminder_minutes": 15, "start_time": "2025-03-12 14:00:00", "rrule": None}),
+    ("Đặt lịch khám răng lúc 9:30 sáng mai",
+     {"event": "khám răng", "location": None, "reminder_minutes": 0, "start_time": "2025-03-13 09:30:00", "rrule": None}),
+    ("học tiếng anh lúc 19h tại trung tâm VUS, nhắc trước 2h",
+     {"event": "học tiếng anh", "location": "trung tâm VUS", "reminder_minutes": 120, "start_time": "2025-03-12 19:00:00", "rrule": None}),
+    ("Họp tổ ở Phòng 201, Tòa A vào 14:30, nhắc trước 10p",
+     {"event": "Họp tổ", "location": "Phòng 201, Tòa A", "reminder_minutes": 10, "start_time": "2025-03-12 14:30:00", "rrule": None}),
+    ("họp 15h45 thứ 3",
+     {"event": "họp", "location": None, "reminder_minutes": 0, "start_time": "2025-03-18 15:45:00", "rrule": None}),
+    ("tập gym hằng ngày lúc 6h",
+     {"event": "tập gym", "location": None, "reminder_minutes": 0, "start_time": "2025-03-13 06:00:00", "rrule": "FREQ=DAILY"}),
+    ("đi chơi cuối tuần",
+     {"event": "đi chơi", "location": None, "reminder_minutes": 0, "start_date": "2025-03-15", "rrule": None}),
+    ("ăn tối với gia đình tối nay",
+     {"event": "ăn tối với gia đình", "location": None, "reminder_minutes": 0, "start_time": "2025-03-12 19:00:00", "rrule": None}),
+    ("nộp bài thứ 6 lúc 9h",
+     {"event": "nộp bài", "location": None, "reminder_minutes": 0, "start_time": "2025-03-14 09:00:00", "rrule": None}),
+    ("gặp 8 giờ sáng mai",
+     {"event": "gặp", "location": None, "reminder_minutes": 0, "start_time": "2025-03-13 08:00:00", "rrule": None}),
+)
+
+# Câu gõ quanh nửa đêm giờ địa phương (giờ UTC còn ở ngày hôm trước): (mốc now, câu, kỳ vọng)
+NEAR_MIDNIGHT = (
+    ("2025-03-12 03:00:00", "họp lúc 2:00",
+     {"event": "họp", "location": None, "reminder_minutes": 0, "start_time": "2025-03-13 02:00:00", "rrule": None}),
+    ("2025-03-12 03:00:00", "họp thứ 4",
+     {"event": "họp", "location": None, "reminder_minutes": 0, "start_date": "2025-03-19", "rrule": None}),
+    ("2025-03-12 03:00:00", "Nhắc tôi uống thuốc lúc 6h30, nhắc trước 10p",
+     {"event": "uống thuốc", "location": None, "reminder_minutes": 10, "start_time": "2025-03-12 06:30:00", "rrule": None}),
+    ("2025-03-12 03:00:00", "họp 15h45 thứ 4",
+     {"event": "họp", "location": None, "reminder_minutes": 0, "start_time": "2025-03-19 15:45:00", "rrule": None}),
+    ("2025-03-12 03:00:00", "gọi điện cho bố lúc 23:30",
+     {"event": "gọi điện cho bố", "location": None, "reminder_minutes": 0, "start_time": "2025-03-12 23:30:00", "rrule": None}),
+    ("2025-03-12 03:00:00", "chạy bộ lúc 5 giờ ở công viên Gia Định",
+     {"event": "chạy bộ", "location": "công viên Gia Định", "reminder_minutes": 0, "start_time": "2025-03-12 05:00:00", "rrule": None}),
+    ("2025-03-12 03:00:00", "học nhóm thứ 5",
+     {"event": "học nhóm", "location": None, "reminder_minutes": 0, "start_date": "2025-03-13", "rrule": None}),
+    ("2025-03-12 23:30:00", "xem bóng đá lúc 0:30",
+     {"event": "xem bóng đá", "location": None, "reminder_minutes": 0, "start_time": "2025-03-13 00:30:00", "rrule": None}),
+    ("2025-03-12 23:30:00", "họp thứ 5",
+     {"event": "họp", "location": None, "reminder_minutes": 0, "start_date": "2025-03-13", "rrule": None}),
+    ("2025-03-12 23:30:00", "chạy bộ lúc 23:45",
+     {"event": "chạy bộ", "location": None, "reminder_minutes": 0, "start_time": "2025-03-12 23:45:00", "rrule": None}),
+    ("2025-03-12 23:30:00", "gửi email cho sếp lúc 23h",
+     {"event": "gửi email cho sếp", "location": None, "reminder_minutes": 0, "start_time": "2025-03-13 23:00:00", "rrule": None}),
+    ("2025-03-12 00:10:00", "tập gym lúc 6h",
+     {"event": "tập gym", "location": None, "reminder_minutes": 0, "start_time": "2025-03-12 06:00:00", "rrule": None}),
+    ("2025-03-12 00:10:00", "họp nhóm lúc 0:05",
+     {"event": "họp nhóm", "location": None, "reminder_minutes": 0, "start_time": "2025-03-13 00:05:00", "rrule": None}),
+    ("2025-03-12 00:10:00", "đi chợ sáng mai",
+     {"event": "đi chợ", "location": None, "reminder_minutes": 0, "start_time": "2025-03-13 08:00:00", "rrule": None}),
+)
+
+def build_corpus(size=CORPUS_SIZE, seed=SEED):
+    """Danh sách case (không trùng câu), các câu viết tay đứng đầu, câu quanh nửa đêm ở cuối."""
+    cases, seen = [], set()
+    for text, expected in HANDWRITTEN:
+        cases.append({"id": f"hand-{len(cases) + 1:03d}", "text": text, "expected": expected, "tags": ["handwritten"]})
+        seen.add(text)
+    rng = random.Random(seed)
+    while len(cases) < size:
+        case = generate_case(rng)
+        if case["text"] in seen:
+            continue
+        seen.add(case["text"])
+        cases.append({"id": f"gen-{len(cases) + 1:05d}", **case})
+    for k, (now, text, expected) in enumerate(NEAR_MIDNIGHT, 1):
+        cases.append({"id": f"midnight-{k:03d}", "text": text, "now": now, "expected": expected,
+                      "tags": ["near_midnight"]})
+    return cases
+
+def write_corpus(path=CORPUS_PATH, size=CORPUS_SIZE, seed=SEED):
+    header = {"version": CORPUS_VERSION, "now": CORPUS_NOW.strftime(TIME_FORMAT), "timezone": CORPUS_TIMEZONE,
+              "seed": seed}
+    cases = build_corpus(size, seed)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for case in cases:
+            f.write(json.dumps(case, ensure_ascii=False) + "\n")
+    return len(cases)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh golden corpus cho nlp_parser.")
+    parser.add_argument("--size", type=int, default=CORPUS_SIZE)
+    parser.add_argument("--output", default=CORPUS_PATH)
+    args = parser.parse_args(argv)
+    count = write_corpus(args.output, args.size)
+    print(f"Đã ghi {count} câu vào {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Sinh file schedule.db giả lập (tên/địa điểm tiếng Việt) để đo hiệu năng khi lịch lớn dần.
+
+    python -m benchmarks.generate_calendar 100000 benchmarks/data/schedule_100000.db
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import database, settings
+
+ACTIVITIES = (
+    "Họp nhóm", "Họp giao ban", "Học tiếng Anh", "Học lập trình Python", "Khám răng", "Khám sức khỏe định kỳ",
+    "Đi chợ", "Gặp khách hàng", "Nộp báo cáo", "Phỏng vấn ứng viên", "Đón con", "Tập gym", "Chạy bộ",
+    "Đá banh", "Cà phê với bạn", "Sinh nhật mẹ", "Đám cưới Minh", "Bảo vệ đồ án", "Ôn thi cuối kỳ",
+    "Đóng tiền điện", "Thuyết trình", "Sửa xe", "Cắt tóc", "Đi siêu thị", "Học nhóm môn Cơ sở dữ liệu",
+)
+DETAILS = (
+    "", "", "", "dự án A", "với chị Lan", "với anh Tuấn", "phòng kỹ thuật", "quý 3", "lớp DCT1201",
+    "khách hàng Hòa Phát", "tuần này", "cuối tháng", "buổi 2", "online qua Zoom",
+)
+LOCATIONS = (
+    None, None, "Phòng họp 3", "Phòng họp tầng 5", "Đại học Sài Gòn", "Quận 1", "Quận Bình Thạnh",
+    "Cà phê Highlands Lê Lợi", "Nhà văn hóa Thanh Niên", "Bệnh viện Chợ Rẫy", "Chợ Bến Thành",
+    "Sân bóng Phú Thọ", "Công ty", "Nhà", "Thư viện Tổng hợp", "Landmark 81", "Hà Nội", "Đà Nẵng",
+)
+REMINDER_CHOICES = (0, 0, 0, 5, 10, 15, 15, 30, 60)
+DURATION_MINUTES = (15, 30, 45, 60, 60, 90, 120, 180)
+WEEKLY_RULES = ("FREQ=WEEKLY;BYDAY=MO", "FREQ=WEEKLY;BYDAY=TU,TH", "FREQ=DAILY", "FREQ=MONTHLY",
+                "FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=30")
+
+# Tỉ lệ chuỗi lặp lại trong lịch giả lập
+RECURRING_RATIO = 0.001
+# Số nhắc nhở để lại ở trạng thái "đến hạn" (đo đợt phát nhắc nhở đầu tiên)
+DUE_REMINDERS = 20
+# Lịch trải đều trong khoảng này quanh thời điểm sinh
+SPAN_DAYS = 730
+
+def _random_rows(count, rng, now):
+    first_day = now - timedelta(days=SPAN_DAYS // 2)
+    for _ in range(count):
+        start = first_day + timedelta(days=rng.randrange(SPAN_DAYS), hours=rng.randint(6, 21),
+                                      minutes=15 * rng.randrange(4))
+        end = start + timedelta(minutes=rng.choice(DURATION_MINUTES)) if rng.random() < 0.9 else None
+        name = f"{rng.choice(ACTIVITIES)} {rng.choice(DETAILS)}".strip()
+        rrule = rng.choice(WEEKLY_RULES) if rng.random() < RECURRING_RATIO else None
+        yield (name, start.strftime(database.DB_TIME_FORMAT), end and end.strftime(database.DB_TIME_FORMAT),
+               rng.choice(LOCATIONS), rng.choice(REMINDER_CHOICES), rrule, None)
+
+def _due_rows(rng, now):
+    """Sự kiện có giờ nhắc vừa qua (chưa nhắc) để lần kiểm tra nhắc nhở đầu tiên có việc làm."""
+    for k in range(DUE_REMINDERS):
+        start = now + timedelta(minutes=5) - timedelta(seconds=k)
+        yield (f"{rng.choice(ACTIVITIES)} (đến hạn)", start.strftime(database.DB_TIME_FORMAT), None,
+               rng.choice(LOCATIONS), 5, None, None)
+
+def generate_calendar(path, count, seed=0):
+    """
+    Tạo CSDL mới tại `path` với `count` sự kiện ngẫu nhiên (tái lập được theo `seed`),
+    ghi qua add_events_bulk như khi nhập file. Nhắc nhở đã qua được đánh dấu đã nhắc,
+    trừ DUE_REMINDERS sự kiện. Trả về số giây đã chạy.
+    """
+    started = time.perf_counter()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    database.close_all_connections()
+    database.DB_PATH = path
+    database.init_db()
+
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    database.add_events_bulk(_random_rows(count - DUE_REMINDERS if count > DUE_REMINDERS else count, rng, now))
+    conn = database.get_db_connection()
+    conn.execute("UPDATE events SET reminded = 1 WHERE rrule IS NULL AND remind_ts <= ?", (int(time.time()),))
+    conn.commit()
+    if count > DUE_REMINDERS:
+        database.add_events_bulk(_due_rows(rng, now))
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("ANALYZE")
+    database.close_all_connections()
+    return time.perf_counter() - started
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh schedule.db giả lập để đo hiệu năng.")
+    parser.add_argument("count", type=int, help="số sự kiện")
+    parser.add_argument("path", help="file CSDL cần tạo (ghi đè nếu đã có)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    # Không đụng tới settings.json thật của người dùng
+    settings.SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(args.path)), "settings.json")
+    elapsed = generate_calendar(args.path, args.count, args.seed)
+    print(f"Đã sinh {args.count} sự kiện vào {args.path} trong {elapsed:.1f} giây")
+
+if __name__ == "__main__":
+    main()
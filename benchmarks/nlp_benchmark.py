@@ -0,0 +1,228 @@
+"""
+Đo độ chính xác và tốc độ của nlp_parser trên golden corpus (benchmarks/nlp_corpus.jsonl).
+
+    python -m benchmarks.nlp_benchmark
+    python -m benchmarks.nlp_benchmark --output sau.json --baseline truoc.json --show-failures 20
+
+Báo cáo: độ chính xác theo từng trường (event/location/reminder_minutes/thời gian/rrule)
+và theo nhãn, số câu phân tích mỗi giây (không nhớ đệm / trúng nhớ đệm) và thời gian
+từng bước (unidecode, trigger, nhắc nhở, địa điểm, regex thời gian, dateparser, dọn dẹp).
+Đồng hồ được đóng băng (freezegun) tại mốc "now" của corpus (hoặc "now" riêng của từng câu).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+from freezegun import freeze_time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from core import nlp_parser, settings
+
+CORPUS_PATH = os.path.join(BENCH_DIR, "nlp_corpus.jsonl")
+FIELDS = ("event", "location", "reminder_minutes", "start_time", "rrule")
+DEFAULT_REPEAT = 5
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def load_corpus(path=CORPUS_PATH):
+    """(header, danh sách case) từ file JSONL: dòng đầu là header (version, now, timezone)."""
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        return header, [json.loads(line) for line in f if line.strip()]
+
+def _pin_timezone(name):
+    """
+    Cho giờ hệ thống và cài đặt múi giờ của lịch cùng là `name`, như máy người dùng ở VN.
+    Parser so giờ theo cả hai nên kết quả chỉ tái lập được khi chúng trùng nhau.
+    """
+    settings.SETTINGS_PATH = os.path.join(tempfile.mkdtemp(prefix="nlpbench-"), "settings.json")
+    settings.set_timezone(name)
+    if hasattr(time, "tzset"):
+        os.environ["TZ"] = name
+        time.tzset()
+    else:
+        print(f"Cảnh báo: không đặt được múi giờ hệ thống ({name}) trên nền tảng này, "
+              f"kết quả thời gian có thể lệch")
+
+# --- Độ chính xác ---
+def _field_matches(field, expected, actual):
+    if field == "start_time" and "start_date" in expected:
+        # Câu chỉ có ngày (VD "thứ 2"): chỉ so phần ngày
+        return (actual["start_time"] or "")[:10] == expected["start_date"]
+    return actual.get(field) == expected.get(field)
+
+def _expected_fields(expected):
+    return [field for field in FIELDS if field in expected or (field == "start_time" and "start_date" in expected)]
+
+def evaluate(cases, now):
+    """
+    Chạy từng câu với đồng hồ đóng băng tại `now` (hoặc "now" riêng của câu)
+    -> (kết quả, {id: [các trường sai]}).
+    """
+    groups = {}
+    for case in cases:
+        groups.setdefault(case.get("now"), []).append(case)
+    outputs = {}
+    for case_now, group in groups.items():
+        # Nhớ đệm lưu dạng tương đối nhưng vẫn xóa khi đổi mốc giờ: mỗi nhóm tự phân tích đầy đủ
+        nlp_parser.PARSE_CACHE.clear()
+        with freeze_time(datetime.strptime(case_now, TIME_FORMAT) if case_now else now):
+            for case in group:
+                outputs[case["id"]] = nlp_parser.process_nlp(case["text"])
+    failures = {}
+    for case in cases:
+        wrong = [field for field in _expected_fields(case["expected"])
+                 if not _field_matches(field, case["expected"], outputs[case["id"]])]
+        if wrong:
+            failures[case["id"]] = wrong
+    return outputs, failures
+
+def accuracy_report(cases, failures):
+    fields, tags = Counter(), Counter()
+    field_totals, tag_totals = Counter(), Counter()
+    for case in cases:
+        wrong = failures.get(case["id"], ())
+        for field in _expected_fields(case["expected"]):
+            field_totals[field] += 1
+            fields[field] += field not in wrong
+        for tag in case["tags"]:
+            tag_totals[tag] += 1
+            tags[tag] += not wrong
+    return {
+        "cases": len(cases),
+        "exact_match": round(1 - len(failures) / len(cases), 4),
+        "fields": {field: round(fields[field] / field_totals[field], 4) for field in FIELDS if field_totals[field]},
+        "tags": {tag: round(tags[tag] / tag_totals[tag], 4) for tag in sorted(tag_totals)},
+    }
+
+# --- Tốc độ ---
+def _timed_pass(texts, now):
+    started = time.perf_counter()
+    for text in texts:
+        nlp_parser.process_nlp(text, now)
+    return time.perf_counter() - started
+
+def throughput(texts, now, repeat):
+    """
+    Số câu/giây (trung vị `repeat` lượt). "uncached": xóa bộ nhớ đệm trước mỗi lượt
+    (mỗi câu phân tích đầy đủ); "cached": mọi câu đã nằm trong bộ nhớ đệm.
+    Truyền `now` thay vì đóng băng đồng hồ: freezegun làm chậm datetime và perf_counter.
+    """
+    maxsize = nlp_parser.PARSE_CACHE.maxsize
+    nlp_parser.PARSE_CACHE.maxsize = max(maxsize, len(texts))
+    try:
+        uncached = []
+        for _ in range(repeat):
+            nlp_parser.PARSE_CACHE.clear()
+            uncached.append(_timed_pass(texts, now))
+        cached = [_timed_pass(texts, now) for _ in range(repeat)]
+    finally:
+        nlp_parser.PARSE_CACHE.maxsize = maxsize
+        nlp_parser.PARSE_CACHE.clear()
+    return {
+        "uncached_per_sec": round(len(texts) / statistics.median(uncached), 1),
+        "cached_per_sec": round(len(texts) / statistics.median(cached), 1),
+        "uncached_us_per_parse": round(statistics.median(uncached) / len(texts) * 1e6, 2),
+    }
+
+def stage_breakdown(texts, now):
+    """Thời gian từng bước (1 lượt không nhớ đệm, bật StageTimer)."""
+    timer = nlp_parser.StageTimer()
+    nlp_parser.PARSE_CACHE.clear()
+    nlp_parser.set_stage_timer(timer)
+    try:
+        for text in texts:
+            nlp_parser.process_nlp(text, now)
+    finally:
+        nlp_parser.set_stage_timer(None)
+        nlp_parser.PARSE_CACHE.clear()
+    total = sum(timer.totals.values())
+    return {
+        stage: {
+            "total_ms": round(seconds * 1000, 2),
+            "us_per_parse": round(seconds / len(texts) * 1e6, 2),
+            "share": round(seconds / total, 4) if total else 0.0,
+        }
+        for stage, seconds in timer.totals.items()
+    }
+
+# --- Báo cáo ---
+def _print_report(report, cases_by_id, outputs, failures, show_failures):
+    accuracy = report["accuracy"]
+    print(f"Corpus v{report['corpus']['version']}: {accuracy['cases']} câu, đúng hoàn toàn {accuracy['exact_match']:.2%}")
+    for field, rate in accuracy["fields"].items():
+        print(f"  {field:<18} {rate:.2%}")
+    print("Theo nhãn:")
+    for tag, rate in accuracy["tags"].items():
+        print(f"  {tag:<22} {rate:.2%}")
+    speed = report["throughput"]
+    print(f"Tốc độ: {speed['uncached_per_sec']:.0f} câu/s không nhớ đệm "
+          f"({speed['uncached_us_per_parse']:.1f} µs/câu), {speed['cached_per_sec']:.0f} câu/s trúng nhớ đệm")
+    print("Thời gian từng bước (µs/câu):")
+    for stage, values in report["stages"].items():
+        print(f"  {stage:<12} {values['us_per_parse']:>9.2f}  {values['share']:>6.1%}")
+    for case_id in list(failures)[:show_failures]:
+        case = cases_by_id[case_id]
+        print(f"\n[{case_id}] {case['text']}\n  sai: {', '.join(failures[case_id])}"
+              f"\n  mong đợi: {case['expected']}\n  nhận được: {outputs[case_id]}")
+
+def _compare_baseline(report, failures, path):
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = set(baseline["failures"])
+    regressions = sorted(set(failures) - before)
+    fixed = sorted(before - set(failures))
+    ratio = report["throughput"]["uncached_per_sec"] / baseline["throughput"]["uncached_per_sec"]
+    print(f"\nSo với {path}: tốc độ x{ratio:.2f}, {len(fixed)} câu được sửa, {len(regressions)} câu mới sai")
+    for case_id in regressions[:20]:
+        print(f"  mới sai: {case_id}")
+    return regressions
+
+def run(corpus_path=CORPUS_PATH, repeat=DEFAULT_REPEAT, output=None, baseline=None, show_failures=0):
+    header, cases = load_corpus(corpus_path)
+    _pin_timezone(header["timezone"])
+    now = datetime.strptime(header["now"], TIME_FORMAT)
+    texts = [case["text"] for case in cases]
+
+    outputs, failures = evaluate(cases, now)
+    report = {
+        "metadata": {"timestamp": datetime.now().isoformat(timespec="seconds"),
+                     "python": sys.version.split()[0], "repeat": repeat},
+        "corpus": header,
+        "accuracy": accuracy_report(cases, failures),
+        "throughput": throughput(texts, now, repeat),
+        "stages": stage_breakdown(texts, now),
+        "failures": failures,
+    }
+    _print_report(report, {case["id"]: case for case in cases}, outputs, failures, show_failures)
+    regressions = _compare_baseline(report, failures, baseline) if baseline else []
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Đã ghi kết quả vào {output}")
+    return report, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Độ chính xác và tốc độ của nlp_parser trên golden corpus.")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="số lượt đo tốc độ")
+    parser.add_argument("--output", default=None, help="file JSON kết quả")
+    parser.add_argument("--baseline", default=None, help="file kết quả cũ: báo các câu mới sai và tỉ lệ tốc độ")
+    parser.add_argument("--show-failures", type=int, default=0, metavar="N", help="in N câu sai đầu tiên")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat phải >= 1")
+    _, regressions = run(args.corpus, args.repeat, args.output, args.baseline, args.show_failures)
+    # Mã thoát khác 0 khi có câu mới sai so với baseline (dùng được trong CI)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Đo hiệu năng các thao tác chính trên lịch giả lập 1k/10k/100k/1M sự kiện.
+
+    python -m benchmarks.run_benchmarks --sizes 1000,10000 --repeat 5
+    python -m benchmarks.run_benchmarks --baseline benchmarks/results/truoc.json
+
+Chạy headless (không Tk, không winsound). Mỗi (kích thước, thao tác) chạy trong 1 tiến
+trình riêng để đo được RSS đỉnh của riêng thao tác đó. Kết quả ghi ra file JSON
+(mặc định benchmarks/results/bench-<thời điểm>.json) để so sánh giữa các phiên bản.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.generate_calendar import generate_calendar
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_REPEAT = 5
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+PERCENTILES = (50, 90, 99)
+SEED = 0
+# Chênh lệch p50 so với baseline vượt ngưỡng này thì đánh dấu khi in bảng so sánh
+REGRESSION_THRESHOLD = 1.2
+
+# --- Các thao tác cần đo ---
+# Mỗi thao tác nhận thư mục tạm của tiến trình và trả về 1 con số kiểm tra
+# (số sự kiện, số byte...) để chắc hai phiên bản đang làm cùng một việc.
+def _op_get_all_events(workdir):
+    from core import database
+    return len(database.get_all_events())
+
+def _op_search_keyword(workdir):
+    from core import database
+    return len(database.search_events_advanced(keyword="họp"))
+
+def _op_search_location(workdir):
+    from core import database
+    return len(database.search_events_advanced(location="Quận 1"))
+
+def _op_search_range(workdir):
+    from core import database
+    today = datetime.now().date()
+    return len(database.search_events_advanced(from_date=str(today), to_date=str(today + timedelta(days=7))))
+
+def _prepare_reminders(workdir):
+    # check_for_reminders đánh dấu đã nhắc -> mỗi lần đo dùng 1 bản sao CSDL mới
+    from core import database
+    database.close_all_connections()
+    copy_path = os.path.join(workdir, "reminders.db")
+    shutil.copyfile(_worker_state["db_path"], copy_path)
+    database.DB_PATH = copy_path
+
+def _op_check_for_reminders(workdir):
+    from queue import Queue
+    from core.notifier import RecordingNotifier
+    from core.reminder import ReminderThread
+    queue = Queue()
+    thread = ReminderThread(queue, notifier=RecordingNotifier())
+    try:
+        thread.check_for_reminders()
+    finally:
+        thread.stop()
+    return queue.qsize()
+
+def _op_export_json(workdir):
+    from core import exporter
+    path = os.path.join(workdir, "export.json")
+    if not exporter.export_to_json(path):
+        raise RuntimeError("export_to_json thất bại")
+    return os.path.getsize(path)
+
+def _op_export_ics(workdir):
+    from core import exporter
+    path = os.path.join(workdir, "export.ics")
+    if not exporter.export_to_ics(path):
+        raise RuntimeError("export_to_ics thất bại")
+    return os.path.getsize(path)
+
+# tên -> (hàm đo, hàm chuẩn bị trước mỗi lần đo hoặc None)
+OPERATIONS = {
+    "get_all_events": (_op_get_all_events, None),
+    "search_keyword": (_op_search_keyword, None),
+    "search_location": (_op_search_location, None),
+    "search_range": (_op_search_range, None),
+    "check_for_reminders": (_op_check_for_reminders, _prepare_reminders),
+    "export_json": (_op_export_json, None),
+    "export_ics": (_op_export_ics, None),
+}
+
+# --- Đo trong tiến trình con ---
+_worker_state = {}
+
+def _peak_rss_mb():
+    """RSS đỉnh của tiến trình hiện tại (MB); None nếu hệ điều hành không hỗ trợ (Windows)."""
+    # Linux: ru_maxrss được giữ qua exec (tính cả tiến trình cha), VmHWM thì không
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _percentile(sorted_values, q):
+    """Phân vị q (0-100), nội suy tuyến tính giữa 2 mẫu gần nhất."""
+    pos = (len(sorted_values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+def _summarize(samples):
+    ordered = sorted(samples)
+    summary = {f"p{q}_ms": round(_percentile(ordered, q), 3) for q in PERCENTILES}
+    summary.update(min_ms=round(ordered[0], 3), max_ms=round(ordered[-1], 3),
+                   mean_ms=round(sum(ordered) / len(ordered), 3))
+    return summary
+
+def _measure(name, db_path, repeat):
+    """Chạy trong tiến trình con: 1 lần chạy nguội (không tính vào phân vị) + `repeat` lần đo."""
+    from core import database, settings
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    settings.SETTINGS_PATH = os.path.join(workdir, "settings.json")
+    _worker_state["db_path"] = db_path
+    operation, prepare = OPERATIONS[name]
+    rss_before = _peak_rss_mb()
+    samples = []
+    result = None
+    try:
+        # Các hàm trong core in log ra stdout; bỏ đi để không lẫn vào bảng kết quả
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeat + 1):
+                database.close_all_connections()
+                database.DB_PATH = db_path
+                if prepare is not None:
+                    prepare(workdir)
+                started = time.perf_counter()
+                result = operation(workdir)
+                samples.append((time.perf_counter() - started) * 1000)
+        database.close_all_connections()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "cold_ms": round(samples[0], 3),
+        **_summarize(samples[1:]),
+        "peak_rss_mb": _peak_rss_mb(),
+        "rss_before_mb": rss_before,
+        "result": result,
+    }
+
+# --- Chuẩn bị dữ liệu ---
+def _calendar_is_current(path, size):
+    """CSDL đã sinh còn dùng được: đủ số sự kiện và đúng phiên bản lược đồ hiện tại."""
+    from core import database
+    if not os.path.exists(path):
+        return False
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            count = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return version == len(database.MIGRATIONS) and count == size
+
+def _generate(path, size, data_dir):
+    from core import settings
+    settings.SETTINGS_PATH = os.path.join(data_dir, "settings.json")
+    with contextlib.redirect_stdout(io.StringIO()):
+        return generate_calendar(path, size, SEED)
+
+def _run_isolated(func, *args):
+    """Chạy func(*args) trong 1 tiến trình mới (spawn), để bộ nhớ của nó không tính vào lần đo khác."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(func, *args).result()
+
+def ensure_calendar(size, data_dir=DATA_DIR, regenerate=False):
+    """Đường dẫn schedule_<size>.db trong `data_dir`, sinh mới nếu chưa có hoặc đã cũ."""
+    path = os.path.join(data_dir, f"schedule_{size}.db")
+    if regenerate or not _calendar_is_current(path, size):
+        print(f"Đang sinh lịch {size} sự kiện -> {path} ...", flush=True)
+        elapsed = _run_isolated(_generate, path, size, data_dir)
+        print(f"  xong sau {elapsed:.1f} giây", flush=True)
+    return path
+
+# --- Báo cáo ---
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _metadata(repeat):
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "seed": SEED,
+    }
+
+def _load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        return {(r["size"], r["operation"]): r for r in json.load(f)["results"]}
+
+def _print_row(record, baseline):
+    line = (f"{record['size']:>8} {record['operation']:<20} {record['p50_ms']:>11.2f} {record['p90_ms']:>11.2f} "
+            f"{record['p99_ms']:>11.2f} {record['peak_rss_mb'] if record['peak_rss_mb'] is not None else '-':>9}")
+    old = baseline.get((record["size"], record["operation"])) if baseline else None
+    if old and old["p50_ms"] > 0:
+        ratio = record["p50_ms"] / old["p50_ms"]
+        line += f"  x{ratio:.2f} so với baseline" + ("  <-- CHẬM HƠN" if ratio > REGRESSION_THRESHOLD else "")
+    print(line, flush=True)
+
+def run(sizes, operations, repeat, output, data_dir=DATA_DIR, regenerate=False, baseline=None):
+    """Đo mọi (kích thước, thao tác), ghi kết quả ra `output` và trả về dict kết quả."""
+    baseline = _load_baseline(baseline) if baseline else None
+    results = []
+    print(f"{'size':>8} {'operation':<20} {'p50 (ms)':>11} {'p90 (ms)':>11} {'p99 (ms)':>11} {'RSS (MB)':>9}")
+    for size in sizes:
+        db_path = ensure_calendar(size, data_dir, regenerate)
+        for name in operations:
+            # Tiến trình riêng cho từng thao tác: RSS đỉnh không bị thao tác trước đẩy lên
+            record = {"size": size, "operation": name, **_run_isolated(_measure, name, db_path, repeat)}
+            results.append(record)
+            _print_row(record, baseline)
+    report = {"metadata": _metadata(repeat), "results": results}
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Đã ghi kết quả vào {output}")
+    return report
+
+def _csv_list(text, cast=str):
+    return [cast(item.strip()) for item in text.split(",") if item.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo hiệu năng trên lịch giả lập (headless).")
+    parser.add_argument("--sizes", type=lambda s: _csv_list(s, int), default=list(DEFAULT_SIZES),
+                        help="các kích thước lịch, VD 1000,10000 (mặc định: 1k,10k,100k,1M)")
+    parser.add_argument("--operations", type=_csv_list, default=list(OPERATIONS),
+                        help=f"các thao tác cần đo (mặc định: tất cả) — {', '.join(OPERATIONS)}")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="số lần đo mỗi thao tác")
+    parser.add_argument("--output", default=None, help="file JSON kết quả")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="thư mục chứa các schedule_<size>.db đã sinh")
+    parser.add_argument("--regenerate", action="store_true", help="sinh lại lịch giả lập kể cả khi đã có")
+    parser.add_argument("--baseline", default=None, help="file kết quả cũ để so sánh p50")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"thao tác không tồn tại: {', '.join(sorted(unknown))}")
+    if args.repeat < 1:
+        parser.error("--repeat phải >= 1")
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    run(args.sizes, args.operations, args.repeat, output, args.data_dir, args.regenerate, args.baseline)
+
+if __name__ == "__main__":
+    main()
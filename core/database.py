@@ -1,46 +1,456 @@
 import sqlite3
 import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from heapq import merge
+from itertools import islice
+from unidecode import unidecode
 
+try:
+    from .settings import USER_DOCS, APP_DATA_DIR, get_timezone, set_timezone as _save_timezone
+    from .recurrence import parse_rule, iter_occurrences, last_occurrence
+except ImportError:
+    from settings import USER_DOCS, APP_DATA_DIR, get_timezone, set_timezone as _save_timezone
+    from recurrence import parse_rule, iter_occurrences, last_occurrence
 
-# Lấy đường dẫn thư mục "Documents" của người dùng (VD: C:\Users\Quang\Documents)
-USER_DOCS = os.path.join(os.path.expanduser('~'), 'Documents')
-# Tạo một thư mục riêng cho ứng dụng
-APP_DATA_DIR = os.path.join(USER_DOCS, 'TroLyLichTrinh')
-# Tạo đường dẫn CSDL
+# Tạo đường dẫn CSDL (thư mục dữ liệu APP_DATA_DIR khai báo ở settings.py)
 DB_PATH = os.path.join(APP_DATA_DIR, 'schedule.db')
 
 # Đảm bảo thư mục 'TroLyLichTrinh' trong Documents tồn tại
 os.makedirs(APP_DATA_DIR, exist_ok=True)
 
+# --- Quản lý kết nối ---
+# Mỗi luồng (GUI, luồng nhắc nhở...) giữ MỘT kết nối dùng lại suốt vòng đời,
+# thay vì mở sqlite3.connect() mới cho từng thao tác.
+# WAL cho phép luồng nhắc nhở đọc trong khi GUI đang ghi.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",     # An toàn với WAL, giảm fsync mỗi lần commit
+    "PRAGMA cache_size = -8000",       # ~8 MB page cache
+    "PRAGMA mmap_size = 268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+# Giờ địa phương hiện tại, tính trong SQL (cùng định dạng với start_time)
+LOCAL_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')"
+# Số câu lệnh đã biên dịch (prepared statement) được sqlite3 giữ lại để dùng lại
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0  # Tăng lên mỗi lần close_all_connections() để các luồng mở lại kết nối
+
+
+def fold_text(text):
+    """Chuẩn hóa để tìm kiếm không dấu: 'Họp Đội' -> 'hop doi'."""
+    if not text:
+        return ""
+    return unidecode(text).lower()
+
+def _open_connection(path):
+    # check_same_thread=False chỉ để close_all_connections() đóng được kết nối của
+    # luồng khác lúc tắt ứng dụng; mỗi kết nối vẫn chỉ được dùng bởi luồng sở hữu.
+    conn = sqlite3.connect(path, timeout=5.0, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # Trigger của bảng FTS gọi fold_text() khi ghi vào 'events'
+    conn.create_function("fold_text", 1, fold_text, deterministic=True)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 def get_db_connection():
-    """Tạo và trả về một kết nối CSDL."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+    """Trả về kết nối CSDL dùng lại của luồng hiện tại (tạo mới nếu chưa có)."""
+    conn = getattr(_local, "conn", None)
+    if (conn is not None and _local.path == DB_PATH
+            and _local.generation == _generation):
         return conn
+    try:
+        conn = _open_connection(DB_PATH)
     except sqlite3.Error as e:
         print(f"Lỗi kết nối CSDL: {e}")
         return None
+    with _connections_lock:
+        _connections.append(conn)
+        _local.conn = conn
+        _local.path = DB_PATH
+        _local.generation = _generation
+    return conn
+
+def close_db_connection():
+    """Đóng kết nối của luồng hiện tại (gọi khi một luồng nền kết thúc)."""
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is None:
+        return
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    conn.close()
+
+def close_all_connections():
+    """Đóng mọi kết nối đang mở (gọi một lần khi tắt ứng dụng)."""
+    global _generation
+    with _connections_lock:
+        conns = list(_connections)
+        _connections.clear()
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Lỗi khi đóng kết nối CSDL: {e}")
 
-def _check_and_add_reminded_column():
-    """Tự động thêm cột 'reminded' nếu nó chưa tồn tại."""
+# --- Bản ghi sự kiện ---
+# Các cột của bảng 'events' theo đúng thứ tự trong bảng
+EVENT_COLUMNS = ("id", "event_name", "start_time", "end_time", "location", "reminder_minutes",
+                 "reminded", "remind_at", "updated_at", "created_at", "sequence", "change_seq",
+                 "start_ts", "end_ts", "remind_ts", "rrule", "exdates")
+
+def _parse_time(value):
+    """'YYYY-MM-DD HH:MM:SS' -> datetime; None nếu rỗng hoặc sai định dạng."""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(events)")
-            columns = [col['name'] for col in cursor.fetchall()]
-            
-            if 'reminded' not in columns:
-                print("--- [Database] Đang nâng cấp: Thêm cột 'reminded' ---")
-                cursor.execute("ALTER TABLE events ADD COLUMN reminded INTEGER DEFAULT 0")
-                conn.commit()
-                print("--- [Database] Nâng cấp thành công ---")
-    except sqlite3.Error as e:
-        print(f"Lỗi khi nâng cấp CSDL: {e}")
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
 
-def init_db():
-    """Khởi tạo bảng 'events' VÀ nâng cấp CSDL nếu cần."""
-    sql_create_table = """
+# Danh sách cột cho SELECT/RETURNING: luôn đúng thứ tự tham số của Event()
+EVENT_SELECT = ", ".join(EVENT_COLUMNS)
+EVENT_SELECT_E = ", ".join(f"e.{name}" for name in EVENT_COLUMNS)
+
+class Event:
+    """
+    1 dòng của bảng 'events', dạng dùng chung cho mọi tầng (CSDL, nhắc nhở, xuất file, GUI).
+    Dùng __slots__ nên nhỏ hơn dict; thời gian được parse 1 lần khi đọc từ CSDL
+    (start_dt, end_dt, remind_dt: datetime hoặc None nếu sai định dạng).
+    start_ts/end_ts/remind_ts: cùng các thời điểm đó dạng epoch (giây, int).
+    rrule/exdates: luật lặp lại và các lần bị bỏ của chuỗi (None với sự kiện 1 lần).
+    Mỗi lần lặp của chuỗi là 1 Event cùng id, mang thời gian của lần lặp đó.
+    """
+    __slots__ = EVENT_COLUMNS + ("start_dt", "end_dt", "remind_dt")
+
+    def __init__(self, id, event_name, start_time, end_time=None, location=None, reminder_minutes=0,
+                 reminded=0, remind_at=None, updated_at=None, created_at=None, sequence=0, change_seq=0,
+                 start_ts=None, end_ts=None, remind_ts=None, rrule=None, exdates=None):
+        self.id = id
+        self.event_name = event_name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.location = location
+        self.reminder_minutes = reminder_minutes
+        self.reminded = reminded
+        self.remind_at = remind_at
+        self.updated_at = updated_at
+        self.created_at = created_at
+        self.sequence = sequence
+        self.change_seq = change_seq
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.remind_ts = remind_ts
+        self.rrule = rrule
+        self.exdates = exdates
+        self.start_dt = _parse_time(start_time)
+        self.end_dt = _parse_time(end_time)
+        self.remind_dt = _parse_time(remind_at)
+
+    @property
+    def sort_key(self):
+        """Khóa theo thứ tự danh sách (start_ts, id); dòng thiếu start_ts xếp đầu như NULL trong SQL."""
+        return (self.start_ts if self.start_ts is not None else float("-inf"), self.id)
+
+    def to_dict(self):
+        """Các cột dưới dạng dict (để ghi JSON)."""
+        return {name: getattr(self, name) for name in EVENT_COLUMNS}
+
+    def __repr__(self):
+        return f"Event(id={self.id!r}, event_name={self.event_name!r}, start_time={self.start_time!r})"
+
+def _event_factory(cursor, row):
+    return Event(*row)
+
+def _event_cursor(conn):
+    """
+    Cursor trả mỗi dòng 'events' về dạng Event (thay vì sqlite3.Row rồi chuyển sang dict).
+    Câu lệnh phải chọn cột bằng EVENT_SELECT / EVENT_SELECT_E (không dùng *).
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = _event_factory
+    return cursor
+
+def _select_event(cursor, event_id):
+    """
+    Đọc lại 1 sự kiện (Event) ngay sau khi ghi, trong cùng giao dịch. Không dùng RETURNING
+    cho INSERT/UPDATE: RETURNING chạy trước các trigger AFTER nên change_seq/sequence cũ.
+    """
+    cursor.execute(f"SELECT {EVENT_SELECT} FROM events WHERE id = ?", (event_id,))
+    return cursor.fetchone()
+
+# --- Thông báo thay đổi lịch ---
+# Luồng nhắc nhở đăng ký callback ở đây để được đánh thức ngay khi lịch thay đổi
+# (thêm/sửa/xóa), thay vì phải quét lại CSDL định kỳ.
+_schedule_listeners = []
+# Bộ đệm COUNT(*) theo bộ lọc; xóa mỗi khi lịch thay đổi
+_count_cache = {}
+_schedule_version = 0
+
+def add_schedule_listener(callback):
+    """Đăng ký hàm callback() được gọi sau mỗi lần lịch trình thay đổi."""
+    if callback not in _schedule_listeners:
+        _schedule_listeners.append(callback)
+
+def remove_schedule_listener(callback):
+    if callback in _schedule_listeners:
+        _schedule_listeners.remove(callback)
+
+def _notify_schedule_changed():
+    global _schedule_version
+    _schedule_version += 1
+    _count_cache.clear()
+    for callback in list(_schedule_listeners):
+        try:
+            callback()
+        except Exception as e:
+            print(f"Lỗi trong callback thay đổi lịch: {e}")
+
+# --- Migration theo PRAGMA user_version ---
+# Mỗi bước nâng cấp CSDL lên đúng 1 phiên bản. Các bước phải idempotent để
+# CSDL cũ (tạo trước khi có user_version) vẫn nâng cấp tại chỗ an toàn.
+# Chỉ THÊM bước mới vào cuối danh sách, không sửa/xóa bước đã phát hành.
+
+def _column_names(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {col['name'] for col in cursor.fetchall()}
+
+def _compute_remind_at(start_time, reminder_minutes):
+    """Tính thời điểm cần nhắc ('YYYY-MM-DD HH:MM:SS'), None nếu không cần nhắc."""
+    if not start_time or not reminder_minutes:
+        return None
+    try:
+        start = datetime.fromisoformat(start_time)
+        return (start - timedelta(minutes=int(reminder_minutes))).strftime("%Y-%m-%d %H:%M:%S")
+    except (ValueError, TypeError):
+        return None
+
+# --- Thời gian dạng epoch ---
+# start_time/end_time (TEXT, giờ địa phương theo múi giờ cài đặt) được kiểm tra và
+# chuẩn hóa khi ghi, kèm cột epoch (start_ts, end_ts, remind_ts) để mọi truy vấn
+# khoảng thời gian/nhắc nhở là so sánh số nguyên trên index, không parse chuỗi.
+DB_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _to_epoch(local_dt):
+    """datetime giờ địa phương (naive) -> epoch giây."""
+    return int(local_dt.replace(tzinfo=get_timezone()).timestamp())
+
+def _from_epoch(ts):
+    """epoch giây -> 'YYYY-MM-DD HH:MM:SS' giờ địa phương."""
+    return datetime.fromtimestamp(ts, get_timezone()).strftime(DB_TIME_FORMAT)
+
+def _normalize_time(value, label):
+    """
+    Chuỗi thời gian ISO ('2025-01-01 09:00', '2025-01-01T09:00:00'...) ->
+    ('YYYY-MM-DD HH:MM:SS', epoch); (None, None) nếu rỗng. ValueError nếu sai định dạng.
+    """
+    if value is None or not str(value).strip():
+        return None, None
+    try:
+        dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{label} không hợp lệ: {value!r}") from None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(get_timezone()).replace(tzinfo=None)
+    dt = dt.replace(microsecond=0)
+    return dt.strftime(DB_TIME_FORMAT), _to_epoch(dt)
+
+def _event_times(start_time, end_time, reminder_minutes):
+    """
+    Kiểm tra và chuẩn hóa thời gian của 1 sự kiện trước khi ghi.
+    Trả về (start_time, end_time, remind_at, start_ts, end_ts, remind_ts). ValueError nếu sai.
+    """
+    start_time, start_ts = _normalize_time(start_time, "Thời gian bắt đầu")
+    if start_time is None:
+        raise ValueError("Thiếu thời gian bắt đầu")
+    end_time, end_ts = _normalize_time(end_time, "Thời gian kết thúc")
+    if end_ts is not None and end_ts < start_ts:
+        raise ValueError("Thời gian kết thúc trước thời gian bắt đầu")
+    remind_at = remind_ts = None
+    if reminder_minutes and int(reminder_minutes) > 0:
+        remind_ts = start_ts - int(reminder_minutes) * 60
+        remind_at = _from_epoch(remind_ts)
+    return start_time, end_time, remind_at, start_ts, end_ts, remind_ts
+
+def _filter_epoch(value, default_time):
+    """Mốc lọc ('YYYY-MM-DD' hoặc kèm giờ) -> epoch; chỉ có ngày thì thêm `default_time`."""
+    text = value.strip()
+    if len(text) <= 10:
+        text += " " + default_time
+    try:
+        return _normalize_time(text, "Mốc thời gian lọc")[1]
+    except ValueError:
+        raise ValueError(f"Mốc thời gian lọc không hợp lệ: {value!r}") from None
+
+def _backfill_epoch_columns(cursor):
+    """
+    Tính lại start_ts/end_ts/remind_ts (và remind_at) cho mọi sự kiện theo múi giờ
+    hiện tại; chuẩn hóa start_time/end_time viết sai dạng. Giờ kết thúc sai dạng hoặc
+    trước giờ bắt đầu (giao diện cũ cho phép) được thay bằng giờ bắt đầu +
+    DEFAULT_EVENT_MINUTES để sự kiện vẫn lọc/nhắc được. Dòng không đọc được giờ bắt
+    đầu giữ nguyên, cột epoch và remind_at để NULL. Trả về (số dòng lỗi, số dòng sửa giờ kết thúc).
+    """
+    cursor.execute("SELECT id, start_time, end_time, reminder_minutes, sequence, change_seq FROM events")
+    epochs, texts, tracking, invalid = [], [], [], []
+    clamped = 0
+    for row in cursor.fetchall():
+        try:
+            start_time, end_time, remind_at, start_ts, end_ts, remind_ts = _event_times(
+                row['start_time'], row['end_time'], row['reminder_minutes'])
+        except (ValueError, TypeError):
+            try:
+                start_time = _event_times(row['start_time'], None, row['reminder_minutes'])[0]
+            except (ValueError, TypeError):
+                invalid.append((row['id'],))
+                continue
+            end = datetime.strptime(start_time, DB_TIME_FORMAT) + timedelta(minutes=DEFAULT_EVENT_MINUTES)
+            start_time, end_time, remind_at, start_ts, end_ts, remind_ts = _event_times(
+                start_time, end, row['reminder_minutes'])
+            clamped += 1
+        epochs.append((start_ts, end_ts, remind_ts, remind_at, row['id']))
+        if (start_time, end_time) != (row['start_time'], row['end_time'] or None):
+            texts.append((start_time, end_time, row['id']))
+            tracking.append((row['sequence'], row['change_seq'], row['id']))
+    cursor.executemany("UPDATE events SET start_ts = ?, end_ts = ?, remind_ts = ?, remind_at = ? WHERE id = ?", epochs)
+    cursor.executemany("UPDATE events SET start_ts = NULL, end_ts = NULL, remind_ts = NULL, remind_at = NULL WHERE id = ?",
+                       invalid)
+    if texts:
+        # Chuẩn hóa cách viết không phải sửa nội dung: trả lại sequence/change_seq và bộ đếm
+        # thay đổi mà trigger events_track_update vừa tăng (để xuất delta không gửi lại cả lịch)
+        counter = cursor.execute("SELECT value FROM change_counter WHERE id = 1").fetchone()[0]
+        cursor.executemany("UPDATE events SET start_time = ?, end_time = ? WHERE id = ?", texts)
+        cursor.executemany("UPDATE events SET sequence = ?, change_seq = ? WHERE id = ?", tracking)
+        cursor.execute("UPDATE change_counter SET value = ? WHERE id = 1", (counter,))
+    return len(invalid), clamped
+
+# --- Sự kiện lặp lại ---
+# Mỗi chuỗi lặp lại là 1 dòng: start_time/end_time là lần đầu, rrule/exdates là luật
+# lặp (tập con RRULE, xem recurrence.py) và các lần bị bỏ, series_end_ts là giờ bắt đầu
+# của lần cuối (NULL nếu vô hạn). Các lần lặp không được lưu mà chỉ được sinh khi truy
+# vấn theo khoảng thời gian, và chỉ trong khoảng đó. remind_at/remind_ts của chuỗi là
+# giờ nhắc của lần lặp sắp tới, được dời sang lần tiếp theo mỗi khi đã nhắc.
+# Lọc chỉ có mốc đầu: chỉ sinh lần lặp trong RECURRENCE_HORIZON_DAYS ngày sau mốc đó
+RECURRENCE_HORIZON_DAYS = 366
+
+def _local_time(ts):
+    """epoch giây -> datetime giờ địa phương (naive); None giữ nguyên."""
+    return None if ts is None else datetime.fromtimestamp(ts, get_timezone()).replace(tzinfo=None)
+
+def _normalize_exdates(exdates):
+    """Các lần bị bỏ (list hoặc chuỗi cách nhau dấu phẩy) -> 'YYYY-MM-DD HH:MM:SS,...'; None nếu rỗng."""
+    if not exdates:
+        return None
+    if isinstance(exdates, str):
+        exdates = exdates.split(",")
+    values = {_normalize_time(value, "Lần lặp bị bỏ")[0] for value in exdates}
+    values.discard(None)
+    return ",".join(sorted(values)) or None
+
+def _parse_exdates(exdates):
+    return [datetime.fromisoformat(value) for value in exdates.split(",")] if exdates else []
+
+def _next_series_reminder(rule, dtstart, exdates, reminder_minutes, after_ts):
+    """(remind_at, remind_ts) của lần lặp đầu tiên có giờ nhắc sau `after_ts`; (None, None) nếu hết."""
+    if not reminder_minutes or int(reminder_minutes) <= 0:
+        return None, None
+    lead = int(reminder_minutes) * 60
+    for dt in iter_occurrences(rule, dtstart, _local_time(after_ts + lead + 1), None, _parse_exdates(exdates)):
+        remind_ts = _to_epoch(dt) - lead
+        if remind_ts > after_ts:
+            return _from_epoch(remind_ts), remind_ts
+    return None, None
+
+def _event_fields(start_time, end_time, reminder_minutes, rrule=None, exdates=None):
+    """
+    _event_times() kèm luật lặp lại: trả về (start_time, end_time, remind_at, start_ts, end_ts,
+    remind_ts, rrule, exdates, series_end_ts). Chuỗi lặp lại nhắc theo lần lặp sắp tới.
+    ValueError nếu thời gian hoặc luật lặp lại sai.
+    """
+    start_time, end_time, remind_at, start_ts, end_ts, remind_ts = _event_times(start_time, end_time, reminder_minutes)
+    if not rrule:
+        return start_time, end_time, remind_at, start_ts, end_ts, remind_ts, None, None, None
+    rule = parse_rule(str(rrule).strip())
+    dtstart = datetime.fromisoformat(start_time)
+    exdates = _normalize_exdates(exdates)
+    series_end_ts = None
+    if rule.until is not None or rule.count is not None:
+        last = last_occurrence(rule, dtstart)
+        series_end_ts = _to_epoch(last) if last is not None else start_ts
+    remind_at, remind_ts = _next_series_reminder(rule, dtstart, exdates, reminder_minutes, int(time.time()) - 1)
+    return start_time, end_time, remind_at, start_ts, end_ts, remind_ts, str(rule), exdates, series_end_ts
+
+def _backfill_series(cursor):
+    """Tính lại series_end_ts và lần nhắc sắp tới của mọi chuỗi lặp lại (VD sau khi đổi múi giờ)."""
+    cursor.execute("SELECT id, start_time, end_time, reminder_minutes, rrule, exdates FROM events WHERE rrule IS NOT NULL")
+    updates = []
+    for row in cursor.fetchall():
+        try:
+            fields = _event_fields(row['start_time'], row['end_time'], row['reminder_minutes'], row['rrule'], row['exdates'])
+        except (ValueError, TypeError) as e:
+            print(f"Bỏ qua chuỗi lặp lại lỗi (id={row['id']}): {e}")
+            continue
+        updates.append((fields[8], fields[2], fields[5], row['id']))
+    cursor.executemany("UPDATE events SET series_end_ts = ?, remind_at = ?, remind_ts = ? WHERE id = ?", updates)
+
+def _occurrence(series, start_dt):
+    """Event của 1 lần lặp: dời thời gian (và giờ nhắc) của chuỗi sang lần lặp, giữ nguyên độ dài."""
+    start_ts = _to_epoch(start_dt)
+    end_time = end_ts = remind_at = remind_ts = None
+    if series.end_dt is not None:
+        end_dt = start_dt + (series.end_dt - series.start_dt)
+        end_time, end_ts = end_dt.strftime(DB_TIME_FORMAT), _to_epoch(end_dt)
+    if series.reminder_minutes and int(series.reminder_minutes) > 0:
+        remind_ts = start_ts - int(series.reminder_minutes) * 60
+        remind_at = _from_epoch(remind_ts)
+    return Event(series.id, series.event_name, start_dt.strftime(DB_TIME_FORMAT), end_time, series.location,
+                 series.reminder_minutes, 0, remind_at, series.updated_at, series.created_at, series.sequence,
+                 series.change_seq, start_ts, end_ts, remind_ts, series.rrule, series.exdates)
+
+def _iter_series_occurrences(series, from_ts, to_ts):
+    """Các lần lặp (Event) của 1 chuỗi có giờ bắt đầu trong [from_ts, to_ts] (None = không giới hạn)."""
+    try:
+        rule = parse_rule(series.rrule)
+        exdates = _parse_exdates(series.exdates)
+    except ValueError as e:
+        print(f"Bỏ qua chuỗi lặp lại lỗi (id={series.id}): {e}")
+        return
+    if series.start_dt is None:
+        return
+    for dt in iter_occurrences(rule, series.start_dt, _local_time(from_ts), _local_time(to_ts), exdates):
+        yield _occurrence(series, dt)
+
+def _sort_key(event):
+    return event.sort_key
+
+def _expand_series(series_rows, from_ts, to_ts, after=None, limit=None):
+    """
+    Các lần lặp của nhiều chuỗi trong [from_ts, to_ts], gộp theo (start_ts, id).
+    `after`: khóa keyset (start_ts, id), chỉ lấy lần lặp đứng sau; `limit`: tối đa mỗi chuỗi.
+    """
+    after_key = None
+    if after is not None:
+        after_key = (after[0] if after[0] is not None else float("-inf"), after[1])
+        if after[0] is not None and (from_ts is None or after[0] > from_ts):
+            from_ts = after[0]
+    streams = []
+    for series in series_rows:
+        occurrences = _iter_series_occurrences(series, from_ts, to_ts)
+        if after_key is not None:
+            occurrences = (e for e in occurrences if e.sort_key > after_key)
+        streams.append(islice(occurrences, limit))
+    return merge(*streams, key=_sort_key)
+
+def _migrate_create_events(cursor):
+    cursor.execute("""
         CREATE TABLE IF NOT EXISTS events (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             event_name TEXT NOT NULL,
@@ -48,144 +458,925 @@ def init_db():
             end_time TEXT,
             location TEXT,
             reminder_minutes INTEGER DEFAULT 0,
-            reminded INTEGER DEFAULT 0 
-        );
+            reminded INTEGER DEFAULT 0
+        )
+    """)
+
+def _migrate_add_reminded(cursor):
+    """Thêm cột 'reminded' cho CSDL tạo từ các phiên bản rất cũ."""
+    if 'reminded' not in _column_names(cursor, "events"):
+        cursor.execute("ALTER TABLE events ADD COLUMN reminded INTEGER DEFAULT 0")
+
+def _migrate_index_start_time(cursor):
+    """Index cho ORDER BY start_time và lọc theo khoảng thời gian."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_start_time ON events(start_time)")
+
+def _migrate_add_remind_at(cursor):
+    """Lưu sẵn thời điểm nhắc + partial index cho các sự kiện chưa nhắc."""
+    if 'remind_at' not in _column_names(cursor, "events"):
+        cursor.execute("ALTER TABLE events ADD COLUMN remind_at TEXT")
+    cursor.execute("SELECT id, start_time, reminder_minutes FROM events WHERE reminder_minutes > 0")
+    rows = [(_compute_remind_at(r['start_time'], r['reminder_minutes']), r['id'])
+            for r in cursor.fetchall()]
+    cursor.executemany("UPDATE events SET remind_at = ? WHERE id = ?", rows)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_pending_reminder
+        ON events(remind_at) WHERE reminded = 0 AND remind_at IS NOT NULL
+    """)
+
+def _migrate_add_fts(cursor):
+    """
+    Bảng FTS5 cho tìm kiếm theo tên/địa điểm: giữ cả bản gốc và bản bỏ dấu
+    (unidecode) để "hop" tìm được "họp". Đồng bộ với 'events' bằng trigger.
+    """
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+            event_name UNINDEXED, location UNINDEXED,
+            event_name_folded, location_folded
+        )
+    """)
+    cursor.execute("DELETE FROM events_fts")
+    cursor.execute("""
+        INSERT INTO events_fts(rowid, event_name, location, event_name_folded, location_folded)
+        SELECT id, event_name, location, fold_text(event_name), fold_text(location) FROM events
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+            INSERT INTO events_fts(rowid, event_name, location, event_name_folded, location_folded)
+            VALUES (new.id, new.event_name, new.location, fold_text(new.event_name), fold_text(new.location));
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+            DELETE FROM events_fts WHERE rowid = old.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF event_name, location ON events BEGIN
+            UPDATE events_fts
+            SET event_name = new.event_name, location = new.location,
+                event_name_folded = fold_text(new.event_name), location_folded = fold_text(new.location)
+            WHERE rowid = old.id;
+        END
+    """)
+
+def _migrate_add_updated_at(cursor):
+    """
+    Thời điểm sửa nội dung gần nhất (giờ địa phương), dùng cho xuất lịch theo
+    thay đổi. Sự kiện cũ để NULL (không rõ thời điểm sửa).
+    """
+    if 'updated_at' not in _column_names(cursor, "events"):
+        cursor.execute("ALTER TABLE events ADD COLUMN updated_at TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_updated_at ON events(updated_at)")
+
+def _migrate_add_change_tracking(cursor):
+    """
+    Theo dõi thay đổi để xuất/đồng bộ phần chênh lệch (delta):
+    - change_counter: bộ đếm thay đổi toàn cục, tăng 1 sau mỗi lần thêm/sửa/xóa;
+    - events.change_seq: giá trị bộ đếm ở lần thay đổi gần nhất của sự kiện;
+    - events.sequence: số lần sửa nội dung (SEQUENCE của iCalendar);
+    - deleted_events: "bia mộ" của sự kiện đã xóa, để báo xóa cho lịch đích.
+    Mọi thứ được trigger cập nhật, nên cả add_events_bulk cũng được theo dõi.
+    Đánh dấu đã nhắc (cột reminded) không tính là thay đổi.
+    """
+    columns = _column_names(cursor, "events")
+    if 'created_at' not in columns:
+        cursor.execute("ALTER TABLE events ADD COLUMN created_at TEXT")
+    if 'sequence' not in columns:
+        cursor.execute("ALTER TABLE events ADD COLUMN sequence INTEGER NOT NULL DEFAULT 0")
+    if 'change_seq' not in columns:
+        cursor.execute("ALTER TABLE events ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS deleted_events (
+            id INTEGER PRIMARY KEY,
+            event_name TEXT,
+            start_time TEXT,
+            sequence INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL,
+            change_seq INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_watermarks (
+            target TEXT PRIMARY KEY,
+            change_seq INTEGER NOT NULL,
+            synced_at TEXT NOT NULL
+        )
+    """)
+    # Sự kiện có sẵn: coi như cùng thay đổi ở lần 1 (xuất delta từ 0 = xuất toàn bộ)
+    cursor.execute("INSERT OR IGNORE INTO change_counter (id, value) VALUES (1, 1)")
+    cursor.execute("UPDATE events SET change_seq = 1 WHERE change_seq = 0")
+    cursor.execute("UPDATE events SET created_at = updated_at WHERE created_at IS NULL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_change_seq ON events(change_seq)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_deleted_events_change_seq ON deleted_events(change_seq)")
+
+    next_change = "UPDATE change_counter SET value = value + 1 WHERE id = 1;"
+    current_change = "(SELECT value FROM change_counter WHERE id = 1)"
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS events_track_insert AFTER INSERT ON events BEGIN
+            {next_change}
+            UPDATE events SET change_seq = {current_change} WHERE id = new.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS events_track_update
+        AFTER UPDATE OF event_name, start_time, end_time, location, reminder_minutes ON events BEGIN
+            {next_change}
+            UPDATE events SET change_seq = {current_change}, sequence = old.sequence + 1 WHERE id = new.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS events_track_delete AFTER DELETE ON events BEGIN
+            {next_change}
+            INSERT OR REPLACE INTO deleted_events (id, event_name, start_time, sequence, deleted_at, change_seq)
+            VALUES (old.id, old.event_name, old.start_time, old.sequence + 1, {LOCAL_NOW_SQL}, {current_change});
+        END
+    """)
+
+def _migrate_add_epoch_columns(cursor):
+    """
+    Cột epoch cho start/end/nhắc nhở + index, thay cho so sánh chuỗi start_time/remind_at.
+    Bỏ 2 index cũ trên cột chuỗi (không truy vấn nào dùng nữa, chỉ làm chậm lúc ghi).
+    """
+    columns = _column_names(cursor, "events")
+    for column in ("start_ts", "end_ts", "remind_ts"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE events ADD COLUMN {column} INTEGER")
+    invalid, clamped = _backfill_epoch_columns(cursor)
+    if invalid:
+        print(f"--- [Database] {invalid} sự kiện có thời gian sai định dạng, không lọc/nhắc được ---")
+    if clamped:
+        print(f"--- [Database] {clamped} sự kiện có giờ kết thúc sai, đã đặt lại = giờ bắt đầu + "
+              f"{DEFAULT_EVENT_MINUTES} phút ---")
+    # Index trên start_ts ngầm kèm rowid (= id) nên khớp ORDER BY start_ts, id
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_start_ts ON events(start_ts)")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_pending_remind_ts
+        ON events(remind_ts) WHERE reminded = 0 AND remind_ts IS NOT NULL
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_events_start_time")
+    cursor.execute("DROP INDEX IF EXISTS idx_events_pending_reminder")
+
+# --- Khoảng bận của sự kiện (phát hiện trùng lịch, tìm giờ rảnh) ---
+# Sự kiện bận trong [start_ts, busy_end); không có giờ kết thúc (hoặc kết thúc = bắt đầu)
+# thì coi như kéo dài DEFAULT_EVENT_MINUTES, giống mặc định của nlp_parser.
+DEFAULT_EVENT_MINUTES = 60
+BUSY_END_SQL = f"(CASE WHEN e.end_ts > e.start_ts THEN e.end_ts ELSE e.start_ts + {DEFAULT_EVENT_MINUTES * 60} END)"
+
+def _migrate_add_interval_index(cursor):
+    """
+    Chỉ mục R*Tree 'events_interval' (id, start_ts, busy_end) để tìm sự kiện chồng lấn
+    một khoảng thời gian mà không quét toàn bảng. Đồng bộ với 'events' bằng trigger.
+    SQLite không có module rtree -> bỏ qua, find_overlapping() chỉ chặn được mốc cuối
+    bằng index start_ts (quét mọi sự kiện bắt đầu trước mốc cuối).
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(sql_create_table)
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS events_interval USING rtree(id, start_ts, busy_end)")
+    except sqlite3.OperationalError as e:
+        print(f"--- [Database] Không tạo được chỉ mục khoảng thời gian ({e}), dùng truy vấn thường ---")
+        return
+    busy_end = BUSY_END_SQL.replace("e.", "new.")
+    cursor.execute("DELETE FROM events_interval")
+    cursor.execute(f"INSERT INTO events_interval SELECT e.id, e.start_ts, {BUSY_END_SQL} FROM events e WHERE e.start_ts IS NOT NULL")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS events_interval_insert AFTER INSERT ON events
+        WHEN new.start_ts IS NOT NULL BEGIN
+            INSERT INTO events_interval VALUES (new.id, new.start_ts, {busy_end});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS events_interval_update AFTER UPDATE OF start_ts, end_ts ON events BEGIN
+            DELETE FROM events_interval WHERE id = old.id;
+            INSERT INTO events_interval SELECT new.id, new.start_ts, {busy_end} WHERE new.start_ts IS NOT NULL;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS events_interval_delete AFTER DELETE ON events BEGIN
+            DELETE FROM events_interval WHERE id = old.id;
+        END
+    """)
+
+# Khoảng trong chỉ mục R*Tree: chuỗi lặp lại chiếm từ lần đầu tới hết lần cuối
+# (chuỗi vô hạn: tới SERIES_OPEN_END), lần lặp cụ thể được kiểm tra lại khi truy vấn
+SERIES_OPEN_END = 253402300799  # 9999-12-31 23:59:59 UTC
+INTERVAL_END_SQL = (f"(CASE WHEN e.rrule IS NULL THEN {BUSY_END_SQL}"
+                    f" ELSE COALESCE(e.series_end_ts, {SERIES_OPEN_END}) + {BUSY_END_SQL} - e.start_ts END)")
+
+def _migrate_add_recurrence(cursor):
+    """
+    Sự kiện lặp lại: cột rrule, exdates, series_end_ts (xem phần "Sự kiện lặp lại").
+    Sửa luật lặp/lần bị bỏ cũng tính là thay đổi nội dung (tăng 'sequence'), và chỉ mục
+    khoảng thời gian phủ cả chuỗi.
+    """
+    columns = _column_names(cursor, "events")
+    for column, kind in (("rrule", "TEXT"), ("exdates", "TEXT"), ("series_end_ts", "INTEGER")):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE events ADD COLUMN {column} {kind}")
+    _backfill_series(cursor)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_series ON events(start_ts) WHERE rrule IS NOT NULL")
+
+    cursor.execute("DROP TRIGGER IF EXISTS events_track_update")
+    cursor.execute("""
+        CREATE TRIGGER events_track_update
+        AFTER UPDATE OF event_name, start_time, end_time, location, reminder_minutes, rrule, exdates ON events BEGIN
+            UPDATE change_counter SET value = value + 1 WHERE id = 1;
+            UPDATE events SET change_seq = (SELECT value FROM change_counter WHERE id = 1),
+                              sequence = old.sequence + 1 WHERE id = new.id;
+        END
+    """)
+
+    if not cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'events_interval'").fetchone():
+        return
+    interval_end = INTERVAL_END_SQL.replace("e.", "new.")
+    cursor.execute("DROP TRIGGER IF EXISTS events_interval_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS events_interval_update")
+    cursor.execute("DELETE FROM events_interval")
+    cursor.execute(f"INSERT INTO events_interval SELECT e.id, e.start_ts, {INTERVAL_END_SQL} FROM events e WHERE e.start_ts IS NOT NULL")
+    cursor.execute(f"""
+        CREATE TRIGGER events_interval_insert AFTER INSERT ON events
+        WHEN new.start_ts IS NOT NULL BEGIN
+            INSERT INTO events_interval VALUES (new.id, new.start_ts, {interval_end});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER events_interval_update
+        AFTER UPDATE OF start_ts, end_ts, rrule, series_end_ts ON events BEGIN
+            DELETE FROM events_interval WHERE id = old.id;
+            INSERT INTO events_interval SELECT new.id, new.start_ts, {interval_end} WHERE new.start_ts IS NOT NULL;
+        END
+    """)
+
+# Phiên bản CSDL = vị trí bước trong danh sách (bắt đầu từ 1)
+MIGRATIONS = [
+    _migrate_create_events,
+    _migrate_add_reminded,
+    _migrate_index_start_time,
+    _migrate_add_remind_at,
+    _migrate_add_fts,
+    _migrate_add_updated_at,
+    _migrate_add_change_tracking,
+    _migrate_add_epoch_columns,
+    _migrate_add_interval_index,
+    _migrate_add_recurrence,
+]
+
+def _run_migrations(conn):
+    cursor = conn.cursor()
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        print(f"--- [Database] Đang nâng cấp lên phiên bản {target}: {migration.__name__} ---")
+        # BEGIN tường minh: sqlite3 không tự mở transaction cho câu lệnh DDL
+        cursor.execute("BEGIN")
+        try:
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {target}")
             conn.commit()
-            
-        _check_and_add_reminded_column()
-        
-        print(f"Cơ sở dữ liệu đã được khởi tạo/kiểm tra thành công tại: {DB_PATH}")
-            
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    global _interval_index
+    _interval_index = None
+    return len(MIGRATIONS)
+
+def init_db():
+    """Khởi tạo bảng 'events' VÀ nâng cấp CSDL nếu cần."""
+    try:
+        version = _run_migrations(get_db_connection())
+        print(f"Cơ sở dữ liệu (phiên bản {version}) đã được khởi tạo/kiểm tra thành công tại: {DB_PATH}")
+
     except sqlite3.Error as e:
-        print(f"Lỗi khi khởi tạo bảng: {e}")
+        print(f"Lỗi khi khởi tạo/nâng cấp CSDL: {e}")
 
 def mark_event_as_reminded(event_id):
-    """Đánh dấu một sự kiện là đã được nhắc nhở."""
-    sql = "UPDATE events SET reminded = 1 WHERE id = ?"
+    """
+    Đánh dấu một sự kiện là đã được nhắc nhở.
+    Chuỗi lặp lại thì dời giờ nhắc sang lần lặp kế tiếp (chỉ đánh dấu khi đã hết lần lặp).
+    """
+    sql = "UPDATE events SET reminded = 1 WHERE id = ? AND rrule IS NULL"
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(sql, (event_id,))
+            if cursor.rowcount == 0:
+                _advance_series_reminder(cursor, event_id)
             conn.commit()
             return True
     except sqlite3.Error as e:
         print(f"Lỗi khi đánh dấu đã nhắc: {e}")
         return False
 
-def add_event(event_name, start_time, end_time, location, reminder_minutes):
-    """Thêm một sự kiện mới vào CSDL (reset 'reminded' về 0)."""
-    sql = """
-        INSERT INTO events (event_name, start_time, end_time, location, reminder_minutes, reminded)
-        VALUES (?, ?, ?, ?, ?, 0)
+def _advance_series_reminder(cursor, event_id):
+    """Dời giờ nhắc của chuỗi lặp lại sang lần lặp kế tiếp (sau cả hiện tại lẫn lần vừa nhắc)."""
+    row = cursor.execute("SELECT start_time, reminder_minutes, rrule, exdates, remind_ts FROM events "
+                         "WHERE id = ? AND rrule IS NOT NULL", (event_id,)).fetchone()
+    if row is None:
+        return
+    after_ts = max(int(time.time()), row['remind_ts'] or 0)
+    remind_at, remind_ts = _next_series_reminder(parse_rule(row['rrule']), datetime.fromisoformat(row['start_time']),
+                                                 row['exdates'], row['reminder_minutes'], after_ts)
+    cursor.execute("UPDATE events SET remind_at = ?, remind_ts = ?, reminded = ? WHERE id = ?",
+                   (remind_at, remind_ts, int(remind_ts is None), event_id))
+
+# Tham số: (event_name, start_time, end_time, location, reminder_minutes) + phần còn lại của _event_fields()
+INSERT_EVENT_SQL = f"""
+    INSERT INTO events (event_name, start_time, end_time, location, reminder_minutes, reminded,
+                        remind_at, start_ts, end_ts, remind_ts, rrule, exdates, series_end_ts,
+                        created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, {LOCAL_NOW_SQL}, {LOCAL_NOW_SQL})
+"""
+# Như INSERT_EVENT_SQL, thêm id ở cuối
+UPDATE_EVENT_SQL = f"""
+    UPDATE events
+    SET event_name = ?, start_time = ?, end_time = ?, location = ?, reminder_minutes = ?,
+        reminded = 0, remind_at = ?, start_ts = ?, end_ts = ?, remind_ts = ?,
+        rrule = ?, exdates = ?, series_end_ts = ?, updated_at = {LOCAL_NOW_SQL}
+    WHERE id = ?
+"""
+
+def add_event(event_name, start_time, end_time, location, reminder_minutes, rrule=None, exdates=None):
     """
+    Thêm một sự kiện mới vào CSDL (reset 'reminded' về 0).
+    `rrule`/`exdates`: luật lặp lại (VD 'FREQ=WEEKLY;BYDAY=MO') và các lần bị bỏ của chuỗi.
+    Trả về dòng vừa thêm (Event, có 'id') để GUI chèn trực tiếp; None nếu lỗi CSDL.
+    ValueError nếu thời gian hoặc luật lặp lại sai.
+    """
+    (start_time, end_time, remind_at, start_ts, end_ts, remind_ts,
+     rrule, exdates, series_end_ts) = _event_fields(start_time, end_time, reminder_minutes, rrule, exdates)
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(sql, (event_name, start_time, end_time, location, reminder_minutes))
+            cursor = _event_cursor(conn)
+            cursor.execute(INSERT_EVENT_SQL, (event_name, start_time, end_time, location, reminder_minutes,
+                                 remind_at, start_ts, end_ts, remind_ts, rrule, exdates, series_end_ts))
+            row = _select_event(cursor, cursor.lastrowid)
             conn.commit()
-            return cursor.lastrowid
+        _notify_schedule_changed()
+        return row
     except sqlite3.Error as e:
         print(f"Lỗi khi thêm sự kiện: {e}")
         return None
 
+def add_events_bulk(events):
+    """
+    Thêm nhiều sự kiện trong MỘT giao dịch (dùng cho nhập hàng loạt).
+    `events`: iterable các bộ (event_name, start_time, end_time, location, reminder_minutes),
+    có thể thêm (rrule, exdates) ở cuối, được đọc dần (có thể là generator). Trả về số sự kiện đã thêm; None nếu lỗi
+    CSDL (không sự kiện nào được thêm). Lỗi do chính `events` ném ra, hoặc ValueError
+    khi có thời gian/luật lặp lại sai, được ném tiếp sau khi hủy giao dịch.
+    """
+    def rows():
+        for name, start_time, end_time, location, reminder_minutes, *recurrence in events:
+            fields = _event_fields(start_time, end_time, reminder_minutes, *recurrence)
+            yield (name, fields[0], fields[1], location, reminder_minutes) + fields[2:]
+    try:
+        with get_db_connection() as conn:
+            count = conn.executemany(INSERT_EVENT_SQL, rows()).rowcount
+            conn.commit()
+        if count:
+            _notify_schedule_changed()
+        return count
+    except sqlite3.Error as e:
+        print(f"Lỗi khi thêm hàng loạt sự kiện: {e}")
+        return None
+
+def get_event_keys():
+    """Tập khóa (event_name, start_time) của mọi sự kiện, dùng để chống trùng khi nhập."""
+    try:
+        with get_db_connection() as conn:
+            return {(row[0], row[1]) for row in conn.execute("SELECT event_name, start_time FROM events")}
+    except sqlite3.Error as e:
+        print(f"Lỗi khi lấy khóa sự kiện: {e}")
+        return set()
+
 def get_all_events():
     """Lấy tất cả sự kiện (Giữ nguyên)."""
-    sql = "SELECT * FROM events ORDER BY start_time ASC"
+    sql = f"SELECT {EVENT_SELECT} FROM events ORDER BY start_ts ASC, id ASC"
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor()
+            cursor = _event_cursor(conn)
             cursor.execute(sql)
-            events = [dict(row) for row in cursor.fetchall()]
-            return events
+            return cursor.fetchall()
     except sqlite3.Error as e:
         print(f"Lỗi khi lấy sự kiện: {e}")
         return []
 
-def update_event(event_id, event_name, start_time, end_time, location, reminder_minutes):
-    """Cập nhật một sự kiện (NÂNG CẤP: reset 'reminded' về 0)."""
-    sql = """
-        UPDATE events
-        SET event_name = ?, start_time = ?, end_time = ?, location = ?, reminder_minutes = ?, reminded = 0
-        WHERE id = ?
+def iter_events(from_date=None, to_date=None, changed_since=None, batch_size=500):
+    """
+    Duyệt dần các sự kiện (Event) theo thời gian bắt đầu, mỗi lần lấy `batch_size` dòng
+    từ cursor (fetchmany) nên bộ nhớ không phụ thuộc số sự kiện. Dùng cho xuất file.
+    `changed_since`: chỉ lấy sự kiện được thêm/sửa từ thời điểm này (theo updated_at).
+    Lỗi CSDL được ném tiếp để nơi gọi không ghi ra một file thiếu dữ liệu.
+    """
+    where, params = _build_event_filter(from_date=from_date, to_date=to_date)
+    if changed_since:
+        where += " AND e.updated_at >= ?"
+        params.append(changed_since)
+    return _iter_rows(_event_cursor(get_db_connection()),
+                      f"SELECT {EVENT_SELECT_E}" + where + " ORDER BY e.start_ts ASC, e.id ASC", params, batch_size)
+
+def _iter_rows(cursor, sql, params, batch_size):
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+# --- Theo dõi thay đổi (xuất/đồng bộ delta) ---
+def get_change_watermark():
+    """Giá trị hiện tại của bộ đếm thay đổi (mốc để lần đồng bộ sau chỉ lấy phần mới)."""
+    row = get_db_connection().execute("SELECT value FROM change_counter WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+def iter_changed_events(since, until, batch_size=500):
+    """Các sự kiện được thêm/sửa sau mốc `since` (tới mốc `until`), theo thứ tự thay đổi."""
+    sql = f"SELECT {EVENT_SELECT} FROM events WHERE change_seq > ? AND change_seq <= ? ORDER BY change_seq ASC"
+    return _iter_rows(_event_cursor(get_db_connection()), sql, (since, until), batch_size)
+
+def iter_deleted_events(since, until, batch_size=500):
+    """Các sự kiện bị xóa sau mốc `since` (tới mốc `until`): dict id, event_name, start_time, sequence, deleted_at."""
+    sql = "SELECT * FROM deleted_events WHERE change_seq > ? AND change_seq <= ? ORDER BY change_seq ASC"
+    return map(dict, _iter_rows(get_db_connection().cursor(), sql, (since, until), batch_size))
+
+def get_sync_watermark(target):
+    """Mốc đã đồng bộ tới của 1 đích (tên tùy ý, VD đường dẫn file); 0 nếu chưa đồng bộ lần nào."""
+    try:
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT change_seq FROM sync_watermarks WHERE target = ?", (target,)).fetchone()
+            return row[0] if row else 0
+    except sqlite3.Error as e:
+        print(f"Lỗi khi đọc mốc đồng bộ: {e}")
+        return 0
+
+def set_sync_watermark(target, change_seq):
+    """Lưu mốc đã đồng bộ tới của 1 đích."""
+    sql = f"""
+        INSERT INTO sync_watermarks (target, change_seq, synced_at) VALUES (?, ?, {LOCAL_NOW_SQL})
+        ON CONFLICT(target) DO UPDATE SET change_seq = excluded.change_seq, synced_at = excluded.synced_at
     """
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(sql, (event_name, start_time, end_time, location, reminder_minutes, event_id))
+            conn.execute(sql, (target, change_seq))
             conn.commit()
             return True
     except sqlite3.Error as e:
-        print(f"Lỗi khi cập nhật sự kiện: {e}")
+        print(f"Lỗi khi lưu mốc đồng bộ: {e}")
         return False
 
-def delete_event(event_id):
-    sql = "DELETE FROM events WHERE id = ?"
+def set_timezone(name):
+    """
+    Đổi múi giờ của lịch: giờ địa phương đã lưu giữ nguyên, các cột epoch được
+    tính lại theo múi giờ mới. ValueError nếu tên múi giờ không tồn tại.
+    """
+    if not _save_timezone(name):
+        return False
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            _backfill_epoch_columns(cursor)
+            _backfill_series(cursor)
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Lỗi khi đổi múi giờ: {e}")
+        return False
+    _notify_schedule_changed()
+    return True
+
+def _reminder_occurrence(series):
+    """Lần lặp ứng với giờ nhắc hiện tại (remind_ts) của chuỗi."""
+    start_ts = series.remind_ts + int(series.reminder_minutes) * 60
+    occurrence = _occurrence(series, _local_time(start_ts))
+    occurrence.remind_at, occurrence.remind_ts = series.remind_at, series.remind_ts
+    return occurrence
+
+def get_upcoming_reminders(limit=50):
+    """
+    Lấy tối đa `limit` sự kiện CHƯA nhắc có thời điểm nhắc sớm nhất.
+    Dùng partial index idx_events_pending_remind_ts nên không quét toàn bảng.
+    Chuỗi lặp lại được trả về dưới dạng lần lặp sắp được nhắc.
+    """
+    sql = f"""
+        SELECT {EVENT_SELECT} FROM events
+        WHERE reminded = 0 AND remind_ts IS NOT NULL
+        ORDER BY remind_ts ASC
+        LIMIT ?
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = _event_cursor(conn)
+            cursor.execute(sql, (limit,))
+            return [_reminder_occurrence(event) if event.rrule else event for event in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Lỗi khi lấy danh sách nhắc nhở: {e}")
+        return []
+
+def update_event(event_id, event_name, start_time, end_time, location, reminder_minutes, rrule=None, exdates=None):
+    """
+    Cập nhật một sự kiện (NÂNG CẤP: reset 'reminded' về 0).
+    `rrule`/`exdates`: None = giữ nguyên của chuỗi, '' = bỏ (rrule='' biến chuỗi thành sự kiện 1 lần).
+    Trả về dòng sau khi sửa (Event); None nếu lỗi CSDL hoặc không tồn tại.
+    ValueError nếu thời gian hoặc luật lặp lại sai.
+    """
+    try:
+        with get_db_connection() as conn:
+            if rrule is None or exdates is None:
+                current = conn.execute("SELECT rrule, exdates FROM events WHERE id = ?", (event_id,)).fetchone()
+                if current is not None:
+                    rrule = current['rrule'] if rrule is None else rrule
+                    exdates = current['exdates'] if exdates is None else exdates
+            fields = _event_fields(start_time, end_time, reminder_minutes, rrule, exdates)
+            cursor = _event_cursor(conn)
+            cursor.execute(UPDATE_EVENT_SQL, (event_name, fields[0], fields[1], location, reminder_minutes) + fields[2:] + (event_id,))
+            row = _select_event(cursor, event_id) if cursor.rowcount else None
+            conn.commit()
+        if row is None:
+            return None
+        _notify_schedule_changed()
+        return row
+    except sqlite3.Error as e:
+        print(f"Lỗi khi cập nhật sự kiện: {e}")
+        return None
+
+def delete_event(event_id):
+    """Xóa một sự kiện. Trả về dòng đã xóa (Event); None nếu lỗi hoặc không tồn tại."""
+    sql = f"DELETE FROM events WHERE id = ? RETURNING {EVENT_SELECT}"
+    try:
+        with get_db_connection() as conn:
+            cursor = _event_cursor(conn)
             cursor.execute(sql, (event_id,))
+            row = cursor.fetchone()
             conn.commit()
-            return True
+        if row is None:
+            return None
+        _notify_schedule_changed()
+        return row
     except sqlite3.Error as e:
         print(f"Lỗi khi xóa sự kiện: {e}")
-        return False
+        return None
+
+def skip_occurrence(event_id, occurrence_time):
+    """
+    Bỏ 1 lần lặp của chuỗi (thêm vào exdates), các lần khác giữ nguyên.
+    Trả về dòng chuỗi sau khi sửa (Event); None nếu lỗi CSDL hoặc không phải chuỗi lặp lại.
+    ValueError nếu thời gian sai định dạng.
+    """
+    occurrence_time = _normalize_time(occurrence_time, "Lần lặp bị bỏ")[0]
+    try:
+        with get_db_connection() as conn:
+            cursor = _event_cursor(conn)
+            cursor.execute(f"SELECT {EVENT_SELECT} FROM events WHERE id = ? AND rrule IS NOT NULL", (event_id,))
+            series = cursor.fetchone()
+    except sqlite3.Error as e:
+        print(f"Lỗi khi bỏ lần lặp: {e}")
+        return None
+    if series is None or occurrence_time is None:
+        return None
+    exdates = ",".join(filter(None, (series.exdates, occurrence_time)))
+    return update_event(series.id, series.event_name, series.start_time, series.end_time,
+                        series.location, series.reminder_minutes, exdates=exdates)
+
+def update_occurrence(event_id, occurrence_time, event_name, start_time, end_time, location, reminder_minutes):
+    """
+    Sửa riêng 1 lần lặp của chuỗi: bỏ lần đó khỏi chuỗi (exdates) và thêm 1 sự kiện 1 lần
+    với nội dung mới, trong cùng giao dịch. Trả về sự kiện mới (Event); None nếu lỗi CSDL
+    hoặc không phải chuỗi lặp lại. ValueError nếu thời gian sai.
+    """
+    occurrence_time = _normalize_time(occurrence_time, "Lần lặp được sửa")[0]
+    single = _event_fields(start_time, end_time, reminder_minutes)
+    try:
+        with get_db_connection() as conn:
+            cursor = _event_cursor(conn)
+            cursor.execute(f"SELECT {EVENT_SELECT} FROM events WHERE id = ? AND rrule IS NOT NULL", (event_id,))
+            series = cursor.fetchone()
+            if series is None or occurrence_time is None:
+                return None
+            exdates = ",".join(filter(None, (series.exdates, occurrence_time)))
+            fields = _event_fields(series.start_time, series.end_time, series.reminder_minutes, series.rrule, exdates)
+            cursor.execute(UPDATE_EVENT_SQL, (series.event_name, fields[0], fields[1], series.location,
+                                              series.reminder_minutes) + fields[2:] + (series.id,))
+            cursor.execute(INSERT_EVENT_SQL, (event_name, single[0], single[1], location, reminder_minutes) + single[2:])
+            row = _select_event(cursor, cursor.lastrowid)
+            conn.commit()
+        _notify_schedule_changed()
+        return row
+    except sqlite3.Error as e:
+        print(f"Lỗi khi sửa lần lặp: {e}")
+        return None
+
+def update_series(event_id, occurrence_time, event_name, start_time, end_time, location, reminder_minutes):
+    """
+    Sửa cả chuỗi từ 1 lần lặp của nó: `start_time`/`end_time` là thời gian mới của lần
+    `occurrence_time`. Chuỗi giữ lần đầu của chính nó, chỉ dời theo cùng độ lệch (các lần
+    bị bỏ dời theo); độ dài lấy theo lần được sửa. Trả về dòng chuỗi sau khi sửa (Event);
+    None nếu lỗi CSDL hoặc không phải chuỗi lặp lại. ValueError nếu thời gian sai.
+    """
+    occurrence_time = _normalize_time(occurrence_time, "Lần lặp được sửa")[0]
+    start_time = _normalize_time(start_time, "Thời gian bắt đầu")[0]
+    end_time = _normalize_time(end_time, "Thời gian kết thúc")[0]
+    if start_time is None:
+        raise ValueError("Thiếu thời gian bắt đầu")
+    try:
+        with get_db_connection() as conn:
+            cursor = _event_cursor(conn)
+            cursor.execute(f"SELECT {EVENT_SELECT} FROM events WHERE id = ? AND rrule IS NOT NULL", (event_id,))
+            series = cursor.fetchone()
+    except sqlite3.Error as e:
+        print(f"Lỗi khi sửa chuỗi lặp lại: {e}")
+        return None
+    if series is None or series.start_dt is None or occurrence_time is None:
+        return None
+    new_start = datetime.fromisoformat(start_time)
+    shift = new_start - datetime.fromisoformat(occurrence_time)
+    series_start = series.start_dt + shift
+    series_end = series_start + (datetime.fromisoformat(end_time) - new_start) if end_time else None
+    exdates = ",".join((dt + shift).strftime(DB_TIME_FORMAT) for dt in _parse_exdates(series.exdates))
+    return update_event(series.id, event_name, series_start, series_end, location, reminder_minutes,
+                        exdates=exdates)
+
+def _fts_match_expression(column, text):
+    """
+    Tạo biểu thức MATCH cho FTS5: mỗi từ (đã bỏ dấu) là 1 tiền tố, tất cả
+    phải xuất hiện. VD: ("hop", "Họp nhóm") -> '{...} : ("hop"* AND "nhom"*)'.
+    """
+    tokens = re.findall(r"\w+", fold_text(text))
+    if not tokens:
+        return None
+    return f'{column} : (' + " AND ".join(f'"{token}"*' for token in tokens) + ')'
+
+def _filter_window(from_date=None, to_date=None):
+    """(from_ts, to_ts) của bộ lọc (None = không giới hạn phía đó); None nếu không lọc theo thời gian."""
+    if not from_date and not to_date:
+        return None
+    # Nếu chỉ nhập ngày (độ dài <= 10): mốc đầu mặc định là đầu ngày (00:00:00),
+    # mốc cuối là cuối ngày (23:59:59). Nhập cả giờ (VD: 14:00) thì giữ nguyên để so sánh chính xác
+    from_ts = _filter_epoch(from_date, "00:00:00") if from_date else None
+    to_ts = _filter_epoch(to_date, "23:59:59") if to_date else None
+    return from_ts, to_ts
+
+def _series_window(window):
+    """Khoảng sinh lần lặp của bộ lọc: thiếu mốc cuối thì dừng sau RECURRENCE_HORIZON_DAYS ngày."""
+    from_ts, to_ts = window
+    if to_ts is None:
+        to_ts = from_ts + RECURRENCE_HORIZON_DAYS * 86400
+    return from_ts, to_ts
+
+def _build_event_filter(keyword=None, location=None, from_date=None, to_date=None, series=None):
+    """
+    Dựng phần FROM/WHERE dùng chung cho tìm kiếm, phân trang và đếm.
+    Trả về (sql, params) với sql bắt đầu bằng " FROM events e ...".
+    `series`: None = mọi dòng (chuỗi lặp lại khớp nếu khoảng của cả chuỗi giao khoảng lọc),
+    False = chỉ sự kiện 1 lần, True = chỉ chuỗi lặp lại giao khoảng sinh lần lặp (_series_window).
+    """
+    query = " FROM events e"
+    params = []
+
+    match_parts = [expr for expr in (_fts_match_expression("event_name_folded", keyword),
+                                     _fts_match_expression("location_folded", location)) if expr]
+    if match_parts:
+        query += " JOIN events_fts f ON f.rowid = e.id WHERE events_fts MATCH ?"
+        params.append(" AND ".join(match_parts))
+    else:
+        query += " WHERE 1=1"
+
+    if series is not None:
+        query += " AND e.rrule IS NOT NULL" if series else " AND e.rrule IS NULL"
+
+    # So sánh số nguyên trên index start_ts (mốc sai định dạng -> ValueError)
+    window = _filter_window(from_date, to_date)
+    if window is None:
+        return query, params
+    from_ts, to_ts = _series_window(window) if series else window
+    single, single_params, recurring, recurring_params = [], [], [], []
+    if from_ts is not None:
+        single.append("e.start_ts >= ?")
+        single_params.append(from_ts)
+        recurring.append("(e.series_end_ts IS NULL OR e.series_end_ts >= ?)")
+        recurring_params.append(from_ts)
+    if to_ts is not None:
+        single.append("e.start_ts <= ?")
+        single_params.append(to_ts)
+        recurring.append("e.start_ts <= ?")
+        recurring_params.append(to_ts)
+
+    if series is None:
+        query += f" AND ((e.rrule IS NULL AND {' AND '.join(single)}) OR (e.rrule IS NOT NULL AND {' AND '.join(recurring)}))"
+        params += single_params + recurring_params
+    elif series:
+        query += " AND " + " AND ".join(recurring)
+        params += recurring_params
+    else:
+        query += " AND " + " AND ".join(single)
+        params += single_params
+    return query, params
+
+def _series_in_window(conn, keyword, location, from_date, to_date):
+    """Các chuỗi lặp lại khớp từ khóa/địa điểm có thể có lần lặp trong khoảng lọc."""
+    where, params = _build_event_filter(keyword, location, from_date, to_date, series=True)
+    cursor = _event_cursor(conn)
+    cursor.execute(f"SELECT {EVENT_SELECT_E}" + where, params)
+    return cursor.fetchall()
 
 def search_events_advanced(keyword=None, location=None, from_date=None, to_date=None):
     """
-    Tìm kiếm nâng cao hỗ trợ chính xác từng giây (YYYY-MM-DD HH:MM:SS)
+    Tìm kiếm nâng cao hỗ trợ chính xác từng giây (YYYY-MM-DD HH:MM:SS).
+    Từ khóa/địa điểm tìm qua chỉ mục FTS5, không phân biệt dấu và theo tiền tố từ.
+    Có lọc thời gian thì chuỗi lặp lại được thay bằng các lần lặp trong khoảng lọc.
     """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = "SELECT * FROM events WHERE 1=1"
-    params = []
+    cursor = _event_cursor(conn)
+    window = _filter_window(from_date, to_date)
+
+    where, params = _build_event_filter(keyword, location, from_date, to_date, series=None if window is None else False)
+    cursor.execute(f"SELECT {EVENT_SELECT_E}" + where + " ORDER BY e.start_ts ASC, e.id ASC", params)
+    events = cursor.fetchall()
+    if window is None:
+        return events
+    occurrences = _expand_series(_series_in_window(conn, keyword, location, from_date, to_date), *_series_window(window))
+    return list(merge(events, occurrences, key=_sort_key))
+
+def get_events_page(keyword=None, location=None, from_date=None, to_date=None,
+                    after=None, limit=100):
+    """
+    Lấy 1 trang sự kiện theo thứ tự (start_ts, id) bằng keyset cursor.
+
+    `after` là khóa (start_ts, id) của dòng cuối trang trước (None = trang
+    đầu). Không dùng OFFSET nên trang thứ N vẫn chỉ tốn 1 lần dò index.
+    Có lọc thời gian thì chuỗi lặp lại được thay bằng các lần lặp (cùng id, khác start_ts).
+    Trả về (events, next_after); next_after là None khi đã hết dữ liệu.
+    """
+    window = _filter_window(from_date, to_date)
+    where, params = _build_event_filter(keyword, location, from_date, to_date, series=None if window is None else False)
+    if after is not None and after[0] is None:
+        # Trang trước kết thúc trong nhóm dòng thiếu start_ts (NULL, xếp đầu)
+        where += " AND (e.start_ts IS NOT NULL OR e.id > ?)"
+        params.append(after[1])
+    elif after is not None:
+        where += " AND e.start_ts >= ? AND (e.start_ts > ? OR e.id > ?)"
+        params.extend([after[0], after[0], after[1]])
+    sql = f"SELECT {EVENT_SELECT_E}" + where + " ORDER BY e.start_ts ASC, e.id ASC LIMIT ?"
+    params.append(limit)
+    try:
+        with get_db_connection() as conn:
+            cursor = _event_cursor(conn)
+            cursor.execute(sql, params)
+            events = cursor.fetchall()
+            if window is not None:
+                series = _series_in_window(conn, keyword, location, from_date, to_date)
+                if series:
+                    occurrences = _expand_series(series, *_series_window(window), after=after, limit=limit)
+                    events = list(islice(merge(events, occurrences, key=_sort_key), limit))
+    except sqlite3.Error as e:
+        print(f"Lỗi khi lấy trang sự kiện: {e}")
+        return [], None
+    next_after = (events[-1].start_ts, events[-1].id) if len(events) == limit else None
+    return events, next_after
+
+def event_matches_filter(event_id, keyword=None, location=None, from_date=None, to_date=None):
+    """Kiểm tra 1 sự kiện có khớp bộ lọc hiện tại của GUI không (tra theo id)."""
+    where, params = _build_event_filter(keyword, location, from_date, to_date)
+    params.append(event_id)
+    window = _filter_window(from_date, to_date)
+    try:
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT e.rrule" + where + " AND e.id = ?", params).fetchone()
+            if row is None or row[0] is None or window is None:
+                return row is not None
+            # Chuỗi lặp lại: khớp khi có ít nhất 1 lần lặp trong khoảng lọc
+            cursor = _event_cursor(conn)
+            cursor.execute(f"SELECT {EVENT_SELECT} FROM events WHERE id = ?", (event_id,))
+            occurrences = _iter_series_occurrences(cursor.fetchone(), *_series_window(window))
+            return next(occurrences, None) is not None
+    except sqlite3.Error as e:
+        print(f"Lỗi khi kiểm tra bộ lọc: {e}")
+        return False
+
+def count_events(keyword=None, location=None, from_date=None, to_date=None):
+    """Đếm số sự kiện khớp bộ lọc (có cache, tự làm mới khi lịch thay đổi); mỗi lần lặp tính là 1."""
+    key = (keyword or None, location or None, from_date or None, to_date or None)
+    if key in _count_cache:
+        return _count_cache[key]
+    version = _schedule_version
+    window = _filter_window(from_date, to_date)
+    where, params = _build_event_filter(keyword, location, from_date, to_date, series=None if window is None else False)
+    try:
+        with get_db_connection() as conn:
+            total = conn.execute("SELECT COUNT(*)" + where, params).fetchone()[0]
+            if window is not None:
+                series = _series_in_window(conn, keyword, location, from_date, to_date)
+                total += sum(1 for _ in _expand_series(series, *_series_window(window)))
+    except sqlite3.Error as e:
+        print(f"Lỗi khi đếm sự kiện: {e}")
+        return 0
+    # Lịch thay đổi trong lúc đếm -> không lưu kết quả có thể đã cũ
+    if version == _schedule_version:
+        _count_cache[key] = total
+    return total
+
+# --- Trùng lịch và giờ rảnh ---
+_interval_index = None  # CSDL có bảng R*Tree 'events_interval' không (kiểm tra 1 lần)
+
+def _has_interval_index(conn):
+    global _interval_index
+    if _interval_index is None:
+        _interval_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'events_interval'").fetchone() is not None
+    return _interval_index
+
+def _busy_range(start_time, end_time):
+    """(start_ts, busy_end) của khoảng cần kiểm tra; ValueError nếu thời gian sai."""
+    start_time, start_ts = _normalize_time(start_time, "Thời gian bắt đầu")
+    if start_time is None:
+        raise ValueError("Thiếu thời gian bắt đầu")
+    end_ts = _normalize_time(end_time, "Thời gian kết thúc")[1]
+    if end_ts is None or end_ts <= start_ts:
+        end_ts = start_ts + DEFAULT_EVENT_MINUTES * 60
+    return start_ts, end_ts
+
+def _busy_end(event):
+    """Hết khoảng bận của 1 sự kiện/lần lặp (epoch), cùng quy ước với BUSY_END_SQL."""
+    if event.end_ts is not None and event.end_ts > event.start_ts:
+        return event.end_ts
+    return event.start_ts + DEFAULT_EVENT_MINUTES * 60
+
+def _busy_events(conn, start_ts, end_ts, exclude_id=None):
+    """Các sự kiện/lần lặp có khoảng bận chồng lấn [start_ts, end_ts), theo (start_ts, id)."""
+    if _has_interval_index(conn):
+        # R*Tree lưu tọa độ dạng float32 (làm tròn ra ngoài) nên chỉ lọc thô,
+        # điều kiện chính xác kiểm tra lại trên cột epoch của 'events'
+        query = (" FROM events_interval r JOIN events e ON e.id = r.id"
+                 " WHERE r.start_ts <= ? AND r.busy_end >= ? AND")
+        params = [end_ts, start_ts]
+    else:
+        # Không có R*Tree: index start_ts chỉ chặn được mốc cuối
+        query = " FROM events e WHERE"
+        params = []
+    # Cùng khoảng với chỉ mục: chuỗi lặp lại bị chặn bởi lần cuối (series_end_ts)
+    query += f" e.start_ts < ? AND {INTERVAL_END_SQL} > ?"
+    params.extend([end_ts, start_ts])
+    if exclude_id is not None:
+        query += " AND e.id != ?"
+        params.append(exclude_id)
+    cursor = _event_cursor(conn)
+    cursor.execute(f"SELECT {EVENT_SELECT_E}" + query + " ORDER BY e.start_ts ASC, e.id ASC", params)
+    events, occurrences = [], []
+    for event in cursor:
+        if event.rrule is None:
+            events.append(event)
+            continue
+        # Lần lặp chồng lấn khi bắt đầu trong (start_ts - độ dài, end_ts)
+        duration = _busy_end(event) - event.start_ts
+        occurrences.append(_iter_series_occurrences(event, start_ts - duration + 1, end_ts - 1))
+    if not occurrences:
+        return events
+    return list(merge(events, *occurrences, key=_sort_key))
+
+def find_overlapping(start_time, end_time=None, exclude_id=None):
+    """
+    Các sự kiện (Event) trùng với khoảng [start_time, end_time), theo thời gian bắt đầu.
+    Không có end_time thì khoảng dài DEFAULT_EVENT_MINUTES. `exclude_id`: bỏ qua
+    chính sự kiện đang sửa/vừa thêm. ValueError nếu thời gian sai định dạng.
+    """
+    start_ts, end_ts = _busy_range(start_time, end_time)
+    try:
+        with get_db_connection() as conn:
+            return _busy_events(conn, start_ts, end_ts, exclude_id)
+    except sqlite3.Error as e:
+        print(f"Lỗi khi tìm sự kiện trùng lịch: {e}")
+        return []
+
+def find_free_slots(from_time, to_time, min_minutes=60, limit=None):
+    """
+    Các khoảng trống trong [from_time, to_time) dài ít nhất `min_minutes` phút.
+    Trả về list (start_time, end_time) dạng 'YYYY-MM-DD HH:MM:SS', theo thứ tự thời gian;
+    tối đa `limit` khoảng (None = tất cả). ValueError nếu thời gian sai định dạng.
+    """
+    start_ts = _normalize_time(from_time, "Thời gian bắt đầu")[1]
+    end_ts = _normalize_time(to_time, "Thời gian kết thúc")[1]
+    if start_ts is None or end_ts is None:
+        raise ValueError("Thiếu khoảng thời gian cần tìm")
+    min_seconds = max(int(min_minutes), 1) * 60
+    slots = []
+    cursor_ts = start_ts
+    try:
+        with get_db_connection() as conn:
+            for event in _busy_events(conn, start_ts, end_ts):
+                if event.start_ts - cursor_ts >= min_seconds:
+                    slots.append((_from_epoch(cursor_ts), _from_epoch(event.start_ts)))
+                    if limit is not None and len(slots) >= limit:
+                        return slots
+                cursor_ts = max(cursor_ts, _busy_end(event))
+    except sqlite3.Error as e:
+        print(f"Lỗi khi tìm giờ rảnh: {e}")
+        return []
+    if end_ts - cursor_ts >= min_seconds:
+        slots.append((_from_epoch(cursor_ts), _from_epoch(end_ts)))
+    return slots
 
-    if keyword:
-        query += " AND event_name LIKE ?"
-        params.append(f"%{keyword}%")
-    
-    if location:
-        query += " AND location LIKE ?"
-        params.append(f"%{location}%")
-    
-    if from_date:
-        # Nếu chỉ nhập ngày (độ dài <= 10), mặc định là đầu ngày (00:00:00)
-        if len(from_date) <= 10:
-            from_date += " 00:00:00"
-        query += " AND start_time >= ?"
-        params.append(from_date)
-    
-    if to_date:
-        # Nếu chỉ nhập ngày, mặc định là cuối ngày (23:59:59)
-        if len(to_date) <= 10:
-            to_date += " 23:59:59"
-        # Nếu người dùng nhập giờ (VD: 14:00), giữ nguyên để so sánh chính xác
-        query += " AND start_time <= ?"
-        params.append(to_date)
-
-    query += " ORDER BY start_time ASC"
-
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    
-    events = []
-    for row in rows:
-        events.append({
-            "id": row[0],
-            "event_name": row[1],
-            "start_time": row[2],
-            "end_time": row[3],
-            "location": row[4],
-            "reminder_minutes": row[5]
-        })
-    
-    conn.close()
-    return events
 if __name__ == "__main__":
     print("Đang khởi tạo cơ sở dữ liệu (và nâng cấp nếu cần)...")
     init_db()
\ No newline at end of file
@@ -1,63 +1,255 @@
+import gzip
 import json
-import ics
 import datetime
+from itertools import chain
 
 try:
     from . import database
+    from .settings import get_timezone_name
 except ImportError:
     import database
+    from settings import get_timezone_name
 
-def export_to_json(filepath: str) -> bool:
-    """Lấy tất cả sự kiện và lưu vào file JSON."""
+# Các kiểu xuất JSON:
+#   "pretty": mảng JSON thụt lề 4 (như trước đây, dễ đọc)
+#   "compact": mảng JSON không khoảng trắng thừa (file nhỏ nhất)
+#   "ndjson": mỗi dòng 1 sự kiện (dễ xử lý dần, nhập lại bằng importer)
+JSON_FORMATS = ("pretty", "compact", "ndjson")
+# Số sự kiện lấy từ cursor mỗi lần
+EXPORT_BATCH_SIZE = 500
+
+def _open_output(filepath, compress):
+    """Mở file để ghi văn bản UTF-8; nén gzip nếu `compress`."""
+    if compress:
+        return gzip.open(filepath, 'wt', encoding='utf-8')
+    return open(filepath, 'w', encoding='utf-8')
+
+def _json_format_for(filepath):
+    base = filepath[:-3] if filepath.lower().endswith('.gz') else filepath
+    return "ndjson" if base.lower().endswith('.ndjson') else "pretty"
+
+# Tạo sẵn encoder để không dựng lại cho mỗi sự kiện
+_COMPACT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+# Encoder có indent chạy bằng Python thuần (chậm); với dict phẳng, dùng encoder C
+# với dấu phân cách ",\n        " rồi thêm xuống dòng ở 2 đầu là ra cùng kết quả.
+_PRETTY_ITEM_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',\n        ', ': '))
+
+def _encode_pretty_event(event):
+    """1 sự kiện (dict phẳng) -> JSON như 1 phần tử của json.dump(..., indent=4)."""
+    return "{\n        " + _PRETTY_ITEM_ENCODER.encode(event)[1:-1] + "\n    }"
+
+def _write_json_events(f, events, fmt):
+    """Ghi dần từng sự kiện ra file, không dựng cả tài liệu JSON trong bộ nhớ."""
+    if fmt == "ndjson":
+        encode = _COMPACT_ENCODER.encode
+        f.writelines(encode(event) + "\n" for event in events)
+        return
+    if fmt == "pretty":
+        encode = _encode_pretty_event
+        first_sep, sep, end = "[\n    ", ",\n    ", "\n]"
+    else:
+        encode = _COMPACT_ENCODER.encode
+        first_sep, sep, end = "[", ",", "]"
+    events = iter(events)
+    first = next(events, None)
+    if first is None:
+        f.write("[]")
+        return
+    f.write(first_sep + encode(first))
+    f.writelines(sep + encode(event) for event in events)
+    f.write(end)
+
+def export_to_json(filepath: str, fmt: str = None, from_date=None, to_date=None, compress: bool = None) -> bool:
+    """
+    Xuất sự kiện ra file JSON, đọc dần từ cursor nên bộ nhớ không tăng theo số sự kiện.
+    `fmt`: "pretty" | "compact" | "ndjson" (mặc định theo đuôi file: .ndjson -> ndjson).
+    `from_date`/`to_date`: chỉ xuất sự kiện trong khoảng này (như bộ lọc tìm kiếm).
+    `compress`: nén gzip (mặc định: khi tên file kết thúc bằng .gz).
+    """
+    fmt = fmt or _json_format_for(filepath)
+    if fmt not in JSON_FORMATS:
+        print(f"Lỗi khi xuất JSON: kiểu không hợp lệ {fmt!r}")
+        return False
+    if compress is None:
+        compress = filepath.lower().endswith('.gz')
     try:
-        events = database.get_all_events()
-        with open(filepath, 'w', encoding='utf-8') as f:
+        events = database.iter_events(from_date, to_date, batch_size=EXPORT_BATCH_SIZE)
+        with _open_output(filepath, compress) as f:
             # ensure_ascii=False để giữ tiếng Việt
-            json.dump(events, f, ensure_ascii=False, indent=4)
+            _write_json_events(f, map(database.Event.to_dict, events), fmt)
         return True
     except Exception as e:
         print(f"Lỗi khi xuất JSON: {e}")
         return False
 
-def export_to_ics(filepath: str) -> bool:
-    """Lấy tất cả sự kiện và lưu vào file .ics (iCalendar)."""
+# --- iCalendar (RFC 5545) ---
+# Ghi thẳng từng VEVENT từ cursor ra file, không dựng cây đối tượng lịch trong bộ nhớ.
+ICS_PRODID = "-//TroLyLichTrinh//Tro Ly Lich Trinh//VI"
+ICS_UID_DOMAIN = "trolylichtrinh"
+ICS_LINE_OCTETS = 75  # Mỗi dòng tối đa 75 byte (không kể CRLF), dài hơn thì gập dòng
+ICS_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", ";": "\\;", ",": "\\,", "\n": "\\n", "\r": None})
+
+def _ics_escape(text):
+    """Thoát ký tự đặc biệt trong giá trị TEXT: \\ ; , và xuống dòng."""
+    return str(text).translate(ICS_TEXT_ESCAPES)
+
+def _ics_fold(line):
+    """Gập dòng dài: tách theo byte UTF-8 (không cắt đôi ký tự), dòng tiếp theo bắt đầu bằng 1 dấu cách."""
+    if len(line) * 4 <= ICS_LINE_OCTETS or len(line.encode('utf-8')) <= ICS_LINE_OCTETS:
+        return line + "\r\n"
+    parts = []
+    start, size, limit = 0, 0, ICS_LINE_OCTETS
+    for i, char in enumerate(line):
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > limit:
+            parts.append(line[start:i])
+            start, size, limit = i, 0, ICS_LINE_OCTETS - 1  # Chừa 1 byte cho dấu cách đầu dòng
+        size += char_size
+    parts.append(line[start:])
+    return "\r\n ".join(parts) + "\r\n"
+
+ICS_LOCAL_FORMAT = "%Y%m%dT%H%M%S"  # Giờ địa phương "trôi nổi", không múi giờ
+
+def _ics_time(value):
+    """'2025-06-01 09:00:00' -> '20250601T090000'."""
+    return datetime.datetime.fromisoformat(value).strftime(ICS_LOCAL_FORMAT)
+
+def _ics_utc_time(value):
+    """Giờ địa phương trong CSDL -> giờ UTC dạng '20250601T020000Z' (cho DTSTAMP/LAST-MODIFIED)."""
+    return datetime.datetime.fromisoformat(value).astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def _ics_event_lines(event, exported_at):
+    """1 sự kiện (Event) -> các dòng của khối VEVENT; None nếu thiếu/sai thời gian bắt đầu."""
+    if event.start_dt is None:
+        return None  # Bỏ qua nếu thời gian lỗi
     try:
-        events = database.get_all_events()
-        c = ics.Calendar() # Tạo 1 lịch mới
-
-        for event in events:
-            # Bỏ qua nếu không có thời gian
-            if not event.get('start_time'):
-                continue
-            
-            e = ics.Event()
-            e.name = event['event_name']
-            
-            try:
-                # Chuyển đổi chuỗi ISO thành datetime
-                e.begin = datetime.datetime.fromisoformat(event['start_time'])
-            except Exception:
-                continue # Bỏ qua nếu thời gian lỗi
-
-            if event.get('end_time'):
-                try:
-                    e.end = datetime.datetime.fromisoformat(event['end_time'])
-                except Exception:
-                    pass # Bỏ qua nếu end_time lỗi
-
-            e.location = event.get('location')
-            
-            # Thêm thông tin nhắc nhở vào phần mô tả
-            if event.get('reminder_minutes', 0) > 0:
-                e.description = f"Nhắc trước {event['reminder_minutes']} phút."
-            
-            c.events.add(e) # Thêm sự kiện vào lịch
-
-        # Ghi ra file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.writelines(c.serialize_iter()) # Dùng .serialize_iter()
-            
+        modified = _ics_utc_time(event.updated_at) if event.updated_at else None
+    except ValueError:
+        modified = None
+    lines = [
+        "BEGIN:VEVENT",
+        # UID cố định theo id: nhập lại vào ứng dụng lịch sẽ cập nhật, không nhân bản sự kiện
+        f"UID:event-{event.id}@{ICS_UID_DOMAIN}",
+        f"DTSTAMP:{modified or exported_at}",
+        f"DTSTART:{event.start_dt.strftime(ICS_LOCAL_FORMAT)}",
+    ]
+    if event.sequence:
+        lines.append(f"SEQUENCE:{event.sequence}")  # Số lần sửa: lịch đích lấy bản có SEQUENCE lớn hơn
+    # DTEND phải sau DTSTART; bỏ qua nếu end_time lỗi
+    if event.end_dt is not None and event.end_dt > event.start_dt:
+        lines.append(f"DTEND:{event.end_dt.strftime(ICS_LOCAL_FORMAT)}")
+    if event.rrule:
+        # Chuỗi lặp lại xuất 1 lần kèm luật, lịch đích tự sinh các lần lặp
+        lines.append(f"RRULE:{event.rrule}")
+        if event.exdates:
+            lines.append("EXDATE:" + ",".join(map(_ics_time, event.exdates.split(","))))
+    if modified:
+        lines.append(f"LAST-MODIFIED:{modified}")
+    lines.append(f"SUMMARY:{_ics_escape(event.event_name)}")
+    if event.location:
+        lines.append(f"LOCATION:{_ics_escape(event.location)}")
+
+    reminder_minutes = event.reminder_minutes or 0
+    if reminder_minutes > 0:
+        # Mô tả giữ như bản cũ; VALARM để ứng dụng lịch tự nhắc
+        description = _ics_escape(f"Nhắc trước {reminder_minutes} phút.")
+        lines += [
+            f"DESCRIPTION:{description}",
+            "BEGIN:VALARM",
+            "ACTION:DISPLAY",
+            f"DESCRIPTION:{_ics_escape(event.event_name)}",
+            f"TRIGGER:-PT{reminder_minutes}M",
+            "END:VALARM",
+        ]
+    lines.append("END:VEVENT")
+    return lines
+
+def _ics_cancelled_lines(deleted):
+    """Sự kiện đã xóa (bia mộ) -> khối VEVENT STATUS:CANCELLED để lịch đích xóa theo UID."""
+    try:
+        start = _ics_time(deleted['start_time'])
+        deleted_at = _ics_utc_time(deleted['deleted_at'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return [
+        "BEGIN:VEVENT",
+        f"UID:event-{deleted['id']}@{ICS_UID_DOMAIN}",
+        f"DTSTAMP:{deleted_at}",
+        f"DTSTART:{start}",
+        f"SEQUENCE:{deleted['sequence']}",
+        "STATUS:CANCELLED",
+        f"SUMMARY:{_ics_escape(deleted['event_name'] or '')}",
+        "END:VEVENT",
+    ]
+
+def _write_ics_calendar(f, blocks):
+    """Ghi VCALENDAR chứa các khối VEVENT (mỗi khối là list dòng chưa gập, None = bỏ qua)."""
+    # Giờ ghi dạng "trôi nổi"; X-WR-TIMEZONE báo múi giờ của lịch cho Google/Apple Calendar
+    f.write(f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{ICS_PRODID}\r\nCALSCALE:GREGORIAN\r\n"
+            f"X-WR-TIMEZONE:{get_timezone_name()}\r\n")
+    for lines in blocks:
+        if lines:
+            f.write("".join(map(_ics_fold, lines)))
+    f.write("END:VCALENDAR\r\n")
+
+def _open_ics_output(filepath):
+    # newline='': RFC 5545 yêu cầu CRLF, không để Python đổi ký tự xuống dòng
+    return open(filepath, 'w', encoding='utf-8', newline='')
+
+def _ics_now():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def export_to_ics(filepath: str, from_date=None, to_date=None, changed_since=None) -> bool:
+    """
+    Xuất sự kiện ra file .ics (iCalendar), ghi dần từng sự kiện từ cursor.
+    `from_date`/`to_date`: chỉ xuất sự kiện trong khoảng này.
+    `changed_since`: chỉ xuất sự kiện thêm/sửa từ thời điểm này (xuất bổ sung).
+    """
+    exported_at = _ics_now()
+    try:
+        events = database.iter_events(from_date, to_date, changed_since, batch_size=EXPORT_BATCH_SIZE)
+        with _open_ics_output(filepath) as f:
+            _write_ics_calendar(f, (_ics_event_lines(event, exported_at) for event in events))
         return True
     except Exception as e:
         print(f"Lỗi khi xuất ICS: {e}")
-        return False
\ No newline at end of file
+        return False
+
+# --- Xuất phần thay đổi (delta) để đồng bộ ---
+def export_changes(filepath: str, since: int = None, target: str = None):
+    """
+    Chỉ xuất các sự kiện thêm/sửa/xóa sau mốc `since` (giá trị bộ đếm thay đổi),
+    nên mỗi lần đồng bộ tốn O(số thay đổi) thay vì O(cả lịch).
+    - File .ics: sự kiện thêm/sửa kèm SEQUENCE, sự kiện đã xóa có STATUS:CANCELLED.
+    - File JSON (.json, có thể .gz): {"since", "watermark", "changed": [...], "deleted": [...]}.
+    `target`: tên đích đồng bộ; khi có, mốc được đọc (nếu không truyền `since`) và
+    lưu lại sau khi xuất xong, để lần sau tự tiếp tục từ đó.
+    Trả về mốc mới (int) để dùng cho lần sau; None nếu lỗi.
+    """
+    try:
+        if since is None:
+            since = database.get_sync_watermark(target) if target else 0
+        # Chốt mốc TRƯỚC khi đọc: thay đổi xảy ra trong lúc xuất sẽ thuộc lần sau
+        watermark = database.get_change_watermark()
+        changed = database.iter_changed_events(since, watermark, batch_size=EXPORT_BATCH_SIZE)
+        deleted = database.iter_deleted_events(since, watermark, batch_size=EXPORT_BATCH_SIZE)
+        if filepath.lower().endswith('.ics'):
+            exported_at = _ics_now()
+            with _open_ics_output(filepath) as f:
+                _write_ics_calendar(f, chain(
+                    (_ics_event_lines(event, exported_at) for event in changed),
+                    map(_ics_cancelled_lines, deleted),
+                ))
+        else:
+            with _open_output(filepath, filepath.lower().endswith('.gz')) as f:
+                f.write(f'{{"since":{since},"watermark":{watermark},"changed":')
+                _write_json_events(f, map(database.Event.to_dict, changed), "compact")
+                f.write(',"deleted":')
+                _write_json_events(f, deleted, "compact")
+                f.write("}")
+    except Exception as e:
+        print(f"Lỗi khi xuất thay đổi: {e}")
+        return None
+    if target and not database.set_sync_watermark(target, watermark):
+        return None
+    return watermark
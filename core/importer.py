@@ -0,0 +1,319 @@
+import csv
+import json
+import re
+import time
+import datetime
+from zoneinfo import ZoneInfo
+
+try:
+    from . import database
+    from .settings import get_timezone
+    from .recurrence import parse_rule
+except ImportError:
+    import database
+    from settings import get_timezone
+    from recurrence import parse_rule
+
+# Gọi callback tiến độ sau mỗi ngần này dòng đã đọc
+PROGRESS_EVERY = 1000
+# Số lỗi mẫu giữ lại trong báo cáo (để hiển thị cho người dùng)
+MAX_ERROR_SAMPLES = 20
+# Kích thước mỗi lần đọc file JSON
+JSON_CHUNK_SIZE = 1 << 16
+
+DB_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Các dạng ngày giờ ngoài ISO 8601 được chấp nhận (CSV gõ tay)
+EXTRA_TIME_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+
+
+# --- Chuẩn hóa & kiểm tra 1 bản ghi ---
+def _normalize_timestamp(value):
+    """Chuỗi/datetime -> 'YYYY-MM-DD HH:MM:SS' theo múi giờ của lịch; None nếu rỗng. ValueError nếu sai."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.datetime):
+        dt = value
+    else:
+        text = str(value).strip()
+        try:
+            dt = datetime.datetime.fromisoformat(text)
+        except ValueError:
+            for fmt in EXTRA_TIME_FORMATS:
+                try:
+                    dt = datetime.datetime.strptime(text, fmt)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"thời gian không hợp lệ: {text!r}")
+    if dt.tzinfo is not None:
+        # Giờ có múi giờ -> đổi về giờ địa phương theo múi giờ của lịch (CSDL lưu giờ không múi giờ)
+        dt = dt.astimezone(get_timezone()).replace(tzinfo=None)
+    return dt.strftime(DB_TIME_FORMAT)
+
+def _normalize_record(record):
+    """
+    Bản ghi thô (dict) -> bộ (event_name, start_time, end_time, location, reminder_minutes,
+    rrule, exdates); rrule/exdates là None với sự kiện không lặp lại.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("bản ghi không phải đối tượng")
+    name = str(record.get("event_name") or record.get("event") or "").strip()
+    if not name:
+        raise ValueError("thiếu tên sự kiện")
+    start_time = _normalize_timestamp(record.get("start_time"))
+    if start_time is None:
+        raise ValueError("thiếu thời gian bắt đầu")
+    end_time = _normalize_timestamp(record.get("end_time"))
+    if end_time is not None and end_time < start_time:
+        raise ValueError("thời gian kết thúc trước thời gian bắt đầu")
+    location = str(record.get("location") or "").strip() or None
+    try:
+        reminder_minutes = int(record.get("reminder_minutes") or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"số phút nhắc không hợp lệ: {record.get('reminder_minutes')!r}")
+    if reminder_minutes < 0:
+        raise ValueError("số phút nhắc âm")
+    rrule = str(record.get("rrule") or "").strip() or None
+    exdates = None
+    if rrule:
+        rrule = str(parse_rule(rrule))
+        exdates = record.get("exdates") or []
+        if isinstance(exdates, str):
+            exdates = exdates.split(",")
+        exdates = ",".join(sorted({_normalize_timestamp(value) for value in exdates} - {None})) or None
+    return name, start_time, end_time, location, reminder_minutes, rrule, exdates
+
+
+# --- Đọc dần từng bản ghi từ file ---
+def _iter_json_records(f):
+    """
+    Đọc dần các đối tượng JSON: cả mảng (file do export_to_json tạo) lẫn
+    NDJSON (mỗi dòng 1 đối tượng), không nạp cả file vào bộ nhớ.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    while True:
+        # Bỏ khoảng trắng và ký tự phân cách của mảng ngoài cùng
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                return
+            buffer, pos = f.read(JSON_CHUNK_SIZE), 0
+            eof = not buffer
+            continue
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Đối tượng bị cắt ngang ở cuối bộ đệm -> đọc thêm rồi thử lại
+            chunk = f.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield record
+
+ICS_TEXT_ESCAPE = re.compile(r"\\([\\;,nN])")
+ICS_DURATION = re.compile(r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+# Mô tả do export_to_ics ghi: "Nhắc trước 15 phút."
+ICS_REMINDER_DESCRIPTION = re.compile(r"Nhắc trước (\d+) phút")
+
+def _ics_unescape(value):
+    return ICS_TEXT_ESCAPE.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+def _ics_split_property(line):
+    """'DTSTART;TZID=Asia/Ho_Chi_Minh:20250101T090000' -> ('DTSTART', {'TZID': ...}, '2025...')."""
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return None
+    name, *params = head.split(";")
+    return name.upper(), dict(p.split("=", 1) for p in params if "=" in p), value
+
+def _ics_datetime(value, params):
+    """Giá trị DATE / DATE-TIME của iCalendar -> datetime (có múi giờ nếu file ghi rõ)."""
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.datetime.strptime(value[:8], "%Y%m%d")
+    if value.endswith("Z"):
+        return datetime.datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=datetime.timezone.utc)
+    dt = datetime.datetime.strptime(value, "%Y%m%dT%H%M%S")
+    tzid = params.get("TZID", "").strip('"')
+    return dt.replace(tzinfo=ZoneInfo(tzid)) if tzid else dt  # Không TZID: giờ "trôi nổi" = giờ địa phương
+
+def _ics_trigger_minutes(value, params):
+    """TRIGGER:-PT15M -> 15 (chỉ nhận nhắc TRƯỚC giờ bắt đầu)."""
+    match = ICS_DURATION.fullmatch(value.strip())
+    if params.get("RELATED", "START") != "START" or not match or match.group(1) == "+":
+        return None
+    weeks, days, hours, minutes, seconds = (int(g or 0) for g in match.groups()[1:])
+    return ((weeks * 7 + days) * 24 + hours) * 60 + minutes + (seconds + 59) // 60
+
+def _iter_ics_records(f):
+    """Đọc dần từng VEVENT (gộp dòng gập theo RFC 5545) -> dict như bản ghi JSON."""
+    def unfolded_lines():
+        pending = None
+        for raw in f:
+            line = raw.rstrip("\r\n")
+            if line[:1] in (" ", "\t") and pending is not None:
+                pending += line[1:]
+                continue
+            if pending is not None:
+                yield pending
+            pending = line
+        if pending is not None:
+            yield pending
+
+    record, in_alarm = None, False
+    for line in unfolded_lines():
+        parsed = _ics_split_property(line)
+        if parsed is None:
+            continue
+        name, params, value = parsed
+        if name == "BEGIN":
+            if value.upper() == "VEVENT":
+                record, in_alarm = {}, False
+            elif value.upper() == "VALARM":
+                in_alarm = True
+        elif name == "END":
+            if value.upper() == "VALARM":
+                in_alarm = False
+            elif value.upper() == "VEVENT" and record is not None:
+                # Sự kiện đã hủy (VD file delta báo xóa) thì không nhập
+                if record.pop("cancelled", False) is False:
+                    yield record
+                record = None
+        elif record is None:
+            continue
+        elif in_alarm:
+            if name == "TRIGGER" and "reminder_minutes" not in record:
+                minutes = _ics_trigger_minutes(value, params)
+                if minutes is not None:
+                    record["reminder_minutes"] = minutes
+        elif name == "SUMMARY":
+            record["event_name"] = _ics_unescape(value)
+        elif name == "LOCATION":
+            record["location"] = _ics_unescape(value)
+        elif name in ("DTSTART", "DTEND"):
+            try:
+                record["start_time" if name == "DTSTART" else "end_time"] = _ics_datetime(value, params)
+            except (ValueError, KeyError):
+                record["start_time" if name == "DTSTART" else "end_time"] = value
+        elif name == "RRULE":
+            record["rrule"] = value
+        elif name == "EXDATE":
+            exdates = record.setdefault("exdates", [])
+            for item in value.split(","):
+                try:
+                    exdates.append(_ics_datetime(item, params))
+                except (ValueError, KeyError):
+                    exdates.append(item)
+        elif name == "STATUS":
+            record["cancelled"] = value.strip().upper() == "CANCELLED"
+        elif name == "DESCRIPTION":
+            match = ICS_REMINDER_DESCRIPTION.search(_ics_unescape(value))
+            if match:
+                record.setdefault("reminder_minutes", int(match.group(1)))
+
+def _iter_csv_records(f):
+    """CSV có dòng tiêu đề (event_name, start_time, end_time, location, reminder_minutes[, rrule, exdates])."""
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    for row in csv.DictReader(f, dialect=dialect):
+        yield {key.strip().lower(): value for key, value in row.items() if key}
+
+
+# --- Nhập vào CSDL ---
+def _import_records(records, dry_run=False, progress=None):
+    """
+    Kiểm tra, chống trùng và ghi các bản ghi trong 1 giao dịch.
+    Trả về báo cáo (dict); `progress(report)` được gọi định kỳ trong lúc đọc.
+    """
+    report = {
+        "read": 0, "new": 0, "duplicates": 0, "invalid": 0, "inserted": 0,
+        "errors": [], "dry_run": dry_run, "elapsed_seconds": 0.0, "rows_per_second": 0.0,
+    }
+    started = time.perf_counter()
+
+    def update_rate():
+        report["elapsed_seconds"] = time.perf_counter() - started
+        if report["elapsed_seconds"] > 0:
+            report["rows_per_second"] = report["read"] / report["elapsed_seconds"]
+
+    # Chống trùng theo (tên, thời gian bắt đầu): với dữ liệu đã có VÀ trong chính file
+    seen = database.get_event_keys()
+
+    def valid_rows():
+        for number, record in enumerate(records, 1):
+            report["read"] = number
+            if progress and number % PROGRESS_EVERY == 0:
+                update_rate()
+                progress(report)
+            try:
+                row = _normalize_record(record)
+            except ValueError as e:
+                report["invalid"] += 1
+                if len(report["errors"]) < MAX_ERROR_SAMPLES:
+                    report["errors"].append(f"Bản ghi {number}: {e}")
+                continue
+            key = (row[0], row[1])
+            if key in seen:
+                report["duplicates"] += 1
+                continue
+            seen.add(key)
+            report["new"] += 1
+            yield row
+
+    if dry_run:
+        for _ in valid_rows():
+            pass
+    else:
+        inserted = database.add_events_bulk(valid_rows())
+        if inserted is None:
+            raise RuntimeError("Không ghi được vào CSDL, đã hủy toàn bộ lần nhập")
+        report["inserted"] = inserted
+
+    update_rate()
+    if progress:
+        progress(report)
+    print(f"[Importer] Đọc {report['read']} bản ghi, thêm {report['inserted']}, trùng {report['duplicates']}, "
+          f"lỗi {report['invalid']} ({report['rows_per_second']:.0f} bản ghi/giây)")
+    return report
+
+def _run_import(reader, filepath, label, dry_run, progress, **open_kwargs):
+    try:
+        with open(filepath, encoding="utf-8-sig", **open_kwargs) as f:
+            return _import_records(reader(f), dry_run, progress)
+    except Exception as e:
+        print(f"Lỗi khi nhập {label}: {e}")
+        return None
+
+def import_from_json(filepath: str, dry_run: bool = False, progress=None):
+    """Nhập sự kiện từ file JSON (mảng như export_to_json, hoặc NDJSON). Trả về báo cáo; None nếu lỗi."""
+    return _run_import(_iter_json_records, filepath, "JSON", dry_run, progress)
+
+def import_from_ics(filepath: str, dry_run: bool = False, progress=None):
+    """Nhập các VEVENT từ file .ics (iCalendar). Trả về báo cáo; None nếu lỗi."""
+    return _run_import(_iter_ics_records, filepath, "ICS", dry_run, progress)
+
+def import_from_csv(filepath: str, dry_run: bool = False, progress=None):
+    """Nhập sự kiện từ file CSV có dòng tiêu đề. Trả về báo cáo; None nếu lỗi."""
+    return _run_import(_iter_csv_records, filepath, "CSV", dry_run, progress, newline="")
+
+IMPORTERS = {
+    ".json": import_from_json,
+    ".ndjson": import_from_json,
+    ".ics": import_from_ics,
+    ".csv": import_from_csv,
+}
@@ -0,0 +1,216 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    from .settings import APP_DATA_DIR
+except ImportError:
+    from settings import APP_DATA_DIR
+
+# --- Đo hiệu năng trong ứng dụng ---
+# Tắt (mặc định): không hàm nào bị bọc, các điểm đo thủ công (quét nhắc nhở, vẽ lại
+# bảng) chỉ tốn 1 lần gọi hàm trả về ngay. Bật: mọi hàm public của core.database và
+# process_nlp được bọc bộ đếm thời gian, từng bước của process_nlp được ghi qua
+# StageTimer; p50/p95 tính trên ROLLING_WINDOW mẫu gần nhất của mỗi chỉ số.
+
+# Log nằm cùng thư mục dữ liệu với CSDL (settings.APP_DATA_DIR)
+LOG_PATH = os.path.join(APP_DATA_DIR, 'metrics.log')
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+ROLLING_WINDOW = 500
+# Thao tác chậm hơn ngưỡng này được ghi riêng từng lần vào log
+SLOW_SECONDS = 0.2
+# Không bọc: fold_text là hàm SQL gọi cho từng dòng, get_db_connection chạy trong mọi hàm khác
+UNTIMED = {"fold_text", "get_db_connection"}
+
+enabled = False
+_lock = threading.Lock()
+_stats = {}
+_counters = {}
+_patched = []   # [(module, tên, hàm gốc)] để khôi phục khi tắt
+_logger = None
+
+class RollingStats:
+    """Thống kê 1 chỉ số: tổng số lần/tổng thời gian từ đầu + ROLLING_WINDOW mẫu gần nhất."""
+    __slots__ = ("samples", "count", "total", "max")
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        def percentile(q):
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 3) if ordered else None
+        return {"count": self.count, "p50_ms": percentile(0.50), "p95_ms": percentile(0.95),
+                "max_ms": round(self.max * 1000, 3), "total_ms": round(self.total * 1000, 3)}
+
+# --- Ghi số liệu ---
+def record(name, seconds, **fields):
+    """Ghi 1 mẫu thời gian (giây). Mẫu chậm được ghi vào log, kèm `fields` (số dòng...)."""
+    if not enabled:
+        return
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = RollingStats()
+        stats.add(seconds)
+    if seconds >= SLOW_SECONDS:
+        _log("slow", name=name, ms=round(seconds * 1000, 3), **fields)
+
+def incr(name, amount=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def snapshot():
+    """{"timings": {tên: {count, p50_ms, p95_ms, max_ms, total_ms}}, "counters": {tên: số}}."""
+    with _lock:
+        return {"timings": {name: stats.summary() for name, stats in sorted(_stats.items())},
+                "counters": dict(sorted(_counters.items()))}
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _counters.clear()
+
+# --- Log có cấu trúc (JSON mỗi dòng, xoay vòng file) ---
+def _get_logger():
+    global _logger
+    if _logger is None:
+        # logging chỉ cần khi đã bật đo: không nạp lúc khởi động ứng dụng
+        import logging
+        from logging.handlers import RotatingFileHandler
+        logger = logging.getLogger("trolylichtrinh.metrics")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        try:
+            os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+            handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                          encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        except OSError as e:
+            print(f"[Metrics] Không mở được file log {LOG_PATH}: {e}")
+        _logger = logger
+    return _logger
+
+def _log(kind, **fields):
+    record = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "kind": kind, **fields}
+    _get_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+
+def log_summary():
+    _log("summary", **snapshot())
+
+# --- Bọc hàm ---
+def _timed(name, fn):
+    import inspect
+    if inspect.isgeneratorfunction(fn):
+        # Generator: chỉ tính thời gian chạy bên trong nó, không tính phần xử lý của nơi gọi
+        @functools.wraps(fn)
+        def timed_generator(*args, **kwargs):
+            iterator = fn(*args, **kwargs)
+            spent = 0.0
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        spent += time.perf_counter() - started
+                    yield item
+            finally:
+                record(name, spent)
+        return timed_generator
+
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - started)
+    return timed
+
+def _patch(module, attr, name):
+    original = getattr(module, attr)
+    setattr(module, attr, _timed(name, original))
+    _patched.append((module, attr, original))
+
+def instrument_module(module, prefix):
+    """Bọc mọi hàm public định nghĩa trong `module` (trừ UNTIMED) -> chỉ số "<prefix>.<tên hàm>"."""
+    import inspect
+    for attr, value in list(vars(module).items()):
+        if (attr.startswith("_") or attr in UNTIMED or not inspect.isfunction(value)
+                or value.__module__ != module.__name__):
+            continue
+        _patch(module, attr, f"{prefix}.{attr}")
+
+class _StageRecorder:
+    """StageTimer của nlp_parser ghi vào metrics: cộng các bước của 1 câu, ghi khi xong câu."""
+    def __init__(self, last_stage):
+        self.last_stage = last_stage
+        self._local = threading.local()  # process_nlp chạy song song trên các luồng nền của GUI
+
+    def start(self):
+        self._local.last = time.perf_counter()
+        self._local.stages = {}
+
+    def lap(self, stage):
+        local = self._local
+        current = time.perf_counter()
+        if getattr(local, "stages", None) is None:
+            # Được bật giữa chừng 1 câu trên luồng này: bỏ câu đó
+            return
+        local.stages[stage] = local.stages.get(stage, 0.0) + current - local.last
+        local.last = current
+        if stage == self.last_stage:
+            for name, seconds in local.stages.items():
+                record(f"nlp.{name}", seconds)
+
+# --- Bật / tắt ---
+def enable():
+    """Bật đo hiệu năng (bọc các hàm CSDL, process_nlp và các bước của nó)."""
+    global enabled
+    if enabled:
+        return
+    try:
+        from . import database, nlp_parser
+    except ImportError:
+        import database, nlp_parser
+    instrument_module(database, "db")
+    _patch(nlp_parser, "process_nlp", "nlp.process_nlp")
+    nlp_parser.set_stage_timer(_StageRecorder(nlp_parser.STAGES[-1]))
+    enabled = True
+    _log("enabled")
+
+def disable():
+    """Tắt đo hiệu năng: ghi bản tóm tắt vào log rồi khôi phục các hàm gốc."""
+    global enabled
+    if not enabled:
+        return
+    log_summary()
+    enabled = False
+    try:
+        from . import nlp_parser
+    except ImportError:
+        import nlp_parser
+    nlp_parser.set_stage_timer(None)
+    while _patched:
+        module, attr, original = _patched.pop()
+        setattr(module, attr, original)
@@ -1,52 +1,122 @@
+import os
 import re
-import dateparser
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from datetime import datetime, timedelta, timezone
 from unidecode import unidecode
-from typing import Dict, Optional, Tuple, List
+from typing import Dict, Optional, Tuple, List, NamedTuple, Iterable, Iterator
 
+try:
+    from .settings import get_timezone, get_timezone_name
+    from .recurrence import WEEKDAY_CODES, parse_rule, iter_occurrences
+except ImportError:
+    from settings import get_timezone, get_timezone_name
+    from recurrence import WEEKDAY_CODES, parse_rule, iter_occurrences
 
+
+# TIMEZONE lấy từ cài đặt múi giờ của lịch lúc phân tích (xem _date_settings)
 DATE_SETTINGS = {
     'DATE_ORDER': 'DMY',
     'PREFER_DATES_FROM': 'future',
-    'TIMEZONE': 'Asia/Ho_Chi_Minh'
 }
 
-#Thêm regex cho các từ khóa kích hoạt
-TRIGGER_PATTERN = re.compile(
-    r"^(nhac( toi| em)?|dat lich( gium)?|tao( gium)?( su kien)?|hen( gap)?|(toi|minh) se)\s+",
-    re.IGNORECASE
-)
+def _date_settings(**extra) -> dict:
+    return dict(DATE_SETTINGS, TIMEZONE=get_timezone_name(), **extra)
 
-REMINDER_PATTERN = re.compile(
-    r"(nhac|bao)\s+truoc\s+(\d+)\s*(phut|p|gio|h|tieng)", re.IGNORECASE
-)
+# dateparser rất nặng (dữ liệu ngôn ngữ + bảng regex múi giờ, ~0.4s) mà chỉ là phương
+# án cuối: nạp khi cần lần đầu, hoặc nạp trước trên luồng nền bằng warm_up()
+_dateparser = None
+
+def _get_dateparser():
+    global _dateparser
+    if _dateparser is None:
+        import dateparser
+        _dateparser = dateparser
+    return _dateparser
+
+# --- Đo thời gian từng bước (benchmarks/nlp_benchmark.py) ---
+# Tên các bước theo thứ tự chạy trong process_nlp
+STAGES = ("clean", "cache", "unidecode", "tokenize", "trigger", "reminder", "location",
+          "recurrence", "time_regex", "dateparser", "cleanup")
+
+class StageTimer:
+    """
+    Cộng dồn thời gian (giây) theo bước phân tích: lap(bước) tính phần thời gian
+    kể từ lần start()/lap() trước. Bật bằng set_stage_timer(); mặc định tắt.
+    """
+    def __init__(self):
+        self.totals: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self._last = time.perf_counter()
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str):
+        current = time.perf_counter()
+        self.totals[stage] += current - self._last
+        self._last = current
+
+class _NullStageTimer:
+    def start(self):
+        pass
+
+    def lap(self, stage: str):
+        pass
+
+_stage_timer = _NullStageTimer()
+
+def set_stage_timer(timer: Optional[StageTimer]):
+    """Bật (truyền StageTimer) / tắt (None) việc đo từng bước. Chỉ dùng khi đo hiệu năng trên 1 luồng."""
+    global _stage_timer
+    _stage_timer = timer if timer is not None else _NullStageTimer()
+
+# --- Bộ tách từ (lexer) ---
+# Chuỗi đã bỏ dấu được quét ĐÚNG MỘT LẦN thành dãy token; mọi bước trích xuất
+# (kích hoạt, nhắc nhở, địa điểm, thời gian) chỉ duyệt dãy token này.
+TOKEN_PATTERN = re.compile(r"(\s*)(?:(\d+)|([a-z]+)|(\S))")
+TOKEN_KINDS = (None, None, "num", "word", "punct")
 
-# Cập nhật regex địa điểm để xử lý dấu phẩy
-LOCATION_PATTERN = re.compile(
-    r"\s(o|tai)\s+"                # Bắt đầu bằng "o" hoặc "tai"
-    r"([^,]+?(?:,\s*[^,]+?)*?)"    # Bắt các cụm có dấu phẩy (non-greedy)
-    r"(?=(,|$|\s(luc|vao|nhac)))",  # Dừng lại khi gặp dấu phẩy, hết chuỗi, hoặc từ khóa thời gian/nhắc nhở
-    re.IGNORECASE
+class Token(NamedTuple):
+    kind: str    # "num" | "word" | "punct"
+    text: str
+    start: int
+    end: int
+    gap: int     # Số khoảng trắng ngay trước token
+
+# Từ khóa kích hoạt ở đầu câu (cụm dài thử trước)
+TRIGGER_PHRASES = (
+    ("nhac", "toi"), ("nhac", "em"), ("nhac",),
+    ("dat", "lich", "gium"), ("dat", "lich"),
+    ("tao", "gium", "su", "kien"), ("tao", "gium"), ("tao", "su", "kien"), ("tao",),
+    ("hen", "gap"), ("hen",),
+    ("toi", "se"), ("minh", "se"),
 )
 
-#  - Thêm Pattern ưu tiên lên đầu
-TIME_PATTERNS = [
-    # Cấu trúc: [Số] [dấu cách?] [giờ/h/g] [dấu cách] [Số] [dấu cách?] [phút/p]
-    re.compile(r"((\s(luc|vao))?\s+)?(\d{1,2}\s*(gio|h|g)\s+\d{1,2}\s*(phut|p))", re.IGNORECASE), 
+# "nhac/bao truoc <số> <đơn vị>" -> số phút
+REMINDER_WORDS = {"nhac", "bao"}
+REMINDER_UNITS = {"phut": 1, "p": 1, "gio": 60, "h": 60, "tieng": 60}
 
-    # Các Pattern cũ (đã được sắp xếp lại độ ưu tiên)
-    re.compile(r"((\s(luc|vao))?\s+)?(\d{1,2}(:|h| gio)\d{1,2}(\s*p(hut)?)?)\s+(thu\s(\d|hai|ba|tu|nam|sau|bay|nhat))", re.IGNORECASE),
-    re.compile(r"((\s(luc|vao))?\s+)?(\d{1,2}\s*(gio|h|g))\s+(sang|trua|chieu|toi)\s+(mai|kia|nay)", re.IGNORECASE),
-    
-    # Pattern HH:MM (vẫn giữ nguyên nhưng độ ưu tiên thấp hơn cái mới ở trên)
-    re.compile(r"((\s(luc|vao))?\s+)?(\d{1,2}(:|h| gio)\d{1,2}(\s*p(hut)?)?)", re.IGNORECASE),
-    
-    re.compile(r"((\s(luc|vao))?\s+)?(sang|trua|chieu|toi)\s+(mai|kia|nay)", re.IGNORECASE),
-    re.compile(r"((\s(luc|vao))?\s+)?(cuoi tuan( nay| toi| sau)?)", re.IGNORECASE),
-    re.compile(r"((\s(luc|vao))?\s+)?(thu\s(\d|hai|ba|tu|nam|sau|bay|nhat))", re.IGNORECASE),
-    re.compile(r"((\s(luc|vao))?\s+)?(\d{1,2}\s*(gio|h|g))(?!\d)", re.IGNORECASE),
-]
+# "o/tai <địa điểm>": địa điểm dừng ở dấu phẩy, hết câu, hoặc từ khóa thời gian/nhắc nhở
+LOCATION_MARKERS = {"o", "tai"}
+LOCATION_STOP_WORDS = {"luc", "vao", "nhac"}
+
+# Lặp lại: "moi/hang ngay|tuan|thang", "moi thu 2 (va|,) thu 4", "moi chu nhat", "moi cuoi tuan"
+RECURRENCE_WORDS = {"moi", "hang"}
+RECURRENCE_UNITS = {"ngay": "DAILY", "tuan": "WEEKLY", "thang": "MONTHLY"}
+WEEKDAY_JOINERS = {",", "va"}
+# Lặp lại mà câu không có giờ: mặc định 8h sáng (như _fallback_parse_time)
+RECURRENCE_DEFAULT_HOUR = 8
 
+# Từ vựng thời gian
+TIME_PREPOSITIONS = {"luc", "vao"}
+HOUR_UNITS = {"gio", "h", "g"}
+MINUTE_UNITS = {"phut", "p"}
+RELATIVE_DAYS = {"mai", "kia", "nay"}
+WEEKDAY_WORDS = {"hai", "ba", "tu", "nam", "sau", "bay", "nhat"}
+WEEKEND_SUFFIXES = {"nay", "toi", "sau"}
 
 TIME_OF_DAY = {
     "sang": 8,
@@ -55,27 +125,266 @@ TIME_OF_DAY = {
     "toi": 19
 }
 
-def _normalize_time_string(time_str: str) -> str:
+# Các dạng cụm thời gian, theo thứ tự ưu tiên (dạng đầu tiên giải được sẽ thắng):
+#   0. "19 gio 50 phut", "17h 30p"      4. "sang mai", "toi nay"
+#   1. "15h45 thu 3"                    5. "cuoi tuan (nay|toi|sau)"
+#   2. "8 gio sang mai"                 6. "thu 2", "thu hai"
+#   3. "9h30", "10:15", "12h30p"        7. "14h", "8 gio"
+TIME_FORM_COUNT = 8
+# Từ có thể mở đầu một cụm thời gian (ngoài con số)
+TIME_PHRASE_STARTS = set(TIME_OF_DAY) | {"cuoi", "thu"}
+
+class _FoldTable(dict):
+    """Bảng bỏ dấu + chữ thường cho str.translate, mỗi ký tự chỉ tra unidecode một lần."""
+    def __missing__(self, code):
+        folded = self[code] = unidecode(chr(code)).lower()
+        return folded
+
+_FOLD_TABLE = _FoldTable()
+
+# Làm sạch đầu vào và tên sự kiện
+NOISE_PATTERN = re.compile(r'[!?…]+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+EVENT_LEADING_WORD_PATTERN = re.compile(r"^(lúc|luc|vào|vao|ở|o|tại|tai)\s+", re.IGNORECASE)
+EVENT_TRAILING_WORD_PATTERN = re.compile(r"\s+(lúc|luc|vào|vao|ở|o|tại|tai)$", re.IGNORECASE)
+MULTI_SPACE_PATTERN = re.compile(r"\s{2,}")
+
+def _tokenize(text_clean: str) -> List[Token]:
+    """Tách chuỗi đã bỏ dấu (chữ thường) thành dãy token số / chữ / dấu câu."""
+    return [
+        Token(TOKEN_KINDS[m.lastindex], m.group(m.lastindex), m.start(m.lastindex), m.end(), m.end(1) - m.start(1))
+        for m in TOKEN_PATTERN.finditer(text_clean)
+    ]
+
+def _is_word(tokens: List[Token], i: int, vocab) -> bool:
+    # Từ vựng chỉ gồm chữ cái nên so khớp text là đủ (số / dấu câu không bao giờ trùng)
+    return i < len(tokens) and tokens[i].text in vocab
+
+def _is_small_number(tokens: List[Token], i: int) -> bool:
+    return i < len(tokens) and tokens[i].kind == "num" and len(tokens[i].text) <= 2
+
+def _match_trigger(tokens: List[Token]) -> Optional[Tuple[int, int]]:
+    """Từ khóa kích hoạt ở đầu câu ("nhac toi", "dat lich"...) -> span, kể cả khoảng trắng sau nó."""
+    if not tokens or tokens[0].gap:
+        return None
+    for phrase in TRIGGER_PHRASES:
+        size = len(phrase)
+        if size < len(tokens) and tokens[size].gap and all(
+            tokens[k].text == word and (k == 0 or tokens[k].gap == 1) for k, word in enumerate(phrase)
+        ):
+            return 0, tokens[size].start
+    return None
+
+def _match_reminders(tokens: List[Token]) -> List[Tuple[int, Tuple[int, int]]]:
+    """Các cụm "nhac/bao truoc N phut/gio..." -> [(số phút, span)]."""
+    reminders = []
+    for i in range(len(tokens) - 3):
+        if (tokens[i].text in REMINDER_WORDS
+                and tokens[i + 1].text == "truoc" and tokens[i + 1].gap
+                and tokens[i + 2].kind == "num" and tokens[i + 2].gap
+                and _is_word(tokens, i + 3, REMINDER_UNITS)):
+            minutes = int(tokens[i + 2].text) * REMINDER_UNITS[tokens[i + 3].text]
+            reminders.append((minutes, (tokens[i].start, tokens[i + 3].end)))
+    return reminders
+
+def _match_locations(tokens: List[Token], text_length: int) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
     """
-    (v14.0) - Chuẩn hóa chuỗi thời gian, xử lý AM/PM và 'cuối tuần'.
+    Các cụm "o/tai <địa điểm>" -> [(span cả cụm, span địa điểm)].
+    Địa điểm dừng ở dấu phẩy, hết câu, hoặc trước "luc/vao/nhac".
     """
-    # Chuẩn hóa "19 gio 50 phut" thành "19:50" để dateparser hiểu
-    # Thay thế "gio", "phut" bằng dấu ":"
-    s = re.sub(r"(\d+)\s*(gio|h|g)\s*(\d+)\s*(phut|p)", r"\1:\3", time_str, flags=re.IGNORECASE)
-    
-    s = re.sub(r"(\d+)h(\d+)", r"\1:\2", s, flags=re.IGNORECASE)
-    s = re.sub(r"(\d+)h(?=\b|\s|$)", r"\1:00", s, flags=re.IGNORECASE)
-    s = re.sub(r"(\d+)\s*(gio|g)\b", r"\1:00", s, flags=re.IGNORECASE)
-    s = re.sub(r"cuoi tuan( sau| toi)?", "thu 7", s, flags=re.IGNORECASE)
-    s = re.sub(r"\bsang\b", "AM", s, flags=re.IGNORECASE)
-    s = re.sub(r"\b(trua|chieu|toi)\b", "PM", s, flags=re.IGNORECASE)
-    return s
+    locations = []
+    i = 0
+    while i < len(tokens) - 1:
+        marker, first = tokens[i], tokens[i + 1]
+        if not (marker.text in LOCATION_MARKERS and marker.gap and first.gap and first.text != ","):
+            i += 1
+            continue
+        stop = text_length
+        i += 2
+        while i < len(tokens):
+            token = tokens[i]
+            if token.text == ",":
+                stop = token.start
+                break
+            if token.gap and token.text in LOCATION_STOP_WORDS:
+                stop = token.start - 1
+                break
+            i += 1
+        locations.append(((marker.start - 1, stop), (first.start, stop)))
+    return locations
+
+# --- Cụm thời gian ---
+def _daypart(word: str) -> str:
+    return "AM" if word == "sang" else "PM"
+
+def _match_hour(tokens: List[Token], i: int) -> Optional[Tuple[int, str]]:
+    """"14h", "8 gio" -> (token cuối, chuỗi chuẩn hóa "14:00"). "5 h" được giữ nguyên."""
+    if not (_is_small_number(tokens, i) and _is_word(tokens, i + 1, HOUR_UNITS)):
+        return None
+    hour, unit = tokens[i], tokens[i + 1]
+    if unit.text == "h" and unit.gap:
+        return i + 1, f"{hour.text}{' ' * unit.gap}h"
+    return i + 1, f"{hour.text}:00"
+
+def _match_clock(tokens: List[Token], i: int, with_suffix: bool = True) -> Optional[Tuple[int, str]]:
+    """"9h30", "10:15", "9 gio30", có thể kèm "p"/"phut" -> (token cuối, chuỗi chuẩn hóa)."""
+    if not (_is_small_number(tokens, i) and _is_small_number(tokens, i + 2) and not tokens[i + 2].gap):
+        return None
+    hour, sep, minute = tokens[i], tokens[i + 1], tokens[i + 2]
+    if sep.kind == "punct":
+        if sep.text != ":" or sep.gap:
+            return None
+    elif not ((sep.text == "h" and not sep.gap) or (sep.text == "gio" and sep.gap == 1)):
+        return None
+
+    last = i + 2
+    suffix = with_suffix and _is_word(tokens, i + 3, MINUTE_UNITS)
+    if suffix:
+        last = i + 3
+    if sep.text == ":":
+        unit = tokens[last]
+        return last, f"{hour.text}:{minute.text}" + (f"{' ' * unit.gap}{unit.text}" if suffix else "")
+    if sep.text == "gio" and not suffix:
+        return last, f"{hour.text} gio{minute.text}"
+    return last, f"{hour.text}:{minute.text}"
+
+def _match_weekday(tokens: List[Token], i: int) -> Optional[Tuple[int, str]]:
+    """"thu 2", "thu hai" -> (token cuối, chuỗi chuẩn hóa)."""
+    if i + 1 >= len(tokens) or tokens[i].text != "thu":
+        return None
+    day = tokens[i + 1]
+    if day.gap == 1 and ((day.kind == "num" and len(day.text) == 1) or _is_word(tokens, i + 1, WEEKDAY_WORDS)):
+        return i + 1, f"thu {day.text}"
+    return None
+
+def _weekday_index(tokens: List[Token], i: int) -> Optional[Tuple[int, int]]:
+    """"thu 2", "thu hai", "chu nhat" tại token i -> (token cuối, thứ 0=Thứ 2..6=CN)."""
+    if tokens[i].text == "chu" and _is_word(tokens, i + 1, {"nhat"}) and tokens[i + 1].gap == 1:
+        return i + 1, 6
+    weekday = _match_weekday(tokens, i)
+    if weekday and tokens[i + 1].text in WEEKDAY_INDEX:
+        return weekday[0], WEEKDAY_INDEX[tokens[i + 1].text]
+    return None
+
+def _match_recurrence(tokens: List[Token]) -> Optional[Tuple[str, List[Tuple[int, int]], set]]:
+    """
+    Cụm lặp lại đầu tiên -> (RRULE, các span, chỉ số các token thuộc cụm).
+    Với "hang/moi tuan", các "thu X" khác trong câu là các thứ lặp lại (BYDAY).
+    """
+    for i in range(len(tokens) - 1):
+        if tokens[i].text not in RECURRENCE_WORDS or tokens[i + 1].gap != 1:
+            continue
+        unit = tokens[i + 1].text
+        if unit in RECURRENCE_UNITS:
+            # "hang ngay mai" không phải lặp lại ("ngay mai" = ngày mai)
+            if _is_word(tokens, i + 2, RELATIVE_DAYS) and tokens[i + 2].gap == 1:
+                continue
+            spans, used, weekdays = [(tokens[i].start, tokens[i + 1].end)], {i, i + 1}, []
+            if unit == "tuan":
+                for k in range(len(tokens)):
+                    weekday = _weekday_index(tokens, k) if k not in used else None
+                    if weekday:
+                        spans.append((tokens[k].start, tokens[weekday[0]].end))
+                        used.update(range(k, weekday[0] + 1))
+                        weekdays.append(weekday[1])
+            rrule = f"FREQ={RECURRENCE_UNITS[unit]}"
+            if weekdays:
+                rrule += ";BYDAY=" + ",".join(WEEKDAY_CODES[day] for day in sorted(set(weekdays)))
+            return rrule, spans, used
+        if tokens[i].text != "moi":
+            continue
+        if unit == "cuoi" and _is_word(tokens, i + 2, {"tuan"}) and tokens[i + 2].gap == 1:
+            return "FREQ=WEEKLY;BYDAY=SA,SU", [(tokens[i].start, tokens[i + 2].end)], {i, i + 1, i + 2}
+        weekday = _weekday_index(tokens, i + 1)
+        if not weekday:
+            continue
+        last, weekdays = weekday[0], [weekday[1]]
+        # "moi thu 2, thu 4 va thu 6"
+        while last + 2 < len(tokens) and tokens[last + 1].text in WEEKDAY_JOINERS:
+            following = _weekday_index(tokens, last + 2) if tokens[last + 2].gap else None
+            if not following:
+                break
+            last = following[0]
+            weekdays.append(following[1])
+        rrule = "FREQ=WEEKLY;BYDAY=" + ",".join(WEEKDAY_CODES[day] for day in sorted(set(weekdays)))
+        return rrule, [(tokens[i].start, tokens[last].end)], set(range(i, last + 1))
+    return None
+
+def _first_occurrence(rrule: str, date_obj: Optional[datetime], now: datetime) -> Optional[datetime]:
+    """Lần lặp đầu tiên từ `now` của chuỗi, giữ giờ trong ngày của cụm thời gian (nếu có)."""
+    # So cùng hệ giờ với chuỗi: giờ địa phương của lịch, không múi giờ
+    local_now = _calendar_now(now)
+    anchor = date_obj.replace(tzinfo=None) if date_obj else local_now.replace(
+        hour=RECURRENCE_DEFAULT_HOUR, minute=0, second=0, microsecond=0)
+    return next(iter_occurrences(parse_rule(rrule), anchor, local_now), None)
 
-def _fallback_parse_time(normalized: str) -> Optional[datetime]:
+def _time_forms_at(tokens: List[Token], i: int):
+    """Các dạng cụm thời gian bắt đầu tại token i -> (dạng, token cuối, chuỗi chuẩn hóa)."""
+    token = tokens[i]
+    if token.kind == "num":
+        hour = _match_hour(tokens, i)
+        if hour:
+            last, hour_text = hour
+            if (_is_small_number(tokens, last + 1) and tokens[last + 1].gap
+                    and _is_word(tokens, last + 2, MINUTE_UNITS)):
+                yield 0, last + 2, f"{token.text}:{tokens[last + 1].text}"
+            if (_is_word(tokens, last + 1, TIME_OF_DAY) and tokens[last + 1].gap
+                    and _is_word(tokens, last + 2, RELATIVE_DAYS) and tokens[last + 2].gap):
+                part, day = tokens[last + 1], tokens[last + 2]
+                yield 2, last + 2, f"{hour_text}{' ' * part.gap}{_daypart(part.text)}{' ' * day.gap}{day.text}"
+            following = tokens[last + 1] if last + 1 < len(tokens) else None
+            if not (following and following.kind == "num" and not following.gap):
+                yield 7, last, hour_text
+
+        for with_suffix in (True, False):
+            clock = _match_clock(tokens, i, with_suffix)
+            if clock:
+                last, clock_text = clock
+                weekday = _match_weekday(tokens, last + 1) if last + 1 < len(tokens) and tokens[last + 1].gap else None
+                if weekday:
+                    yield 1, weekday[0], f"{clock_text}{' ' * tokens[last + 1].gap}{weekday[1]}"
+                    break
+        clock = _match_clock(tokens, i)
+        if clock:
+            yield 3, clock[0], clock[1]
+
+    elif token.kind == "word":
+        if token.text in TIME_OF_DAY and _is_word(tokens, i + 1, RELATIVE_DAYS) and tokens[i + 1].gap:
+            day = tokens[i + 1]
+            yield 4, i + 1, f"{_daypart(token.text)}{' ' * day.gap}{day.text}"
+        elif token.text == "cuoi" and _is_word(tokens, i + 1, {"tuan"}) and tokens[i + 1].gap == 1:
+            if _is_word(tokens, i + 2, WEEKEND_SUFFIXES) and tokens[i + 2].gap == 1:
+                yield 5, i + 2, "thu 7 nay" if tokens[i + 2].text == "nay" else "thu 7"
+            else:
+                yield 5, i + 1, "thu 7"
+        else:
+            weekday = _match_weekday(tokens, i)
+            if weekday:
+                yield 6, weekday[0], weekday[1]
+
+def _find_time_phrases(tokens: List[Token]) -> List[Optional[Tuple[int, int, str]]]:
+    """
+    Duyệt dãy token một lượt, lấy cụm đầu tiên (trái nhất) của mỗi dạng thời gian.
+    Trả về list theo thứ tự ưu tiên: (token đầu, token cuối, chuỗi chuẩn hóa) hoặc None.
+    """
+    found = [None] * TIME_FORM_COUNT
+    missing = TIME_FORM_COUNT
+    for i, token in enumerate(tokens):
+        if token.kind != "num" and token.text not in TIME_PHRASE_STARTS:
+            continue
+        for form, last, normalized in _time_forms_at(tokens, i):
+            if found[form] is None:
+                found[form] = (i, last, normalized)
+                missing -= 1
+        if not missing:
+            break
+    return found
+
+def _fallback_parse_time(normalized: str, now: Optional[datetime] = None) -> Optional[datetime]:
     """
     (v14.1) - Xử lý fallback khi dateparser không parse được.
     """
-    now = datetime.now()
+    now = now or datetime.now()
     day_offset = 0
     hour = None
     minute = 0
@@ -103,108 +412,357 @@ def _fallback_parse_time(normalized: str) -> Optional[datetime]:
     
     return (now + timedelta(days=day_offset)).replace(hour=hour, minute=minute, second=0, microsecond=0)
 
-def _extract_time(text: str, text_clean: str) -> Tuple[Optional[datetime], Optional[Tuple[int, int]]]:
-
-    for pattern in TIME_PATTERNS:
-        match = pattern.search(text_clean)
-        if match:
-            original_time_str = text[match.start():match.end()]
-            unidecoded_time_str = text_clean[match.start():match.end()]
-            cleaned_time_str = re.sub(r"^(luc|vao)\s+", "", unidecoded_time_str, flags=re.IGNORECASE).strip()
-            normalized_time_str = _normalize_time_string(cleaned_time_str)
-            
-            try:
-                date_obj = dateparser.parse(normalized_time_str,
-                                            languages=['vi'],
-                                            settings=DATE_SETTINGS)
-                if not date_obj:
-                    date_obj = _fallback_parse_time(normalized_time_str)
-                if date_obj:
-                    return date_obj, (match.start(), match.end())
-            except Exception as e:
-                print(f"Lỗi phân tích thời gian ('{normalized_time_str}'): {e}")
-                
-    return None, None
-
-def process_nlp(text: str) -> dict:
-    """
-    (v14.2) - Logic dọn dẹp event (span-based, cải tiến).
+# --- Fast path: giải trực tiếp các dạng thời gian đã chuẩn hóa ---
+# _normalize_time_string chỉ sinh ra một tập dạng đóng ("19:50", "luc 8:00 AM mai",
+# "thu 7"...). Các dạng quen thuộc được giải tại chỗ với KẾT QUẢ Y HỆT dateparser:
+# ngày gốc và việc "giờ này đã qua chưa" đều tính theo giờ địa phương của múi giờ
+# trong cài đặt (kể cả quanh nửa đêm). dateparser chỉ còn là phương án cuối.
+FAST_CLOCK_PATTERN = re.compile(r"(?:luc )?(\d{1,2}):(\d{1,2})")
+FAST_WEEKDAY_PATTERN = re.compile(r"(?:luc )?(?:(\d{1,2}):(\d{1,2}) )?thu ([1-7]|hai|ba|tu|nam|sau|bay)")
+# Các dạng dateparser luôn trả về None -> đi thẳng vào _fallback_parse_time
+FAST_FALLBACK_PATTERN = re.compile(
+    r"(?:luc |vao )?(?:\d{1,2}:\d{1,2} )?(?:AM|PM) (?:mai|kia|nay)"
+    r"|vao \d{1,2}:\d{1,2}"
+    r"|(?:luc )?\d{1,2} h"
+    r"|thu 7 nay"
+)
+WEEKDAY_INDEX = {
+    "2": 0, "hai": 0, "3": 1, "ba": 1, "4": 2, "tu": 2, "5": 3, "nam": 3,
+    "6": 4, "sau": 4, "7": 5, "bay": 5, "1": 6,
+}
+_UNRESOLVED = object()
+
+def _utc_naive(now: datetime) -> datetime:
+    """Giờ UTC (naive) của cùng thời điểm `now` (giờ địa phương, naive)."""
+    return now.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _calendar_now(now: datetime) -> datetime:
+    """Giờ (naive) của cùng thời điểm `now` theo múi giờ của lịch trong cài đặt."""
+    return now.astimezone(get_timezone()).replace(tzinfo=None)
+
+def _fast_parse_time(normalized: str, now: datetime):
+    """
+    Giải chuỗi thời gian đã chuẩn hóa mà không cần dateparser.
+    Trả về _UNRESOLVED nếu không thuộc dạng đã biết.
     """
+    match = FAST_CLOCK_PATTERN.fullmatch(normalized)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour > 23 or minute > 59:
+            return _UNRESOLVED
+        local_now = _calendar_now(now)
+        candidate = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        # Giờ đó hôm nay đã qua -> ngày hôm sau
+        if candidate < local_now:
+            candidate += timedelta(days=1)
+        return candidate
+
+    match = FAST_WEEKDAY_PATTERN.fullmatch(normalized)
+    if match:
+        hour, minute = int(match.group(1) or 0), int(match.group(2) or 0)
+        if hour > 23 or minute > 59:
+            return _UNRESOLVED
+        base = _calendar_now(now).replace(hour=hour, minute=minute, second=0, microsecond=0)
+        # Luôn là thứ đó của tuần tới nếu trùng hôm nay (PREFER_DATES_FROM = future)
+        steps = (WEEKDAY_INDEX[match.group(3)] - base.weekday()) % 7 or 7
+        return base + timedelta(days=steps)
+
+    if FAST_FALLBACK_PATTERN.fullmatch(normalized):
+        return _fallback_parse_time(normalized, now)
+
+    return _UNRESOLVED
+
+def _parse_normalized_time(normalized: str, now: datetime) -> Optional[datetime]:
+    date_obj = _fast_parse_time(normalized, now)
+    _stage_timer.lap("time_regex")
+    if date_obj is not _UNRESOLVED:
+        return date_obj
+    # Phương án cuối: dateparser, cùng mốc "now" với cả câu lệnh
+    settings = _date_settings(RELATIVE_BASE=_utc_naive(now))
+    date_obj = _get_dateparser().parse(normalized, languages=['vi'], settings=settings)
+    if not date_obj:
+        date_obj = _fallback_parse_time(normalized, now)
+    _stage_timer.lap("dateparser")
+    return date_obj
+
+def _extract_time(tokens: List[Token], now: datetime) -> Tuple[Optional[datetime], Optional[Tuple[int, int]], Optional[str]]:
+    """Trả về (thời điểm, span, chuỗi thời gian đã chuẩn hóa) của cụm thời gian đầu tiên giải được."""
+    for phrase in _find_time_phrases(tokens):
+        if phrase is None:
+            continue
+        first, last, normalized_time_str = phrase
+        token = tokens[first]
+        start = token.start - token.gap
+        # "luc/vao" ngay trước cụm thời gian được bỏ cùng cụm
+        if token.gap and first > 0 and _is_word(tokens, first - 1, TIME_PREPOSITIONS) and tokens[first - 1].gap:
+            preposition = tokens[first - 1]
+            start = preposition.start - 1
+            normalized_time_str = f"{preposition.text}{' ' * token.gap}{normalized_time_str}"
+
+        try:
+            date_obj = _parse_normalized_time(normalized_time_str, now)
+            if date_obj:
+                return date_obj, (start, tokens[last].end), normalized_time_str
+        except Exception as e:
+            print(f"Lỗi phân tích thời gian ('{normalized_time_str}'): {e}")
+
+    return None, None, None
+
+# --- Bộ nhớ đệm kết quả phân tích ---
+class _CachedParse(NamedTuple):
+    event: Optional[str]
+    location: Optional[str]
+    reminder_minutes: int
+    time_phrase: Optional[str]  # Dạng tương đối ("luc 9:00 AM mai", "thu 2"...), giải lại theo `now` mỗi lần dùng
+    rrule: Optional[str] = None  # Luật lặp lại ("FREQ=WEEKLY;BYDAY=MO"...), None nếu không lặp
+
+class ParseCache:
+    """
+    Bộ nhớ đệm LRU có giới hạn cho process_nlp, khóa là câu lệnh đã làm sạch.
+    Chỉ lưu phần không phụ thuộc thời điểm: tên sự kiện, địa điểm, nhắc trước
+    và cụm thời gian ở dạng tương đối. Nhờ vậy câu "... sáng mai" gõ hôm qua
+    vẫn ra đúng ngày mai của hôm nay.
+    """
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[_CachedParse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: _CachedParse):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, object]:
+        """Thống kê trúng/trượt của bộ nhớ đệm."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+PARSE_CACHE = ParseCache()
+
+def _build_result(event: Optional[str], location: Optional[str], reminder_minutes: int,
+                  date_obj: Optional[datetime], rrule: Optional[str] = None) -> dict:
     result = {
-        "event": None,
+        "event": event,
         "start_time": None,
         "end_time": None,
-        "location": None,
-        "reminder_minutes": 0
+        "location": location,
+        "reminder_minutes": reminder_minutes,
+        "rrule": rrule
     }
+    if date_obj:
+        # Dùng strftime để format theo ý muốn (bỏ chữ T)
+        result["start_time"] = date_obj.strftime("%Y-%m-%d %H:%M:%S")
+        result["end_time"] = (date_obj + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    return result
 
-    # Làm sạch chuỗi đầu vào
-    text = re.sub(r'[!?…]+', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
+def _resolve_cached(cached: _CachedParse, now: datetime) -> Optional[dict]:
+    """Dựng lại kết quả từ bộ nhớ đệm; None nếu cụm thời gian không còn giải được."""
+    date_obj = None
+    if cached.time_phrase:
+        try:
+            date_obj = _parse_normalized_time(cached.time_phrase, now)
+        except Exception:
+            return None
+        if not date_obj:
+            return None
+    if cached.rrule:
+        date_obj = _first_occurrence(cached.rrule, date_obj, now)
+        _stage_timer.lap("recurrence")
+    return _build_result(cached.event, cached.location, cached.reminder_minutes, date_obj, cached.rrule)
 
-    original_text = text
-    text_clean = unidecode(original_text).lower()
+def _parse_text(original_text: str, now: datetime) -> Tuple[_CachedParse, Optional[datetime]]:
+    """Phân tích đầy đủ 1 câu lệnh đã làm sạch -> (phần nhớ đệm được, thời điểm bắt đầu)."""
+    timer = _stage_timer
+    reminder_minutes = 0
+    location = None
+    text_clean = original_text.translate(_FOLD_TABLE)
+    timer.lap("unidecode")
+    tokens = _tokenize(text_clean)
+    timer.lap("tokenize")
 
     spans_to_remove: List[Tuple[int, int]] = []
 
-
-    trigger_match = TRIGGER_PATTERN.search(text_clean)
-    if trigger_match and trigger_match.start() == 0:
-        spans_to_remove.append((trigger_match.start(), trigger_match.end()))
+    trigger_span = _match_trigger(tokens)
+    if trigger_span:
+        spans_to_remove.append(trigger_span)
+    timer.lap("trigger")
 
     # --- 1. Nhắc nhở ---
-    for reminder_match in REMINDER_PATTERN.finditer(text_clean):
-        value, unit = int(reminder_match.group(2)), reminder_match.group(3).lower()
-        result["reminder_minutes"] = value * 60 if unit in ("gio", "h", "tieng") else value
-        spans_to_remove.append((reminder_match.start(), reminder_match.end()))
+    for minutes, span in _match_reminders(tokens):
+        reminder_minutes = minutes
+        spans_to_remove.append(span)
+    timer.lap("reminder")
 
     # --- 2. Địa điểm ---
-    loc_matches = list(LOCATION_PATTERN.finditer(text_clean))
+    loc_matches = _match_locations(tokens, len(text_clean))
     if loc_matches:
-        loc_match = max(loc_matches, key=lambda m: len(m.group(2)))
-        location = original_text[loc_match.start(2):loc_match.end(2)].strip(" ,.")
-        result["location"] = location
-        spans_to_remove.extend([(m.start(), m.end()) for m in loc_matches])
+        loc_start, loc_end = max((loc for _, loc in loc_matches), key=lambda loc: loc[1] - loc[0])
+        location = original_text[loc_start:loc_end].strip(" ,.")
+        spans_to_remove.extend(span for span, _ in loc_matches)
+    timer.lap("location")
 
-    # --- 3. Thời gian ---
-    date_obj, time_span = _extract_time(original_text, text_clean)
-    if date_obj:
-        # Dùng strftime để format theo ý muốn (bỏ chữ T)
-        result["start_time"] = date_obj.strftime("%Y-%m-%d %H:%M:%S")
-        result["end_time"] = (date_obj + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
-        if time_span:
-            spans_to_remove.append(time_span)
+    # --- 3. Lặp lại (các thứ trong cụm lặp lại không tính là cụm thời gian) ---
+    rrule = None
+    time_tokens = tokens
+    recurrence = _match_recurrence(tokens)
+    if recurrence:
+        rrule, spans, used = recurrence
+        spans_to_remove.extend(spans)
+        time_tokens = [token for k, token in enumerate(tokens) if k not in used]
+    timer.lap("recurrence")
+
+    # --- 4. Thời gian ---
+    date_obj, time_span, time_phrase = _extract_time(time_tokens, now)
+    if time_span:
+        spans_to_remove.append(time_span)
+    timer.lap("time_regex")
+    if rrule:
+        date_obj = _first_occurrence(rrule, date_obj, now)
+        timer.lap("recurrence")
 
-    # --- 4. Xây dựng Event ---
+    # --- 5. Xây dựng Event ---
     event_parts = []
     last_index = 0
-    
+
     spans_to_remove.sort(key=lambda x: x[0])
-    
+
     for start, end in spans_to_remove:
         if start > last_index:
             part = original_text[last_index:start].strip(" .,")
             if part:
                 event_parts.append(part)
         last_index = max(last_index, end)
-    
+
     if last_index < len(original_text):
         part = original_text[last_index:].strip(" .,")
         if part:
             event_parts.append(part)
 
-    event = " ".join(event_parts) 
-    
+    event = " ".join(event_parts)
+
     # Dọn dẹp lại lần cuối
     event = event.strip(" .,")
-    event = re.sub(r"^(lúc|luc|vào|vao|ở|o|tại|tai)\s+", "", event, flags=re.IGNORECASE)
-    event = re.sub(r"\s+(lúc|luc|vào|vao|ở|o|tại|tai)$", "", event, flags=re.IGNORECASE)
-    event = re.sub(r"\s{2,}", " ", event).strip(" ,")
-    
-    result["event"] = event or None
+    event = EVENT_LEADING_WORD_PATTERN.sub("", event)
+    event = EVENT_TRAILING_WORD_PATTERN.sub("", event)
+    event = MULTI_SPACE_PATTERN.sub(" ", event).strip(" ,")
+
+    return _CachedParse(event or None, location, reminder_minutes, time_phrase, rrule), date_obj
+
+def process_nlp(text: str, now: Optional[datetime] = None) -> dict:
+    """
+    (v15.1) - Tách từ một lượt, trích xuất trên dãy token (span-based),
+    kết quả được nhớ đệm theo câu lệnh (PARSE_CACHE).
+    `now`: mốc thời gian tham chiếu duy nhất cho cả câu (mặc định: hiện tại).
+    """
+    timer = _stage_timer
+    timer.start()
+    now = now or datetime.now()
+
+    # Làm sạch chuỗi đầu vào
+    text = NOISE_PATTERN.sub('', text)
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
+    timer.lap("clean")
+
+    cached = PARSE_CACHE.get(text)
+    timer.lap("cache")
+    if cached is not None:
+        result = _resolve_cached(cached, now)
+        if result is not None:
+            timer.lap("cleanup")
+            return result
 
+    cached, date_obj = _parse_text(text, now)
+    PARSE_CACHE.put(text, cached)
+    result = _build_result(cached.event, cached.location, cached.reminder_minutes, date_obj, cached.rrule)
+    timer.lap("cleanup")
     return result
 
+# Câu mẫu cho warm_up: đi qua đủ các nhánh (giờ, ngày, nhắc trước, địa điểm, lặp lại)
+WARM_UP_TEXT = "Họp nhóm ở phòng 3 lúc 9h sáng thứ 2 hàng tuần nhắc trước 15 phút"
+
+def warm_up():
+    """
+    Nạp trước dateparser + dữ liệu tiếng Việt của nó và chạy thử 1 câu, để câu lệnh
+    đầu tiên người dùng gõ không phải chờ. Gọi trên luồng nền sau khi cửa sổ đã hiện.
+    Không đụng tới PARSE_CACHE.
+    """
+    now = datetime.now()
+    _get_dateparser().parse("15 tháng 3 năm sau", languages=['vi'],
+                            settings=_date_settings(RELATIVE_BASE=_utc_naive(now)))
+    _parse_text(WARM_UP_TEXT, now)
+
+# --- Xử lý hàng loạt ---
+# Từ số dòng này trở lên mới đáng chia sang nhiều tiến trình (khởi động tiến trình tốn kém)
+PARALLEL_MIN_LINES = 2000
+BATCH_CHUNK_SIZE = 200
+
+def _process_chunk(lines: List[str], now: datetime) -> List[dict]:
+    """Chạy trong tiến trình con: phân tích 1 khối dòng với cùng mốc `now`."""
+    return [process_nlp(line, now) for line in lines]
+
+def process_nlp_batch(lines: Iterable[str], now: Optional[datetime] = None, processes: Optional[int] = None,
+                      chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[Tuple[str, dict]]:
+    """
+    Phân tích nhiều câu lệnh, trả về dần từng (dòng, kết quả) theo đúng thứ tự
+    (bỏ qua dòng trống). Cả lô dùng CHUNG mốc `now`. `lines` được đọc dần, không
+    nạp hết vào bộ nhớ: mỗi lúc chỉ giữ vài khối đang chờ kết quả.
+    `processes`: số tiến trình; 1 = chạy tại chỗ; None = tự chọn (chỉ chia tiến
+    trình khi khối đầu đủ PARALLEL_MIN_LINES dòng).
+    """
+    now = now or datetime.now()
+    lines = (line.strip() for line in lines if line and line.strip())
+    if processes is None:
+        first = list(islice(lines, PARALLEL_MIN_LINES))
+        processes = (os.cpu_count() or 1) if len(first) >= PARALLEL_MIN_LINES else 1
+        lines = chain(first, lines)
+
+    if processes <= 1:
+        for line in lines:
+            yield line, process_nlp(line, now)
+        return
+
+    chunks = iter(lambda: list(islice(lines, chunk_size)), [])
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        # Gửi khối mới khi có chỗ, tối đa 2 khối mỗi tiến trình đang chờ
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(_process_chunk, chunk, now)))
+            if len(pending) >= 2 * processes:
+                chunk, future = pending.popleft()
+                yield from zip(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield from zip(chunk, future.result())
+
 # --- Test Cases ---
 if __name__ == "__main__":
     tests = [
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+from queue import Queue, Full
+
+
+# --- Các backend thông báo ---
+class Notifier:
+    """Giao diện chung cho backend thông báo (âm thanh, log, kiểm thử...)."""
+    name = "base"
+
+    def notify(self, event):
+        raise NotImplementedError
+
+class WindowsSoundNotifier(Notifier):
+    """Phát tiếng BÍP điện tử (Giống đồng hồ báo thức). Chỉ có trên Windows."""
+    name = "winsound"
+
+    def __init__(self, frequency=1000, duration_ms=200, repeat=3, pause_seconds=0.1,
+                 cooldown_seconds=0):
+        import winsound  # ImportError trên Linux/macOS -> dùng backend khác
+        self._winsound = winsound
+        self.frequency = frequency
+        self.duration_ms = duration_ms
+        self.repeat = repeat
+        self.pause_seconds = pause_seconds
+        # > 0: trong khoảng này sau 1 lần bíp thì không bíp nữa (mặc định tắt: mỗi nhắc nhở 1 lần bíp)
+        self.cooldown_seconds = cooldown_seconds
+        self._last_beep = None
+
+    def notify(self, event):
+        now = time.monotonic()
+        if self.cooldown_seconds and self._last_beep is not None and now - self._last_beep < self.cooldown_seconds:
+            return
+        for _ in range(self.repeat):
+            self._winsound.Beep(self.frequency, self.duration_ms)
+            time.sleep(self.pause_seconds)
+        self._last_beep = time.monotonic()
+        print("[Audio] Đã phát tiếng Bíp báo thức.")
+
+class LogNotifier(Notifier):
+    """Backend không phát âm thanh, chỉ ghi log (Linux/macOS, chạy headless)."""
+    name = "log"
+
+    def notify(self, event):
+        print(f"[Notifier] Nhắc nhở: {event.event_name}")
+
+class RecordingNotifier(Notifier):
+    """Backend dùng cho kiểm thử: ghi lại mọi lần gửi (thời điểm, sự kiện)."""
+    name = "recording"
+
+    def __init__(self):
+        self.deliveries = []
+        self._lock = threading.Lock()
+
+    def notify(self, event):
+        with self._lock:
+            self.deliveries.append((time.monotonic(), event))
+
+def default_notifier():
+    """Chọn backend phù hợp với hệ điều hành hiện tại."""
+    try:
+        return WindowsSoundNotifier()
+    except ImportError:
+        return LogNotifier()
+
+
+# --- Luồng phát thông báo ---
+_STOP = object()
+
+class NotificationDispatcher(threading.Thread):
+    """
+    Luồng riêng gửi thông báo qua backend, để luồng nhắc nhở không bao giờ
+    bị chặn bởi âm thanh. Hàng đợi có giới hạn: khi đầy, thông báo mới bị bỏ
+    (popup trên GUI vẫn hiện vì đi qua kênh riêng).
+    """
+    def __init__(self, notifier: Notifier = None, maxsize=100, latency_window=500):
+        super().__init__(name="NotificationDispatcher")
+        self.daemon = True
+        self.notifier = notifier or default_notifier()
+        self._queue = Queue(maxsize=maxsize)
+        # Độ trễ mỗi lần gửi (giây): từ lúc submit() đến khi backend gửi xong
+        self.latencies = deque(maxlen=latency_window)
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        print(f"[Notifier] Backend thông báo: {self.notifier.name}")
+
+    def submit(self, event):
+        """Đưa 1 sự kiện vào hàng đợi gửi; không chặn. Trả về False nếu bị bỏ."""
+        try:
+            self._queue.put_nowait((time.monotonic(), event))
+            return True
+        except Full:
+            self.dropped += 1
+            print(f"[Notifier] Hàng đợi thông báo đầy, bỏ qua: {event.event_name}")
+            return False
+
+    def stop(self, timeout=2.0):
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except Full:
+            pass
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            submitted, event = item
+            try:
+                self.notifier.notify(event)
+                self.latencies.append(time.monotonic() - submitted)
+                self.delivered += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"[Notifier] Lỗi gửi thông báo: {e}")
+
+    def stats(self):
+        """Thống kê gửi thông báo (độ trễ tính bằng mili giây)."""
+        latencies = sorted(self.latencies)
+        return {
+            "backend": self.notifier.name,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": self._queue.qsize(),
+            "latency_p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+            "latency_max_ms": latencies[-1] * 1000 if latencies else None,
+        }
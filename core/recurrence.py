@@ -0,0 +1,187 @@
+import calendar
+from collections import deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import count as _count
+
+# --- Luật lặp lại ---
+# Tập con RRULE của iCalendar (RFC 5545): FREQ=DAILY/WEEKLY/MONTHLY, INTERVAL,
+# BYDAY (MONTHLY cho phép thứ tự: 1MO, -1FR...), UNTIL, COUNT. Thời gian là giờ
+# địa phương "trôi nổi" (không múi giờ), cùng quy ước với start_time trong CSDL.
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+UNTIL_FORMAT = "%Y%m%dT%H%M%S"
+# Số chu kỳ liên tiếp không sinh được lần lặp nào trước khi coi như chuỗi đã hết
+# (chặn vòng lặp vô hạn với luật không bao giờ khớp, VD DAILY;INTERVAL=7;BYDAY=<thứ khác>)
+MAX_IDLE_PERIODS = 1000
+
+class RecurrenceRule:
+    """
+    1 luật lặp lại đã kiểm tra. byday: tuple (thứ tự hoặc None, thứ 0=Thứ 2..6=CN).
+    Tạo từ chuỗi RRULE bằng RecurrenceRule.parse(); str(rule) cho lại dạng chuẩn.
+    """
+    __slots__ = ("freq", "interval", "byday", "until", "count")
+
+    def __init__(self, freq, interval=1, byday=(), until=None, count=None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Kiểu lặp lại không hỗ trợ: {freq!r}")
+        if int(interval) < 1:
+            raise ValueError(f"INTERVAL phải >= 1: {interval!r}")
+        if count is not None and int(count) < 1:
+            raise ValueError(f"COUNT phải >= 1: {count!r}")
+        for ordinal, weekday in byday:
+            if ordinal is not None and (freq != "MONTHLY" or not 1 <= abs(ordinal) <= 5):
+                raise ValueError(f"BYDAY có thứ tự không hợp lệ với {freq}: {ordinal}{WEEKDAY_CODES[weekday]}")
+        self.freq = freq
+        self.interval = int(interval)
+        self.byday = tuple(sorted(set(byday), key=lambda item: (item[1], item[0] or 0)))
+        self.until = until
+        self.count = int(count) if count is not None else None
+
+    @classmethod
+    def parse(cls, text):
+        """'FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20251231T235959' -> RecurrenceRule. ValueError nếu sai."""
+        parts = {}
+        for part in str(text).strip().removeprefix("RRULE:").split(";"):
+            if not part:
+                continue
+            name, sep, value = part.partition("=")
+            if not sep:
+                raise ValueError(f"RRULE không hợp lệ: {text!r}")
+            parts[name.strip().upper()] = value.strip().upper()
+        unsupported = set(parts) - {"FREQ", "INTERVAL", "BYDAY", "UNTIL", "COUNT", "WKST"}
+        if unsupported:
+            raise ValueError(f"RRULE có thuộc tính không hỗ trợ: {', '.join(sorted(unsupported))}")
+        if parts.get("WKST", "MO") != "MO":
+            raise ValueError("Chỉ hỗ trợ tuần bắt đầu từ Thứ 2 (WKST=MO)")
+        try:
+            byday = tuple(_parse_byday(item) for item in parts["BYDAY"].split(",")) if parts.get("BYDAY") else ()
+            until = _parse_until(parts["UNTIL"]) if parts.get("UNTIL") else None
+            return cls(parts.get("FREQ"), parts.get("INTERVAL", 1), byday, until, parts.get("COUNT"))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"RRULE không hợp lệ: {text!r}") from e
+
+    def __str__(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(f"{ordinal or ''}{WEEKDAY_CODES[weekday]}" for ordinal, weekday in self.byday))
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime(UNTIL_FORMAT)}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        return ";".join(parts)
+
+    def __repr__(self):
+        return f"RecurrenceRule({str(self)!r})"
+
+def _parse_byday(item):
+    item = item.strip()
+    code, ordinal = item[-2:], item[:-2]
+    if code not in WEEKDAY_CODES:
+        raise ValueError(f"BYDAY không hợp lệ: {item!r}")
+    try:
+        return (int(ordinal) if ordinal and ordinal != "+" else None), WEEKDAY_CODES.index(code)
+    except ValueError:
+        raise ValueError(f"BYDAY không hợp lệ: {item!r}") from None
+
+def _parse_until(value):
+    # UNTIL dạng ngày (YYYYMMDD) -> hết ngày đó; hậu tố Z (UTC) được coi như giờ địa phương
+    value = value.rstrip("Z")
+    if len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d").replace(hour=23, minute=59, second=59)
+    return datetime.strptime(value, UNTIL_FORMAT)
+
+@lru_cache(maxsize=256)
+def parse_rule(text):
+    """RecurrenceRule.parse() có bộ đệm: mỗi chuỗi RRULE trong CSDL chỉ parse 1 lần."""
+    return RecurrenceRule.parse(text)
+
+# --- Sinh các lần lặp ---
+def _week_start(dt):
+    return (dt - timedelta(days=dt.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _period_index(rule, dtstart, dt):
+    """Chỉ số chu kỳ (0 = chu kỳ chứa dtstart) chứa thời điểm dt."""
+    if rule.freq == "DAILY":
+        days = (dt.date() - dtstart.date()).days
+    elif rule.freq == "WEEKLY":
+        days = (_week_start(dt) - _week_start(dtstart)).days // 7
+    else:
+        days = (dt.year - dtstart.year) * 12 + dt.month - dtstart.month
+    return days // rule.interval
+
+def _period(rule, dtstart, index):
+    """(thời điểm bắt đầu chu kỳ, các lần lặp ứng viên đã sắp xếp) của chu kỳ thứ `index`."""
+    clock = {"hour": dtstart.hour, "minute": dtstart.minute, "second": dtstart.second}
+    weekdays = {weekday for _, weekday in rule.byday}
+    if rule.freq == "DAILY":
+        day = dtstart + timedelta(days=index * rule.interval)
+        return day.replace(hour=0, minute=0, second=0), [day] if not weekdays or day.weekday() in weekdays else []
+    if rule.freq == "WEEKLY":
+        week = _week_start(dtstart) + timedelta(weeks=index * rule.interval)
+        days = sorted(weekdays) if weekdays else [dtstart.weekday()]
+        return week, [(week + timedelta(days=weekday)).replace(**clock) for weekday in days]
+    month_index = dtstart.month - 1 + index * rule.interval
+    year, month = dtstart.year + month_index // 12, month_index % 12 + 1
+    days_in_month = calendar.monthrange(year, month)[1]
+    if not rule.byday:
+        # Tháng không có ngày đó (VD 31/4) thì bỏ qua, như RFC 5545
+        days = [dtstart.day] if dtstart.day <= days_in_month else []
+    else:
+        days = set()
+        for ordinal, weekday in rule.byday:
+            first = (weekday - calendar.weekday(year, month, 1)) % 7 + 1
+            matches = list(range(first, days_in_month + 1, 7))
+            if ordinal is None:
+                days.update(matches)
+            elif ordinal <= len(matches) and -ordinal <= len(matches):
+                days.add(matches[ordinal - 1 if ordinal > 0 else ordinal])
+        days = sorted(days)
+    return datetime(year, month, 1), [datetime(year, month, day, **clock) for day in days]
+
+def iter_occurrences(rule, dtstart, window_start=None, window_end=None, exdates=()):
+    """
+    Các lần lặp (datetime giờ địa phương) của chuỗi bắt đầu `dtstart` nằm trong
+    [window_start, window_end] (None = không giới hạn), theo thứ tự thời gian, trừ `exdates`.
+
+    Sinh dần (generator): luật không có COUNT nhảy thẳng tới chu kỳ chứa window_start
+    nên chi phí chỉ tỉ lệ với số lần lặp trong khoảng, không phụ thuộc chuỗi đã kéo dài
+    bao lâu. Chuỗi vô hạn không có window_end thì nơi gọi phải tự dừng.
+    """
+    skip = set(exdates)
+    first = 0
+    if rule.count is None and window_start is not None and window_start > dtstart:
+        first = max(_period_index(rule, dtstart, window_start) - 1, 0)
+    emitted = 0
+    last_hit = first
+    for index in _count(first):
+        period_start, candidates = _period(rule, dtstart, index)
+        if window_end is not None and period_start > window_end:
+            return
+        if rule.until is not None and period_start > rule.until:
+            return
+        for dt in candidates:
+            if dt < dtstart:
+                continue
+            last_hit = index
+            if rule.until is not None and dt > rule.until:
+                return
+            if rule.count is not None:
+                if emitted >= rule.count:
+                    return
+                emitted += 1
+            if window_end is not None and dt > window_end:
+                return
+            if (window_start is None or dt >= window_start) and dt not in skip:
+                yield dt
+        if index - last_hit > MAX_IDLE_PERIODS:
+            return
+
+def last_occurrence(rule, dtstart):
+    """Lần lặp cuối (không tính exdates) của chuỗi hữu hạn (UNTIL/COUNT); None nếu vô hạn hoặc rỗng."""
+    if rule.until is None and rule.count is None:
+        return None
+    last = deque(iter_occurrences(rule, dtstart), maxlen=1)
+    return last[0] if last else None
@@ -1,86 +1,128 @@
+import heapq
 import threading
 import time
 from datetime import datetime, timedelta
 from queue import Queue
-import winsound 
 
 try:
-    from . import database
+    from . import database, metrics
+    from .notifier import NotificationDispatcher, Notifier
 except ImportError:
-    import database
+    import database, metrics
+    from notifier import NotificationDispatcher, Notifier
 
 class ReminderThread(threading.Thread):
-    def __init__(self, queue: Queue, check_interval_seconds=60):
+    """
+    Bộ lập lịch nhắc nhở theo thời điểm đến hạn kế tiếp.
+
+    Chỉ nạp `batch_size` sự kiện chưa nhắc sớm nhất vào một min-heap (theo
+    remind_at), ngủ đúng đến thời điểm nhắc kế tiếp và được đánh thức sớm
+    khi CSDL báo lịch thay đổi (add/update/delete_event).
+    """
+    def __init__(self, queue: Queue, check_interval_seconds=60, batch_size=50,
+                 notifier: Notifier = None, on_due=None):
         super().__init__()
         self.queue = queue 
+        # Callback (gọi trên luồng này) sau mỗi đợt đưa nhắc nhở vào queue,
+        # để GUI được đánh thức ngay thay vì phải hỏi queue định kỳ
+        self.on_due = on_due
+        # Thời gian ngủ TỐI ĐA giữa hai lần kiểm tra (lưới an toàn khi đổi giờ
+        # hệ thống hoặc máy ngủ); bình thường luồng thức dậy đúng lúc đến hạn.
         self.check_interval = check_interval_seconds
+        self.batch_size = batch_size
         self.daemon = True
         self._running = True
-        print(f"[ReminderThread] Đã khởi tạo (v5.0 - Windows Sound).")
+        self._heap = []            # [(remind_at, event_id, event)]
+        self._heap_exhaustive = True  # False nếu còn sự kiện chưa nạp vào heap
+        self._dirty = True         # Cần nạp lại heap từ CSDL
+        self._rows_loaded = 0      # Số dòng đã nạp từ CSDL trong lần quét hiện tại (metrics)
+        self._wakeup = threading.Event()
+        # Âm thanh phát trên luồng riêng, không chặn việc quét nhắc nhở
+        self.dispatcher = NotificationDispatcher(notifier)
+        database.add_schedule_listener(self.wake)
+        print(f"[ReminderThread] Đã khởi tạo (v7.0 - Lập lịch theo thời điểm nhắc).")
+
+    def wake(self):
+        """Báo lịch đã thay đổi; an toàn khi gọi từ bất kỳ luồng nào."""
+        self._dirty = True
+        self._wakeup.set()
 
     def stop(self):
         self._running = False
+        database.remove_schedule_listener(self.wake)
+        self._wakeup.set()
+        self.dispatcher.stop()
 
-    def play_notification_sound(self):
-        """Phát tiếng BÍP điện tử (Giống đồng hồ báo thức)"""
-        try:
-            # winsound.Beep(tần_số_Hz, thời_gian_ms)
-            for _ in range(3):
-                winsound.Beep(1000, 200) # Tần số 1000Hz trong 200ms
-                time.sleep(0.1)          # Nghỉ xíu giữa các tiếng bíp
-            
-            print("[Audio] Đã phát tiếng Bíp báo thức.")
-        except Exception as e:
-            print(f"[Audio] Lỗi phát âm thanh: {e}")
+    def _reload(self):
+        """Nạp lại heap với các sự kiện chưa nhắc sớm nhất."""
+        self._dirty = False
+        events = database.get_upcoming_reminders(self.batch_size)
+        self._rows_loaded += len(events)
+        # remind_ts (epoch) đã được tính sẵn khi ghi; CSDL chỉ trả về dòng có remind_ts
+        heap = [(event.remind_ts, event.id, event) for event in events]
+        heapq.heapify(heap)
+        self._heap = heap
+        self._heap_exhaustive = len(events) < self.batch_size
 
     def check_for_reminders(self):
         """
-        Logic v5.0: Phát âm thanh Windows và put(event) vào queue.
+        Phát mọi nhắc nhở đã đến hạn: put(event) vào queue, gửi thông báo và
+        đánh dấu đã nhắc. Trả về số giây đến lần nhắc kế tiếp (None nếu hết).
         """
+        started = time.perf_counter()
+        self._rows_loaded = 0
+        fired = 0
         try:
-            events = database.get_all_events()
-            if not events:
-                return
-
-            now = datetime.now()
-
-            for event in events:
-                if (not event.get('start_time') or 
-                    event.get('reminder_minutes', 0) == 0):
-                    continue
-                
-                if event.get('reminded', 0) == 1:
-                    continue
-                    
-                try:
-                    time_str = event['start_time'].replace("T", " ")
-                    start_time = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-                except (ValueError, TypeError):
-                    print(f"Lỗi: Bỏ qua sự kiện {event['id']} vì định dạng thời gian sai.")
-                    continue
-                    
-                reminder_time = start_time - timedelta(minutes=event['reminder_minutes'])
-
-                if reminder_time <= now:
-                    
-                    print(f"!!! PHÁT HIỆN NHẮC NHỞ: {event['event_name']} !!!")
-                    
-                    # 1. Phát âm thanh (Logic Mới)
-                    self.play_notification_sound()
-
-                    # 2. Gửi sự kiện vào Kênh (Queue) để hiện Popup
-                    self.queue.put(event)
-                    
-                    # 3. Đánh dấu là đã nhắc
-                    database.mark_event_as_reminded(event['id'])
+            if self._dirty or (not self._heap and not self._heap_exhaustive):
+                self._reload()
+
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, event_id, event = heapq.heappop(self._heap)
+
+                print(f"!!! PHÁT HIỆN NHẮC NHỞ: {event.event_name} !!!")
+
+                # 1. Gửi sự kiện vào Kênh (Queue) để hiện Popup
+                self.queue.put(event)
+
+                # 2. Phát âm thanh (không chặn, qua luồng dispatch)
+                self.dispatcher.submit(event)
+
+                # 3. Đánh dấu là đã nhắc (chuỗi lặp lại: dời sang lần kế tiếp -> nạp lại heap)
+                database.mark_event_as_reminded(event_id)
+                fired += 1
+                if event.rrule:
+                    self._reload()
+
+                # Đã phát hết phần đã nạp nhưng CSDL còn -> nạp tiếp
+                if not self._heap and not self._heap_exhaustive:
+                    self._reload()
+                now = time.time()
+
+            # 4. Đánh thức GUI 1 lần cho cả đợt
+            if fired and self.on_due is not None:
+                self.on_due()
+
+            if self._heap:
+                return max(self._heap[0][0] - now, 0)
+            return None
 
         except Exception as e:
             print(f"Lỗi nghiêm trọng trong luồng nhắc nhở: {e}")
+            return None
+        finally:
+            metrics.record("reminder.scan", time.perf_counter() - started, rows=self._rows_loaded, due=fired)
+            metrics.incr("reminder.rows_scanned", self._rows_loaded)
+            metrics.incr("reminder.due", fired)
 
     def run(self):
+        self.dispatcher.start()
         while self._running:
-            self.check_for_reminders()
-            time.sleep(self.check_interval)
+            self._wakeup.clear()
+            delay = self.check_for_reminders()
+            if delay is None or delay > self.check_interval:
+                delay = self.check_interval
+            self._wakeup.wait(delay)
 
 # --- Test ---
 if __name__ == "__main__":
@@ -116,7 +158,7 @@ if __name__ == "__main__":
             # Mô phỏng việc GUI nhận tin nhắn
             if not test_queue.empty():
                 evt = test_queue.get()
-                print(f"\n[MAIN THREAD] Nhận được tin nhắn từ Queue: {evt['event_name']}")
+                print(f"\n[MAIN THREAD] Nhận được tin nhắn từ Queue: {evt.event_name}")
                 break
             time.sleep(1)
             
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+# Lấy đường dẫn thư mục "Documents" của người dùng (VD: C:\Users\Quang\Documents)
+USER_DOCS = os.path.join(os.path.expanduser('~'), 'Documents')
+# Thư mục dữ liệu riêng của ứng dụng: CSDL (database.py), file cài đặt và log hiệu năng
+# (metrics.py) đều dựng đường dẫn từ đây để luôn nằm cùng chỗ
+APP_DATA_DIR = os.path.join(USER_DOCS, 'TroLyLichTrinh')
+SETTINGS_PATH = os.path.join(APP_DATA_DIR, 'settings.json')
+
+DEFAULTS = {
+    # Múi giờ của lịch: start_time/end_time trong CSDL là giờ địa phương theo múi giờ này
+    "timezone": "Asia/Ho_Chi_Minh",
+    # Đo hiệu năng (core/metrics.py); bật/tắt trong bảng ẩn Ctrl+Shift+P
+    "metrics_enabled": False,
+}
+
+_settings = None
+_timezone = None
+_lock = threading.Lock()
+
+def _load():
+    global _settings
+    if _settings is None:
+        settings = dict(DEFAULTS)
+        try:
+            with open(SETTINGS_PATH, encoding='utf-8') as f:
+                settings.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Lỗi khi đọc file cài đặt, dùng mặc định: {e}")
+        _settings = settings
+    return _settings
+
+def get_setting(name):
+    with _lock:
+        return _load().get(name, DEFAULTS.get(name))
+
+def set_setting(name, value):
+    """Đổi 1 cài đặt và ghi lại file. Trả về False nếu không ghi được."""
+    global _timezone
+    with _lock:
+        settings = _load()
+        settings[name] = value
+        if name == "timezone":
+            _timezone = None
+        try:
+            os.makedirs(os.path.dirname(SETTINGS_PATH), exist_ok=True)
+            with open(SETTINGS_PATH, 'w', encoding='utf-8') as f:
+                json.dump(settings, f, ensure_ascii=False, indent=4)
+            return True
+        except OSError as e:
+            print(f"Lỗi khi lưu file cài đặt: {e}")
+            return False
+
+# --- Múi giờ ---
+def get_timezone_name():
+    return get_timezone().key
+
+def get_timezone():
+    """ZoneInfo của múi giờ cấu hình (sai tên -> dùng múi giờ mặc định)."""
+    global _timezone
+    zone = _timezone
+    if zone is None:
+        name = get_setting("timezone")
+        try:
+            zone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            print(f"Múi giờ không hợp lệ '{name}', dùng {DEFAULTS['timezone']}")
+            zone = ZoneInfo(DEFAULTS["timezone"])
+        _timezone = zone
+    return zone
+
+def set_timezone(name):
+    """Đổi múi giờ của lịch. ValueError nếu tên múi giờ không tồn tại."""
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Múi giờ không hợp lệ: {name!r}")
+    return set_setting("timezone", name)
@@ -1,18 +1,29 @@
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import messagebox, filedialog 
+from tkinter import messagebox, filedialog, TclError
 
 from queue import Queue, Empty 
 import sys
+import threading
+import time
 import os
 from datetime import datetime, timedelta
 import calendar 
+import bisect
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core import database
 from core import nlp_parser 
-from core import exporter 
-from core import reminder
+from core import metrics
+from core.settings import set_setting
+from gui.task_runner import TaskRunner
+
+# Số dòng mỗi lần nạp: đủ hơn 1 màn hình + phần nạp trước khi cuộn
+PAGE_SIZE = 100
+# Cuộn qua tỉ lệ này của phần đã nạp thì nạp trang tiếp
+PREFETCH_THRESHOLD = 0.8
+# Chu kỳ (ms) cập nhật bảng số liệu hiệu năng khi đang mở
+METRICS_REFRESH_MS = 1000
 
 class SearchDialog(ttk.Toplevel):
     def __init__(self, parent, callback):
@@ -66,10 +77,143 @@ class SearchDialog(ttk.Toplevel):
         self.callback(kw, loc, from_d, to_d)
         self.destroy()
 
+class BatchInputDialog(ttk.Toplevel):
+    """Dán nhiều câu lệnh (ghi chú cuộc họp, kế hoạch tuần...), mỗi dòng 1 sự kiện."""
+    def __init__(self, parent, callback):
+        super().__init__(parent)
+        self.title("Thêm nhiều sự kiện")
+        self.geometry("560x420")
+        self.callback = callback
+
+        frame = ttk.Frame(self, padding=20)
+        frame.pack(fill=BOTH, expand=True)
+
+        ttk.Label(frame, text="Mỗi dòng một sự kiện:", font=("Arial", 11, "bold")).pack(anchor=W, pady=(0, 10))
+        self.text = ttk.Text(frame, height=12, font=("Arial", 11))
+        self.text.pack(fill=BOTH, expand=True)
+
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill=X, pady=(10, 0))
+
+        ttk.Button(btn_frame, text="Thêm tất cả", command=self.on_submit, bootstyle="primary", width=12).pack(side=RIGHT, padx=5)
+        ttk.Button(btn_frame, text="Hủy", command=self.destroy, bootstyle="secondary", width=10).pack(side=RIGHT)
+
+    def on_submit(self):
+        lines = self.text.get("1.0", END).splitlines()
+        self.callback(lines)
+        self.destroy()
+
+class ReminderPanel(ttk.Toplevel):
+    """Bảng nhắc nhở KHÔNG chặn (non-modal): gộp mọi nhắc nhở đến cùng lúc."""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Nhắc nhở!")
+        self.geometry("520x260")
+        self.protocol("WM_DELETE_WINDOW", self.dismiss)
+
+        frame = ttk.Frame(self, padding=10)
+        frame.pack(fill=BOTH, expand=True)
+
+        self.header = ttk.Label(frame, text="", font=("Arial", 11, "bold"), bootstyle="danger")
+        self.header.pack(anchor=W, pady=(0, 8))
+
+        columns = ("event_name", "start_time", "location", "reminder_minutes")
+        self.list = ttk.Treeview(frame, columns=columns, show="headings", height=6, bootstyle="danger")
+        self.list.heading("event_name", text="Sự kiện")
+        self.list.column("event_name", width=200)
+        self.list.heading("start_time", text="Bắt đầu")
+        self.list.column("start_time", width=130, anchor="center")
+        self.list.heading("location", text="Tại")
+        self.list.column("location", width=110)
+        self.list.heading("reminder_minutes", text="Trước (p)")
+        self.list.column("reminder_minutes", width=60, anchor="center")
+        self.list.pack(fill=BOTH, expand=True)
+
+        ttk.Button(frame, text="Đã xem", command=self.dismiss, bootstyle="danger", width=10).pack(anchor=E, pady=(8, 0))
+
+    def add_reminders(self, events):
+        for event in events:
+            self.list.insert("", 0, values=(event.event_name, event.start_time or "", event.location or "", event.reminder_minutes))
+        count = len(self.list.get_children())
+        self.header.config(text=f"Có {count} sự kiện sắp diễn ra")
+        self.deiconify()
+        self.lift()
+        self.bell()
+
+    def dismiss(self):
+        self.list.delete(*self.list.get_children())
+        self.withdraw()
+
+class PerformancePanel(ttk.Toplevel):
+    """Bảng ẩn (Ctrl+Shift+P): p50/p95 của các thao tác gần đây, bật/tắt đo hiệu năng."""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Hiệu năng")
+        self.geometry("640x420")
+        self.protocol("WM_DELETE_WINDOW", self.withdraw)
+
+        frame = ttk.Frame(self, padding=10)
+        frame.pack(fill=BOTH, expand=True)
+
+        top = ttk.Frame(frame)
+        top.pack(fill=X, pady=(0, 8))
+        self.enabled_var = ttk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(top, text="Bật đo hiệu năng", variable=self.enabled_var, command=self.toggle,
+                        bootstyle="round-toggle").pack(side=LEFT)
+        ttk.Button(top, text="Đặt lại", command=self.reset, bootstyle="secondary-outline").pack(side=RIGHT)
+        ttk.Label(frame, text=f"Log: {metrics.LOG_PATH}", bootstyle="secondary").pack(anchor=W, pady=(0, 5))
+
+        columns = ("name", "count", "p50", "p95", "max")
+        self.list = ttk.Treeview(frame, columns=columns, show="headings", bootstyle="info")
+        for column, text, width, anchor in (("name", "Chỉ số", 220, W), ("count", "Số lần", 70, "center"),
+                                            ("p50", "p50 (ms)", 90, E), ("p95", "p95 (ms)", 90, E),
+                                            ("max", "Max (ms)", 90, E)):
+            self.list.heading(column, text=text)
+            self.list.column(column, width=width, anchor=anchor)
+        self.list.pack(fill=BOTH, expand=True)
+        self.counters_label = ttk.Label(frame, text="", bootstyle="secondary")
+        self.counters_label.pack(anchor=W, pady=(5, 0))
+        self.refresh_id = None
+        self.refresh()
+
+    def toggle(self):
+        if self.enabled_var.get():
+            metrics.enable()
+        else:
+            metrics.disable()
+        set_setting("metrics_enabled", metrics.enabled)
+        self.refresh()
+
+    def reset(self):
+        metrics.reset()
+        self.refresh()
+
+    def show(self):
+        self.deiconify()
+        self.lift()
+        self.refresh()
+
+    def refresh(self):
+        if self.refresh_id is not None:
+            self.after_cancel(self.refresh_id)
+            self.refresh_id = None
+        # Chỉ tự cập nhật khi đang hiện
+        if not self.winfo_exists() or self.state() == "withdrawn": return
+        data = metrics.snapshot()
+        self.list.delete(*self.list.get_children())
+        for name, stats in data["timings"].items():
+            self.list.insert("", "end", values=(name, stats["count"], f"{stats['p50_ms']:.2f}",
+                                                f"{stats['p95_ms']:.2f}", f"{stats['max_ms']:.2f}"))
+        self.counters_label.config(text="  ".join(f"{name}: {value}" for name, value in data["counters"].items())
+                                   or ("Chưa có số liệu" if metrics.enabled else "Đang tắt"))
+        self.refresh_id = self.after(METRICS_REFRESH_MS, self.refresh)
+
 class MainWindow(ttk.Window):
     def __init__(self, queue: Queue): 
         super().__init__(themename="flatly")
         self.reminder_queue = queue 
+        # Mọi thao tác NLP/CSDL/xuất file chạy trên luồng nền, không chặn Tk
+        self.tasks = TaskRunner(self)
         self.title("Trợ lý lịch trình cá nhân")
         self.geometry("1000x800") 
         
@@ -86,6 +230,8 @@ class MainWindow(ttk.Window):
         
         self.add_nlp_button = ttk.Button(input_frame, text="Thêm", command=self.add_event_from_nlp, bootstyle="primary")
         self.add_nlp_button.pack(side=LEFT, padx=5, fill=Y)
+        self.batch_button = ttk.Button(input_frame, text="Nhiều dòng", command=self.open_batch_dialog, bootstyle="primary-outline")
+        self.batch_button.pack(side=LEFT, padx=5, fill=Y)
 
         # --- 2. Edit Frame ---
         edit_frame = ttk.Labelframe(main_frame, text="Chi tiết / Sửa sự kiện", padding="15")
@@ -130,6 +276,8 @@ class MainWindow(ttk.Window):
         self.export_json_button.pack(side=RIGHT, padx=5)
         self.export_ics_button = ttk.Button(button_frame, text="Xuất ICS", command=self.export_ics, bootstyle="info-outline")
         self.export_ics_button.pack(side=RIGHT, padx=5)
+        self.import_button = ttk.Button(button_frame, text="Nhập file", command=self.import_file, bootstyle="secondary-outline")
+        self.import_button.pack(side=RIGHT, padx=5)
 
         # --- 4. Thanh Lọc Nhanh ---
         filter_frame = ttk.Frame(main_frame)
@@ -148,9 +296,22 @@ class MainWindow(ttk.Window):
         tree_frame = ttk.Frame(main_frame, padding="0")
         tree_frame.pack(fill=BOTH, expand=True)
         columns = ("id", "event_name", "start_time", "end_time", "location", "reminder_minutes")
+
+        # Trạng thái phân trang: bộ lọc hiện tại + keyset cursor của dòng cuối đã nạp
+        self.current_filters = {}
+        self.page_after = None
+        self.has_more = False
+        self.page_pending = False
+        self.total_count = 0
+        # Các dòng đã nạp: khóa sắp xếp Event.sort_key = (start_ts, id) theo đúng thứ tự trên bảng,
+        # và map event id -> khóa. Item id của Treeview chính là str(event id).
+        self.row_keys = []
+        self.row_key_by_id = {}
         
         scrollbar = ttk.Scrollbar(tree_frame, orient=VERTICAL, bootstyle="primary-round")
-        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", bootstyle="primary", yscrollcommand=scrollbar.set)
+        self.tree_scrollbar = scrollbar
+        # Bảng chỉ nạp từng trang: cuộn gần cuối phần đã nạp mới nạp trang tiếp
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", bootstyle="primary", yscrollcommand=self.on_tree_scroll)
         
         scrollbar.config(command=self.tree.yview) 
         scrollbar.pack(side=RIGHT, fill=Y)
@@ -170,9 +331,25 @@ class MainWindow(ttk.Window):
         self.tree.column("reminder_minutes", width=80, anchor="center")
         
         self.tree.bind("<<TreeviewSelect>>", self.on_item_select)
+
+        self.count_label = ttk.Label(main_frame, text="", bootstyle="secondary")
+        self.count_label.pack(anchor=E, pady=(5, 0))
         
         self.refresh_event_list()
-        self.check_reminder_queue()
+
+        # Nhắc nhở: luồng nền gọi wake_reminders() -> sự kiện ảo <<ReminderDue>> được xếp vào
+        # hàng đợi sự kiện của luồng Tk (không hẹn giờ hỏi queue định kỳ); lấy luôn những gì
+        # đã đến trước khi mở cửa sổ
+        self.reminder_panel = None
+        self.reminder_wake_lock = threading.Lock()
+        self.reminder_wake_pending = False
+        self.bind("<<ReminderDue>>", self.drain_reminder_queue)
+        self.after_idle(self.drain_reminder_queue)
+
+        # Bảng hiệu năng ẩn
+        self.performance_panel = None
+        self.bind_all("<Control-Shift-P>", self.toggle_performance_panel)
+        self.bind_all("<Control-Shift-p>", self.toggle_performance_panel)
 
     # --- HÀM LỌC NHANH ---
     def quick_filter(self, mode):
@@ -208,56 +385,224 @@ class MainWindow(ttk.Window):
         SearchDialog(self, self.perform_advanced_search)
 
     def perform_advanced_search(self, keyword, location, from_date, to_date):
-        try:
-            events = database.search_events_advanced(keyword, location, from_date, to_date)
-            if not events:
+        filters = {"keyword": keyword, "location": location, "from_date": from_date, "to_date": to_date}
+        def on_loaded(total):
+            if total == 0:
                 messagebox.showinfo("Kết quả", "Không tìm thấy sự kiện nào trong khoảng thời gian này.")
-                self.tree.delete(*self.tree.get_children())
-            else:
-                self.refresh_event_list(events) 
-        except AttributeError:
+        self.refresh_event_list(filters, on_loaded=on_loaded)
+    def show_task_error(self, error):
+        if isinstance(error, AttributeError):
             messagebox.showerror("Lỗi Database", "Vui lòng cập nhật file database.py")
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"{e}")
+        else:
+            messagebox.showerror("Lỗi", f"{error}")
 #Xuất JSON
     def export_json(self):
-        filepath = filedialog.asksaveasfilename(title="Lưu file JSON", defaultextension=".json", filetypes=[("JSON Files", "*.json")])
+        filepath = filedialog.asksaveasfilename(title="Lưu file JSON", defaultextension=".json", filetypes=[("JSON Files", "*.json"), ("NDJSON (mỗi dòng 1 sự kiện)", "*.ndjson"), ("JSON nén gzip", "*.json.gz *.ndjson.gz")])
         if not filepath: return 
-        try:
-            if exporter.export_to_json(filepath): messagebox.showinfo("Thành công", f"Đã xuất JSON: {filepath}")
-        except Exception as e: messagebox.showerror("Lỗi", f"{e}")
+        from core import exporter  # Chỉ nạp khi dùng (không làm chậm lúc mở cửa sổ)
+        self.run_export(self.export_json_button, exporter.export_to_json, filepath, f"Đã xuất JSON: {filepath}")
 #Xuất ICS
     def export_ics(self):
         filepath = filedialog.asksaveasfilename(title="Lưu file Lịch", defaultextension=".ics", filetypes=[("iCalendar", "*.ics")])
         if not filepath: return 
+        from core import exporter
+        self.run_export(self.export_ics_button, exporter.export_to_ics, filepath, f"Đã xuất ICS: {filepath}")
+    def run_export(self, button, export_fn, filepath, message):
+        self.set_pending(button, True)
+        self.tasks.submit(("export", export_fn), export_fn, filepath,
+                          on_success=lambda ok: ok and messagebox.showinfo("Thành công", message),
+                          on_error=self.show_task_error,
+                          on_finally=lambda: self.set_pending(button, False))
+#Nhập file JSON/ICS/CSV: chạy thử (dry run) để báo trước, người dùng đồng ý mới ghi
+    def import_file(self):
+        filepath = filedialog.askopenfilename(title="Chọn file cần nhập", filetypes=[("Lịch / dữ liệu", "*.json *.ndjson *.ics *.csv"), ("JSON", "*.json *.ndjson"), ("iCalendar", "*.ics"), ("CSV", "*.csv")])
+        if not filepath: return
+        from core import importer  # Chỉ nạp khi dùng
+        import_fn = importer.IMPORTERS.get(os.path.splitext(filepath)[1].lower())
+        if import_fn is None: return messagebox.showwarning("Không hỗ trợ", "Chỉ nhập được file JSON, ICS hoặc CSV.")
+        def summary(report):
+            message = f"Đọc {report['read']} sự kiện: mới {report['new']}, trùng {report['duplicates']}, lỗi {report['invalid']}."
+            if report['errors']: message += "\n\n" + "\n".join(report['errors'][:5])
+            return message
+        def imported(report):
+            if report is None: return messagebox.showerror("Lỗi", "Không nhập được file.")
+            messagebox.showinfo("Nhập file", f"Đã thêm {report['inserted']} sự kiện ({report['rows_per_second']:.0f} sự kiện/giây).")
+            if report['inserted']: self.refresh_event_list()
+        def checked(report):
+            if report is None: return messagebox.showerror("Lỗi", "Không đọc được file.")
+            if not report['new']: return messagebox.showinfo("Nhập file", summary(report))
+            if not messagebox.askyesno("Nhập file", summary(report) + "\n\nThêm các sự kiện mới vào lịch?"): return
+            self.run_import(import_fn, filepath, False, imported)
+        self.run_import(import_fn, filepath, True, checked)
+    def run_import(self, import_fn, filepath, dry_run, on_success):
+        self.set_pending(self.import_button, True)
+        self.tasks.submit("import", lambda: import_fn(filepath, dry_run=dry_run), on_success=on_success,
+                          on_error=self.show_task_error, on_finally=lambda: self.set_pending(self.import_button, False))
+#Nút đang chờ công việc nền: khóa lại và đổi chữ
+    def set_pending(self, button, pending):
+        if pending:
+            button.idle_text = button.cget("text")
+            button.config(text="Đang xử lý...", state=DISABLED)
+        else:
+            button.config(text=getattr(button, "idle_text", button.cget("text")), state=NORMAL)
+# --- Nhận nhắc nhở từ luồng nền ---
+    def toggle_performance_panel(self, event=None):
+        panel = self.performance_panel
+        if panel is None or not panel.winfo_exists():
+            self.performance_panel = PerformancePanel(self)
+        elif panel.state() == "withdrawn":
+            panel.show()
+        else:
+            panel.withdraw()
+    def wake_reminders(self):
+        # Gọi từ luồng nhắc nhở. Không đụng widget: event_generate(when="tail") chỉ xếp
+        # <<ReminderDue>> vào hàng đợi, handler chạy trên luồng Tk. Gọi liên tiếp -> 1 sự kiện
+        with self.reminder_wake_lock:
+            if self.reminder_wake_pending: return
+            self.reminder_wake_pending = True
         try:
-            if exporter.export_to_ics(filepath): messagebox.showinfo("Thành công", f"Đã xuất ICS: {filepath}")
-        except Exception as e: messagebox.showerror("Lỗi", f"{e}")
-# --- Kiểm tra kênh nhắc nhở ---
-    def check_reminder_queue(self):
-        try:
-            event = self.reminder_queue.get(block=False) 
-            messagebox.showinfo("Nhắc nhở!", f"Sự kiện: {event['event_name']}\nTại: {event.get('location', '')}\n(Trước {event['reminder_minutes']}p)")
-        except Empty: pass 
-        self.after(1000, self.check_reminder_queue)
+            self.event_generate("<<ReminderDue>>", when="tail")
+        except (RuntimeError, TclError):
+            # Vòng lặp Tk chưa chạy/đã dừng: after_idle lúc khởi động sẽ lấy
+            with self.reminder_wake_lock: self.reminder_wake_pending = False
+    def drain_reminder_queue(self, event=None):
+        # Lấy HẾT nhắc nhở đang chờ trong 1 lượt và hiện chung 1 bảng
+        with self.reminder_wake_lock: self.reminder_wake_pending = False
+        events = []
+        while True:
+            try: events.append(self.reminder_queue.get_nowait())
+            except Empty: break
+        if not events: return
+        if self.reminder_panel is None or not self.reminder_panel.winfo_exists():
+            self.reminder_panel = ReminderPanel(self)
+        self.reminder_panel.add_reminders(events)
 # Thêm sự kiện từ NLP            
     def add_event_from_nlp(self, event=None):
         text = self.nlp_entry.get()
         if not text: return messagebox.showwarning("Thiếu thông tin", "Nhập nội dung sự kiện.")
-        try:
+        if self.tasks.is_pending("nlp"): return
+        filters = dict(self.current_filters)
+        def work():
             data = nlp_parser.process_nlp(text)
+            if not data.get("event"): return data, None, False, []
+            row = database.add_event(data["event"], data["start_time"], data["end_time"], data["location"], data["reminder_minutes"], data.get("rrule"))
+            if not row: return data, None, False, []
+            conflicts = database.find_overlapping(row.start_time, row.end_time, exclude_id=row.id)
+            return data, row, database.event_matches_filter(row.id, **filters), conflicts
+        def done(result):
+            data, row, matches, conflicts = result
             if not data.get("event"): return messagebox.showerror("Lỗi", "Không hiểu tên sự kiện.")
-            if database.add_event(data["event"], data["start_time"], data["end_time"], data["location"], data["reminder_minutes"]):
-                messagebox.showinfo("OK", f"Đã thêm: {data['event']}")
-                self.refresh_event_list()
+            if row:
+                if conflicts:
+                    lines = "\n".join(f"- {e.start_time}: {e.event_name}" for e in conflicts[:5])
+                    if len(conflicts) > 5: lines += f"\n... và {len(conflicts) - 5} sự kiện khác"
+                    messagebox.showwarning("Trùng lịch", f"Đã thêm: {data['event']}\nNhưng trùng giờ với:\n{lines}")
+                else:
+                    messagebox.showinfo("OK", f"Đã thêm: {data['event']}" + (" (lặp lại)" if row.rrule else ""))
+                self.apply_event_change(None, row, matches)
                 self.nlp_entry.delete(0, END)
-        except Exception as e: messagebox.showerror("Lỗi", f"{e}")
-#Tải lại danh sách sự kiện
-    def refresh_event_list(self, events=None):
-        self.tree.delete(*self.tree.get_children())
-        if events is None: events = database.get_all_events()
+        self.set_pending(self.add_nlp_button, True)
+        self.tasks.submit("nlp", work, on_success=done, on_error=self.show_task_error,
+                          on_finally=lambda: self.set_pending(self.add_nlp_button, False))
+# Thêm nhiều sự kiện cùng lúc: phân tích cả lô, ghi CSDL trong 1 giao dịch
+    def open_batch_dialog(self):
+        BatchInputDialog(self, self.add_events_batch)
+    def add_events_batch(self, lines):
+        if self.tasks.is_pending("batch"): return
+        def work():
+            rows, skipped = [], []
+            for line, data in nlp_parser.process_nlp_batch(lines):
+                if data.get("event") and data.get("start_time"):
+                    rows.append((data["event"], data["start_time"], data["end_time"], data["location"], data["reminder_minutes"], data.get("rrule"), None))
+                else:
+                    skipped.append(line)
+            return database.add_events_bulk(rows), skipped
+        def done(result):
+            added, skipped = result
+            if added is None: return messagebox.showerror("Lỗi", "Không thêm được sự kiện nào.")
+            message = f"Đã thêm {added} sự kiện."
+            if skipped: message += f"\nBỏ qua {len(skipped)} dòng không hiểu tên hoặc thời gian sự kiện:\n" + "\n".join(skipped[:10])
+            messagebox.showinfo("OK", message)
+            if added: self.refresh_event_list()
+        self.set_pending(self.batch_button, True)
+        self.tasks.submit("batch", work, on_success=done, on_error=self.show_task_error,
+                          on_finally=lambda: self.set_pending(self.batch_button, False))
+#Tải lại danh sách sự kiện (chỉ nạp trang đầu theo bộ lọc)
+    def refresh_event_list(self, filters=None, on_loaded=None):
+        if filters is not None: self.current_filters = filters
+        filters = dict(self.current_filters)
+        def work():
+            return database.count_events(**filters), database.get_events_page(**filters, limit=PAGE_SIZE)
+        def done(result):
+            total, (events, after) = result
+            started = time.perf_counter()
+            self.tree.delete(*self.tree.get_children())
+            self.row_keys = []
+            self.row_key_by_id = {}
+            self.total_count = total
+            self.append_page(events, after)
+            metrics.record("gui.tree_refresh", time.perf_counter() - started, rows=len(events))
+            if on_loaded: on_loaded(total)
+        self.count_label.config(text="Đang tải...")
+        # Cùng kênh "page": bộ lọc mới sẽ hủy lần tải/nạp trang cũ
+        self.tasks.submit("page", work, on_success=done, on_error=self.show_task_error, on_finally=self.clear_page_pending)
+#Nạp trang tiếp theo (keyset cursor)
+    def load_next_page(self):
+        if not self.has_more: return
+        self.page_pending = True
+        filters, after = dict(self.current_filters), self.page_after
+        self.tasks.submit("page", lambda: database.get_events_page(**filters, after=after, limit=PAGE_SIZE),
+                          on_success=lambda result: self.append_page(*result), on_error=self.show_task_error,
+                          on_finally=self.clear_page_pending)
+    def clear_page_pending(self):
+        self.page_pending = False
+    def append_page(self, events, after):
+        started = time.perf_counter()
+        self.page_after = after
+        self.has_more = after is not None
         for e in events:
-            self.tree.insert("", "end", values=(e['id'], e['event_name'], e['start_time'] or "", e['end_time'] or "", e['location'] or "", e['reminder_minutes']))
+            key = e.sort_key
+            self.tree.insert("", "end", iid=self.row_iid(e), values=self.row_values(e))
+            self.row_keys.append(key)
+            self.row_key_by_id[e.id] = key
+        self.update_count_label()
+        metrics.record("gui.tree_append", time.perf_counter() - started, rows=len(events))
+#Cuộn bảng: nạp trước trang tiếp khi gần đến cuối phần đã nạp
+    def on_tree_scroll(self, first, last):
+        self.tree_scrollbar.set(first, last)
+        if self.has_more and not self.page_pending and float(last) >= PREFETCH_THRESHOLD:
+            self.load_next_page()
+    def row_iid(self, e):
+        # Các lần lặp của 1 chuỗi cùng id -> item id kèm giờ bắt đầu cho khỏi trùng
+        return f"{e.id}@{e.start_ts}" if e.rrule else str(e.id)
+    def row_values(self, e):
+        return (e.id, e.event_name, e.start_time or "", e.end_time or "", e.location or "", e.reminder_minutes)
+    def update_count_label(self):
+        self.count_label.config(text=f"Đang hiển thị {len(self.row_keys)} / {self.total_count} sự kiện")
+#Cập nhật đúng 1 dòng sau khi thêm/sửa/xóa (không tải lại cả bảng)
+    def apply_event_change(self, old, new, new_matches=False):
+        # old/new: dòng (Event) trước/sau thay đổi, None khi thêm/xóa (old chỉ cần đúng id);
+        # new_matches: dòng mới có khớp bộ lọc hiện tại không (đã kiểm tra ở luồng nền)
+        if (old is not None and old.rrule) or (new is not None and new.rrule):
+            # Chuỗi lặp lại có thể hiện ở nhiều dòng -> nạp lại cả bảng
+            return self.refresh_event_list()
+        if old is not None:
+            key = self.row_key_by_id.pop(old.id, None)
+            if key is not None:
+                del self.row_keys[bisect.bisect_left(self.row_keys, key)]
+                self.tree.delete(str(old.id))
+            self.total_count -= 1
+        if new is not None and new_matches:
+            self.total_count += 1
+            key = new.sort_key
+            # Nằm sau dòng cuối đã nạp mà còn trang chưa nạp -> để phân trang tự mang tới
+            if not self.has_more or (self.row_keys and key < self.row_keys[-1]):
+                index = bisect.bisect_left(self.row_keys, key)
+                self.row_keys.insert(index, key)
+                self.row_key_by_id[new.id] = key
+                self.tree.insert("", index, iid=str(new.id), values=self.row_values(new))
+                self.tree.see(str(new.id))
+        self.update_count_label()
 #Chọn sự kiện từ Treeview
     def on_item_select(self, event):
         sel = self.tree.selection()
@@ -279,25 +624,74 @@ class MainWindow(ttk.Window):
         self.entry_reminder.insert(0, "0")
         if clear_tree:
             if self.tree.selection(): self.tree.selection_remove(self.tree.selection()[0])
-            self.refresh_event_list()
+            self.refresh_event_list({})
 #Sửa sư kiện
     def update_event(self):
         sel = self.tree.selection()
         if not sel: return messagebox.showerror("Lỗi", "Chọn sự kiện để sửa.")
-        eid = self.tree.item(sel[0])['values'][0]
-        if database.update_event(eid, self.entry_event.get(), self.entry_start.get(), self.entry_end.get(), self.entry_location.get(), int(self.entry_reminder.get() or 0)):
-            messagebox.showinfo("OK", "Đã cập nhật.")
-            self.refresh_event_list()
-            self.clear_fields(False)
+        val = self.tree.item(sel[0])['values']
+        eid = val[0]
+        reminder = self.entry_reminder.get().strip() or "0"
+        if not reminder.isdecimal(): return messagebox.showerror("Lỗi", "Số phút nhắc trước phải là số nguyên không âm.")
+        values = (eid, self.entry_event.get(), self.entry_start.get(), self.entry_end.get(), self.entry_location.get(), int(reminder))
+        if "@" in sel[0]:
+            # 1 lần của chuỗi lặp lại: Có = chỉ sửa lần này (tách thành sự kiện riêng), Không = sửa cả chuỗi
+            choice = messagebox.askyesnocancel("Sửa", f"Chỉ sửa lần {val[2]} của: {val[1]}?\n(Chọn 'No' để sửa cả chuỗi lặp lại)")
+            if choice is None: return
+            update = database.update_occurrence if choice else database.update_series
+            def series_done(row):
+                if row:
+                    messagebox.showinfo("OK", "Đã cập nhật.")
+                    self.refresh_event_list()
+                    self.clear_fields(False)
+            self.set_pending(self.update_button, True)
+            self.tasks.submit("update", update, eid, val[2], *values[1:], on_success=series_done, on_error=self.show_task_error,
+                              on_finally=lambda: self.set_pending(self.update_button, False))
+            return
+        filters = dict(self.current_filters)
+        def work():
+            row = database.update_event(*values)
+            return row, bool(row) and database.event_matches_filter(eid, **filters)
+        def done(result):
+            row, matches = result
+            if row:
+                messagebox.showinfo("OK", "Đã cập nhật.")
+                self.apply_event_change(row, row, matches)
+                self.clear_fields(False)
+        self.set_pending(self.update_button, True)
+        self.tasks.submit("update", work, on_success=done, on_error=self.show_task_error,
+                          on_finally=lambda: self.set_pending(self.update_button, False))
 #Xóa sự kiện
     def delete_event(self):
         sel = self.tree.selection()
         if not sel: return messagebox.showerror("Lỗi", "Chọn sự kiện để xóa.")
         val = self.tree.item(sel[0])['values']
-        if messagebox.askyesno("Xóa", f"Xóa: {val[1]}?"):
-            if database.delete_event(val[0]):
-                self.refresh_event_list()
+        if "@" in sel[0]:
+            # 1 lần của chuỗi lặp lại: Có = chỉ bỏ lần này, Không = xóa cả chuỗi
+            choice = messagebox.askyesnocancel("Xóa", f"Chỉ xóa lần {val[2]} của: {val[1]}?\n(Chọn 'No' để xóa cả chuỗi lặp lại)")
+            if choice is None: return
+            if choice:
+                def skipped(row):
+                    if row:
+                        self.refresh_event_list()
+                        self.clear_fields(False)
+                self.set_pending(self.delete_button, True)
+                self.tasks.submit("delete", database.skip_occurrence, val[0], val[2], on_success=skipped, on_error=self.show_task_error,
+                                  on_finally=lambda: self.set_pending(self.delete_button, False))
+                return
+        elif not messagebox.askyesno("Xóa", f"Xóa: {val[1]}?"):
+            return
+        def done(row):
+            if row:
+                self.apply_event_change(row, None)
                 self.clear_fields(False)
+        self.set_pending(self.delete_button, True)
+        self.tasks.submit("delete", database.delete_event, val[0], on_success=done, on_error=self.show_task_error,
+                          on_finally=lambda: self.set_pending(self.delete_button, False))
+#Đóng cửa sổ: dừng các công việc nền còn chờ
+    def destroy(self):
+        self.tasks.shutdown()
+        super().destroy()
 
 if __name__ == "__main__":
     # 1. Khởi tạo Database
@@ -307,6 +701,7 @@ if __name__ == "__main__":
     main_queue = Queue()
     
     # 3. KHỞI CHẠY LUỒNG NHẮC NHỞ 
+    from core import reminder
 
     reminder_thread = reminder.ReminderThread(queue=main_queue, check_interval_seconds=60)
     reminder_thread.start()
@@ -315,8 +710,10 @@ if __name__ == "__main__":
     # 4. Chạy giao diện chính
     try:
         app = MainWindow(queue=main_queue)
+        reminder_thread.on_due = app.wake_reminders
         app.mainloop()
     finally:
         # 5. Dừng luồng khi tắt app để không bị treo máy
         print("Đang dừng hệ thống...")
-        reminder_thread.stop()
\ No newline at end of file
+        reminder_thread.stop()
+        database.close_all_connections()
\ No newline at end of file
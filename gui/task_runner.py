@@ -0,0 +1,95 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
+
+# Chu kỳ (ms) luồng Tk nhận kết quả, CHỈ khi đang có công việc nền chưa xong
+POLL_INTERVAL_MS = 15
+
+
+class TaskRunner:
+    """
+    Chạy công việc nặng (NLP, CSDL, xuất file) trên luồng nền và trả kết quả
+    về luồng Tk, để giao diện không bị khựng.
+
+    Luồng nền không bao giờ gọi Tk: kết quả được đưa vào hàng đợi và luồng
+    Tk lấy ra bằng widget.after() trong lúc còn công việc đang chạy (khi rảnh
+    thì không hẹn giờ nào cả).
+
+    Mỗi công việc thuộc một kênh (key). Gửi công việc mới cùng kênh sẽ hủy
+    công việc cũ nếu nó chưa chạy, và bỏ qua kết quả của nó nếu đã chạy xong
+    muộn hơn (VD: bộ lọc mới thay thế bộ lọc cũ).
+    """
+    def __init__(self, widget, max_workers=2):
+        self.widget = widget
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-worker")
+        self._results = Queue()
+        self._tokens = itertools.count(1)
+        self._latest = {}      # key -> token của công việc mới nhất
+        self._futures = {}     # key -> Future của công việc mới nhất
+        self._outstanding = 0  # Số công việc chưa trả kết quả về luồng Tk
+        self._polling = False
+
+    def submit(self, key, fn, *args, on_success=None, on_error=None, on_finally=None):
+        """
+        Chạy fn(*args) trên luồng nền (gọi từ luồng Tk). Các callback chạy
+        trên luồng Tk và chỉ được gọi nếu công việc này vẫn là công việc mới
+        nhất của kênh `key`.
+        """
+        token = next(self._tokens)
+        previous = self._futures.get(key)
+        if previous is not None and previous.cancel():
+            self._outstanding -= 1
+        self._latest[key] = token
+        callbacks = (on_success, on_error, on_finally)
+        future = self._executor.submit(fn, *args)
+        self._futures[key] = future
+        self._outstanding += 1
+        future.add_done_callback(lambda f: f.cancelled() or self._results.put((key, token, f, callbacks)))
+        self._ensure_polling()
+        return token
+
+    def is_pending(self, key):
+        return key in self._latest
+
+    def cancel(self, key):
+        """Bỏ công việc của kênh `key` (kết quả, nếu có, sẽ bị bỏ qua)."""
+        self._latest.pop(key, None)
+        future = self._futures.pop(key, None)
+        if future is not None and future.cancel():
+            self._outstanding -= 1
+
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                key, token, future, callbacks = self._results.get_nowait()
+            except Empty:
+                break
+            self._outstanding -= 1
+            self._complete(key, token, future, *callbacks)
+        self._polling = False
+        if self._outstanding > 0:
+            self._ensure_polling()
+
+    def _complete(self, key, token, future, on_success, on_error, on_finally):
+        if self._latest.get(key) != token:
+            return  # Đã có công việc mới hơn -> kết quả này đã cũ
+        del self._latest[key]
+        del self._futures[key]
+        if on_finally:
+            on_finally()
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"[TaskRunner] Lỗi trong công việc nền '{key}': {error}")
+        elif on_success:
+            on_success(future.result())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
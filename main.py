@@ -1,11 +1,46 @@
+import time
+# Mốc khởi động: lấy trước mọi import (tkinter/ttkbootstrap, CSDL...) để đo cả thời gian import
+STARTED = time.perf_counter()
+
 from gui.main_window import MainWindow
-from core.database import init_db
+from core.database import init_db, close_all_connections
 from core.reminder import ReminderThread
+from core.settings import get_setting
+from core import metrics, nlp_parser
+import multiprocessing
 import threading
 import sys
-from queue import Queue 
+from queue import Queue
+
+IMPORTED = time.perf_counter()
+
+def warm_up_parser():
+    """Luồng nền: nạp trước dateparser để câu lệnh đầu tiên không phải chờ."""
+    started = time.perf_counter()
+    try:
+        nlp_parser.warm_up()
+    except Exception as e:
+        # Chỉ là tối ưu: lỗi ở đây để lần phân tích thật tự báo
+        print(f"[Main] Lỗi khi nạp trước bộ phân tích: {e}")
+        return
+    elapsed = time.perf_counter() - started
+    metrics.record("startup.nlp_warm_up", elapsed)
+    print(f"[Main] Đã nạp trước bộ phân tích câu lệnh ({elapsed * 1000:.0f} ms)")
+
+def report_startup(marks):
+    """In thời gian khởi động theo từng giai đoạn (ms) và ghi vào metrics nếu đang bật."""
+    phases = []
+    previous = STARTED
+    for name, moment in marks:
+        metrics.record(f"startup.{name}", moment - previous)
+        phases.append(f"{name} {(moment - previous) * 1000:.0f} ms")
+        previous = moment
+    metrics.record("startup.total", previous - STARTED)
+    print(f"[Main] Khởi động: {', '.join(phases)} -> tổng {(previous - STARTED) * 1000:.0f} ms")
 
 def main():
+    marks = [("import", IMPORTED)]
+
     #Khởi tạo/Kiểm tra CSDL (Nâng cấp CSDL nếu cần)
     try:
         init_db()
@@ -13,6 +48,11 @@ def main():
         print(f"Lỗi nghiêm trọng khi khởi tạo CSDL: {e}")
         sys.exit(1)
 
+    # Đo hiệu năng (bật/tắt trong bảng ẩn Ctrl+Shift+P)
+    if get_setting("metrics_enabled"):
+        metrics.enable()
+    marks.append(("init_db", time.perf_counter()))
+
     # Tạo Kênh giao tiếp (Queue)
     print("[Main] Đang tạo Kênh giao tiếp (Queue)...")
     reminder_queue = Queue()
@@ -20,19 +60,36 @@ def main():
     # Khởi chạy luồng nhắc nhở (Truyền queue vào)
     print("[Main] Đang khởi chạy luồng nhắc nhở (v4.2)...")
     reminder_task = ReminderThread(
-        queue=reminder_queue, 
+        queue=reminder_queue,
         check_interval_seconds=60 # (Đề tài yêu cầu 60s)
     )
     reminder_task.start()
-    
+
     # Khởi chạy Giao diện chính (Truyền queue vào)
     print("[Main] Đang khởi chạy giao diện chính...")
-    app = MainWindow(queue=reminder_queue) 
+    app = MainWindow(queue=reminder_queue)
+    # Luồng nhắc nhở đánh thức GUI trực tiếp khi có nhắc nhở đến hạn
+    reminder_task.on_due = app.wake_reminders
+    marks.append(("window", time.perf_counter()))
+
+    def on_first_paint():
+        marks.append(("first_paint", time.perf_counter()))
+        report_startup(marks)
+        # Cửa sổ đã hiện: giờ mới nạp phần nặng (dateparser) trên luồng nền
+        threading.Thread(target=warm_up_parser, name="NLPWarmUp", daemon=True).start()
+
+    # after_idle chạy sau các tác vụ vẽ/bố trí đang chờ của lần hiện cửa sổ đầu tiên
+    app.after_idle(lambda: app.after(0, on_first_paint))
     app.mainloop()
-    
+
     # (Khi app.mainloop() kết thúc - tức là đóng cửa sổ)
     print("[Main] Đã đóng ứng dụng. Đang dừng luồng nhắc nhở...")
     reminder_task.stop()
+    metrics.disable()
+    close_all_connections()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Bản đóng gói PyInstaller (Windows): tiến trình con của process_nlp_batch chạy lại
+    # main.py; freeze_support() cho nó làm việc rồi thoát thay vì mở thêm cửa sổ
+    multiprocessing.freeze_support()
+    main()
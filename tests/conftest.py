@@ -0,0 +1,18 @@
+import pytest
+
+from core import database, settings
+
+@pytest.fixture
+def app_settings(tmp_path, monkeypatch):
+    """Cài đặt đọc từ file chưa tồn tại trong thư mục tạm (= mặc định, múi giờ Asia/Ho_Chi_Minh)."""
+    monkeypatch.setattr(settings, "SETTINGS_PATH", str(tmp_path / "settings.json"))
+    monkeypatch.setattr(settings, "_settings", None)
+    monkeypatch.setattr(settings, "_timezone", None)
+    return settings
+
+@pytest.fixture
+def db(tmp_path, monkeypatch, app_settings):
+    """CSDL rỗng (chưa nâng cấp) trong thư mục tạm."""
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "schedule.db"))
+    yield database.DB_PATH
+    database.close_all_connections()
@@ -0,0 +1,44 @@
+"""benchmarks: sinh lịch giả lập nhỏ và tính phân vị (không chạy bộ đo thật)."""
+import sqlite3
+import time
+
+import pytest
+
+from benchmarks.generate_calendar import DUE_REMINDERS, generate_calendar
+from benchmarks.run_benchmarks import _percentile, _summarize
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT event_name, start_time, end_time, location, reminder_minutes, rrule, reminded"
+                            " FROM events ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+def test_generated_calendar_is_reproducible_and_leaves_due_reminders(db, tmp_path):
+    first, second = str(tmp_path / "a" / "schedule.db"), str(tmp_path / "b" / "schedule.db")
+    generate_calendar(first, 200, seed=7)
+    generate_calendar(second, 200, seed=7)
+
+    rows = _rows(first)
+    assert len(rows) == 200
+    # Giờ sinh tính từ lúc chạy; tên, địa điểm, nhắc trước và luật lặp giống hệt nhau với cùng seed
+    untimed = lambda row: (row[0], row[3], row[4], row[5])
+    assert list(map(untimed, rows)) == list(map(untimed, _rows(second)))
+    assert all(name.endswith("(đến hạn)") and not reminded for name, *_, reminded in rows[-DUE_REMINDERS:])
+
+    conn = sqlite3.connect(first)
+    try:
+        overdue = conn.execute("SELECT COUNT(*) FROM events WHERE reminded = 0 AND rrule IS NULL"
+                               " AND remind_ts <= ?", (int(time.time()),)).fetchone()[0]
+    finally:
+        conn.close()
+    assert overdue == DUE_REMINDERS
+
+def test_percentiles_interpolate_between_samples():
+    ordered = [1.0, 2.0, 3.0, 4.0]
+    assert _percentile(ordered, 50) == pytest.approx(2.5)
+    assert _percentile(ordered, 99) == pytest.approx(3.97)
+    assert _percentile([5.0], 90) == 5.0
+    assert _summarize([4.0, 1.0, 3.0, 2.0]) == {"p50_ms": 2.5, "p90_ms": 3.7, "p99_ms": 3.97,
+                                              "min_ms": 1.0, "max_ms": 4.0, "mean_ms": 2.5}
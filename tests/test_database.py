@@ -0,0 +1,312 @@
+"""core.database trên 1 CSDL tạm (fixture `db` ở conftest.py), múi giờ mặc định (Asia/Ho_Chi_Minh)."""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+from core import database, metrics, settings
+
+def _in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+# --- Kết nối dùng lại (user-001) ---
+def test_connection_is_reused_per_thread(db):
+    conn = database.get_db_connection()
+    assert database.get_db_connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert _in_thread(database.get_db_connection) is not conn
+
+def test_close_db_connection_reopens_on_next_use(db):
+    conn = database.get_db_connection()
+    database.close_db_connection()
+    reopened = database.get_db_connection()
+    assert reopened is not conn
+    assert reopened.execute("SELECT 1").fetchone()[0] == 1
+
+def test_close_all_connections_closes_other_threads(db):
+    other = _in_thread(database.get_db_connection)
+    conn = database.get_db_connection()
+    database.close_all_connections()
+    for closed in (conn, other):
+        with pytest.raises(sqlite3.ProgrammingError):
+            closed.execute("SELECT 1")
+    assert database.get_db_connection() is not conn
+
+# --- Nâng cấp CSDL (user-002) ---
+def _user_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def test_migrates_unversioned_db(db):
+    # CSDL của bản đầu tiên: chưa có user_version, chưa có cột 'reminded'
+    conn = database._open_connection(db)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, event_name TEXT NOT NULL,"
+                 " start_time TEXT NOT NULL, end_time TEXT, location TEXT, reminder_minutes INTEGER DEFAULT 0)")
+    conn.execute("INSERT INTO events (event_name, start_time, end_time, location, reminder_minutes)"
+                 " VALUES ('Họp', '2025-03-12 09:00:00', NULL, 'Phòng 3', 30)")
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+
+    conn = database.get_db_connection()
+    assert _user_version(conn) == len(database.MIGRATIONS)
+    (event,) = database.get_all_events()
+    assert (event.event_name, event.location, event.reminded) == ("Họp", "Phòng 3", 0)
+    assert event.remind_at == "2025-03-12 08:30:00"
+    assert [e.id for e in database.get_upcoming_reminders()] == [event.id]
+
+def test_migrations_run_once(db):
+    database.init_db()
+    database.add_event("Họp", "2025-03-12 09:00:00", None, None, 0)
+    database.init_db()
+    assert _user_version(database.get_db_connection()) == len(database.MIGRATIONS)
+    assert len(database.get_all_events()) == 1
+
+def test_reminder_query_uses_pending_index(db):
+    database.init_db()
+    plan = " ".join(row[-1] for row in database.get_db_connection().execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM events WHERE reminded = 0 AND remind_ts IS NOT NULL ORDER BY remind_ts LIMIT 50"))
+    assert "idx_events_pending_remind_ts" in plan
+    assert "TEMP B-TREE" not in plan
+
+# --- Tìm kiếm không dấu qua FTS5 (user-005) ---
+def _names(events):
+    return [event.event_name for event in events]
+
+def test_search_ignores_accents_and_matches_prefixes(db):
+    database.init_db()
+    database.add_event("Họp nhóm dự án", "2025-03-12 09:00:00", None, "Phòng Đào tạo", 0)
+    database.add_event("Học tiếng Anh", "2025-03-12 19:00:00", None, "Nhà", 0)
+    database.add_event("Đi đá bóng", "2025-03-13 17:00:00", None, "Sân Hoa Lư", 0)
+
+    assert _names(database.search_events_advanced(keyword="hop")) == ["Họp nhóm dự án"]
+    assert _names(database.search_events_advanced(keyword="HỌP NHÓ")) == ["Họp nhóm dự án"]
+    assert _names(database.search_events_advanced(keyword="d")) == ["Họp nhóm dự án", "Đi đá bóng"]
+    assert _names(database.search_events_advanced(location="dao tao")) == ["Họp nhóm dự án"]
+    assert _names(database.search_events_advanced(keyword="hoc", location="nha")) == ["Học tiếng Anh"]
+    assert database.search_events_advanced(keyword="bơi") == []
+
+def test_search_index_follows_updates_and_deletes(db):
+    database.init_db()
+    event = database.add_event("Họp nhóm", "2025-03-12 09:00:00", None, None, 0)
+    database.update_event(event.id, "Phỏng vấn", event.start_time, None, "Tầng 5", 0)
+    assert database.search_events_advanced(keyword="hop") == []
+    assert _names(database.search_events_advanced(keyword="phong van", location="tang")) == ["Phỏng vấn"]
+    database.delete_event(event.id)
+    assert database.search_events_advanced(keyword="phong") == []
+
+# --- Phân trang keyset (user-006) ---
+def _all_pages(limit, **filters):
+    pages, after = [], None
+    while True:
+        events, after = database.get_events_page(after=after, limit=limit, **filters)
+        pages.append([event.id for event in events])
+        if after is None:
+            return pages
+
+def test_pages_cover_equal_start_times_once_in_order(db):
+    database.init_db()
+    database.add_events_bulk([("Sớm", "2025-03-12 08:00:00", None, None, 0)]
+                             + [(f"Cùng giờ {i}", "2025-03-12 09:00:00", None, None, 0) for i in range(5)]
+                             + [("Muộn", "2025-03-12 10:00:00", None, None, 0)])
+    broken = database.add_event("Giờ hỏng", "2025-03-12 07:00:00", None, None, 0)
+    conn = database.get_db_connection()
+    conn.execute("UPDATE events SET start_ts = NULL WHERE id = ?", (broken.id,))
+    conn.commit()
+    expected = [broken.id] + [event.id for event in sorted(database.get_all_events(), key=lambda e: e.sort_key)
+                              if event.id != broken.id]
+
+    pages = _all_pages(limit=2)
+
+    assert [event_id for page in pages for event_id in page] == expected
+    assert [len(page) for page in pages] == [2, 2, 2, 2, 0]
+    assert database.count_events() == 8
+
+def test_pages_merge_series_occurrences_inside_window(db):
+    database.init_db()
+    series = database.add_event("Hằng ngày", "2025-03-10 09:00:00", None, None, 0, rrule="FREQ=DAILY")
+    single = database.add_event("Một lần", "2025-03-11 09:00:00", None, None, 0)
+    window = dict(from_date="2025-03-10", to_date="2025-03-12")
+
+    pages = _all_pages(limit=2, **window)
+
+    assert [event_id for page in pages for event_id in page] == [series.id, series.id, single.id, series.id]
+    assert database.count_events(**window) == 4
+
+# --- Thêm hàng loạt trong 1 giao dịch (user-013) ---
+def test_bulk_insert_reads_a_generator_in_one_transaction(db):
+    database.init_db()
+    rows = ((f"Sự kiện {i}", f"2025-03-{10 + i} 09:00:00", None, None, 10) for i in range(5))
+    assert database.add_events_bulk(rows) == 5
+    assert [event.remind_at for event in database.get_all_events()][:2] == ["2025-03-10 08:50:00", "2025-03-11 08:50:00"]
+
+def test_bulk_insert_rolls_back_on_bad_row(db):
+    database.init_db()
+    rows = [("Hợp lệ", "2025-03-12 09:00:00", None, None, 0), ("Sai giờ", "không phải giờ", None, None, 0)]
+    with pytest.raises(ValueError):
+        database.add_events_bulk(iter(rows))
+    assert database.get_all_events() == []
+
+# --- Bản ghi Event (user-018) ---
+def test_event_record_parses_times_once_and_has_no_dict():
+    event = database.Event(1, "Họp", "2025-03-12 09:00:00", "không phải giờ", remind_at="2025-03-12 08:45:00")
+    assert not hasattr(event, "__dict__")
+    assert (event.start_dt, event.end_dt, event.remind_dt) == (
+        datetime(2025, 3, 12, 9), None, datetime(2025, 3, 12, 8, 45))
+    assert list(event.to_dict()) == list(database.EVENT_COLUMNS)
+
+def test_queries_return_event_records(db):
+    database.init_db()
+    added = database.add_event("Họp", "2025-03-12 09:00:00", None, "Phòng 3", 15)
+    (stored,) = database.get_all_events()
+    assert isinstance(added, database.Event) and isinstance(stored, database.Event)
+    assert stored.to_dict() == added.to_dict()
+    assert stored.start_dt == datetime(2025, 3, 12, 9)
+
+# --- Trùng lịch và giờ rảnh (user-020) ---
+@pytest.fixture(params=["rtree", "fallback"])
+def busy_day(db, request, monkeypatch):
+    """Ngày 2025-03-12 có vài sự kiện và chuỗi lặp lại; chạy cả với R*Tree lẫn truy vấn dự phòng."""
+    database.init_db()
+    if request.param == "fallback":
+        monkeypatch.setattr(database, "_interval_index", False)
+    return {
+        "a": database.add_event("A", "2025-03-12 09:00:00", "2025-03-12 10:00:00", None, 0),
+        "b": database.add_event("B", "2025-03-12 09:30:00", None, None, 0),   # không giờ kết thúc: 1 giờ
+        "c": database.add_event("C", "2025-03-12 11:00:00", "2025-03-12 12:00:00", None, 0),
+        "ended": database.add_event("Đã hết", "2025-03-10 13:00:00", "2025-03-10 13:30:00", None, 0,
+                                    rrule="FREQ=DAILY;COUNT=2"),
+        "weekly": database.add_event("Thứ 4", "2025-03-05 14:00:00", "2025-03-05 15:00:00", None, 0,
+                                     rrule="FREQ=WEEKLY"),
+    }
+
+def _overlaps(*args, **kwargs):
+    return [(event.event_name, event.start_time) for event in database.find_overlapping(*args, **kwargs)]
+
+def test_find_overlapping_uses_half_open_busy_ranges(busy_day):
+    assert _overlaps("2025-03-12 09:45", "2025-03-12 11:15") == [
+        ("A", "2025-03-12 09:00:00"), ("B", "2025-03-12 09:30:00"), ("C", "2025-03-12 11:00:00")]
+    assert _overlaps("2025-03-12 10:00") == [("B", "2025-03-12 09:30:00")]
+    assert _overlaps("2025-03-12 09:45", exclude_id=busy_day["b"].id) == [("A", "2025-03-12 09:00:00")]
+
+def test_find_overlapping_expands_only_live_series(busy_day):
+    assert _overlaps("2025-03-12 14:30") == [("Thứ 4", "2025-03-12 14:00:00")]
+    assert _overlaps("2025-03-12 13:00", "2025-03-12 13:30") == []
+    assert _overlaps("2025-03-11 13:15") == [("Đã hết", "2025-03-11 13:00:00")]
+
+def test_find_free_slots(busy_day):
+    assert database.find_free_slots("2025-03-12 08:00", "2025-03-12 18:00") == [
+        ("2025-03-12 08:00:00", "2025-03-12 09:00:00"),
+        ("2025-03-12 12:00:00", "2025-03-12 14:00:00"),
+        ("2025-03-12 15:00:00", "2025-03-12 18:00:00")]
+    assert database.find_free_slots("2025-03-12 08:00", "2025-03-12 18:00", min_minutes=30, limit=2) == [
+        ("2025-03-12 08:00:00", "2025-03-12 09:00:00"),
+        ("2025-03-12 10:30:00", "2025-03-12 11:00:00")]
+
+def test_data_files_share_app_data_dir():
+    # CSDL, cài đặt và log hiệu năng dựng từ cùng 1 thư mục (settings.APP_DATA_DIR)
+    assert database.APP_DATA_DIR == settings.APP_DATA_DIR
+    for path in (database.DB_PATH, settings.SETTINGS_PATH, metrics.LOG_PATH):
+        assert os.path.dirname(path) == settings.APP_DATA_DIR
+
+def _create_legacy_db(path, rows):
+    """CSDL ở phiên bản 7 (trước cột epoch) chứa `rows` = (tên, bắt đầu, kết thúc, nhắc trước)."""
+    conn = database._open_connection(path)
+    cursor = conn.cursor()
+    for migration in database.MIGRATIONS[:7]:
+        migration(cursor)
+    cursor.execute("PRAGMA user_version = 7")
+    cursor.executemany("INSERT INTO events (event_name, start_time, end_time, location, reminder_minutes)"
+                       " VALUES (?, ?, ?, NULL, ?)", rows)
+    conn.commit()
+    conn.close()
+
+def _tracking(path):
+    conn = database._open_connection(path)
+    try:
+        rows = conn.execute("SELECT id, sequence, change_seq FROM events ORDER BY id").fetchall()
+        counter = conn.execute("SELECT value FROM change_counter").fetchone()[0]
+        return [tuple(row) for row in rows], counter
+    finally:
+        conn.close()
+
+def test_migration_backfills_legacy_rows(db):
+    _create_legacy_db(db, [
+        ("Viết sai dạng", "2025-03-12T09:00", "2025-03-12 10:00:00", 15),
+        ("Kết thúc trước bắt đầu", "2025-03-12 14:00:00", "2025-03-12 13:00:00", 10),
+        ("Không đọc được", "chiều mai", None, 5),
+    ])
+    before = _tracking(db)
+
+    database.init_db()
+
+    events = {event.event_name: event for event in database.get_all_events()}
+    legacy = events["Viết sai dạng"]
+    assert (legacy.start_time, legacy.remind_at) == ("2025-03-12 09:00:00", "2025-03-12 08:45:00")
+    assert legacy.start_ts == database._to_epoch(legacy.start_dt)
+    reversed_end = events["Kết thúc trước bắt đầu"]
+    assert reversed_end.end_time == "2025-03-12 15:00:00"
+    assert reversed_end.remind_ts == reversed_end.start_ts - 10 * 60
+    unreadable = events["Không đọc được"]
+    assert (unreadable.start_ts, unreadable.remind_ts, unreadable.remind_at) == (None, None, None)
+    # Chuẩn hóa cách viết không tính là sửa: xuất delta không gửi lại các dòng này
+    assert _tracking(db) == before
+    assert [event.event_name for event in database.get_upcoming_reminders()] == ["Viết sai dạng", "Kết thúc trước bắt đầu"]
+
+def test_timezone_change_recomputes_epochs_and_keeps_local_times(db):
+    database.init_db()
+    event = database.add_event("Họp", "2025-03-12 09:00:00", None, None, 15)
+    assert event.start_ts == 1741744800   # 09:00 giờ Việt Nam = 02:00 UTC
+    before = _tracking(db)
+
+    assert database.set_timezone("Europe/Paris")
+
+    (moved,) = database.get_all_events()
+    assert (moved.start_time, moved.remind_at) == ("2025-03-12 09:00:00", "2025-03-12 08:45:00")
+    assert moved.start_ts == 1741766400   # 09:00 giờ Paris = 08:00 UTC
+    assert moved.remind_ts == moved.start_ts - 15 * 60
+    assert _tracking(db) == before
+    with pytest.raises(ValueError):
+        database.set_timezone("Sao Hỏa/Thủ đô")
+
+def test_weekly_series_expands_in_window(db):
+    database.init_db()
+    series = database.add_event("Họp tuần", "2025-03-03 09:00:00", "2025-03-03 10:00:00", None, 0,
+                                rrule="FREQ=WEEKLY")
+
+    events = database.search_events_advanced(from_date="2025-03-01", to_date="2025-03-31")
+
+    assert [event.start_time for event in events] == [f"2025-03-{day:02d} 09:00:00" for day in (3, 10, 17, 24, 31)]
+    assert {event.id for event in events} == {series.id}
+
+def test_update_occurrence_splits_it_from_series(db):
+    database.init_db()
+    series = database.add_event("Họp tuần", "2025-03-03 09:00:00", "2025-03-03 10:00:00", None, 0,
+                                rrule="FREQ=WEEKLY")
+
+    single = database.update_occurrence(series.id, "2025-03-17 09:00:00", "Họp dời giờ",
+                                        "2025-03-17 11:00:00", "2025-03-17 12:00:00", None, 0)
+
+    events = database.search_events_advanced(from_date="2025-03-01", to_date="2025-03-23")
+    assert [(event.id, event.start_time) for event in events] == [
+        (series.id, "2025-03-03 09:00:00"), (series.id, "2025-03-10 09:00:00"), (single.id, "2025-03-17 11:00:00")]
+    assert single.rrule is None
+
+def test_update_series_keeps_its_own_start(db):
+    database.init_db()
+    series = database.add_event("Họp tuần", "2025-03-03 09:00:00", "2025-03-03 10:00:00", None, 0,
+                                rrule="FREQ=WEEKLY", exdates="2025-03-17 09:00:00")
+
+    updated = database.update_series(series.id, "2025-03-10 09:00:00", "Họp tuần",
+                                     "2025-03-10 14:00:00", "2025-03-10 14:30:00", None, 0)
+
+    assert (updated.start_time, updated.end_time) == ("2025-03-03 14:00:00", "2025-03-03 14:30:00")
+    assert updated.exdates == "2025-03-17 14:00:00"
+    events = database.search_events_advanced(from_date="2025-03-01", to_date="2025-03-23")
+    assert [event.start_time for event in events] == ["2025-03-03 14:00:00", "2025-03-10 14:00:00"]
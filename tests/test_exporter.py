@@ -0,0 +1,133 @@
+"""core.exporter trên CSDL tạm: JSON (pretty/compact/NDJSON, gzip) và iCalendar."""
+import gzip
+import json
+
+import pytest
+
+from core import database, exporter, importer
+
+@pytest.fixture
+def calendar(db):
+    database.init_db()
+    database.add_event("Họp \"quý\"\\1", "2025-03-12 09:00:00", "2025-03-12 10:00:00", "Phòng 3", 15)
+    database.add_event("Ăn trưa", "2025-03-12 12:00:00", None, None, 0)
+    database.add_event("Đá bóng", "2025-03-14 17:30:00", None, "Sân Hoa Lư", 30, rrule="FREQ=WEEKLY")
+    return [event.to_dict() for event in database.iter_events()]
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+# --- JSON (user-015) ---
+def test_pretty_json_is_byte_identical_to_json_dump(calendar, tmp_path):
+    path = str(tmp_path / "lich.json")
+    assert exporter.export_to_json(path)
+    assert _read(path) == json.dumps(calendar, ensure_ascii=False, indent=4)
+
+def test_compact_ndjson_and_gzip_round_trip(calendar, tmp_path):
+    compact, ndjson, gz = (str(tmp_path / name) for name in ("lich.json", "lich.ndjson", "lich.ndjson.gz"))
+    assert exporter.export_to_json(compact, fmt="compact")
+    assert exporter.export_to_json(ndjson)
+    assert exporter.export_to_json(gz)
+
+    assert _read(compact) == json.dumps(calendar, ensure_ascii=False, separators=(",", ":"))
+    assert [json.loads(line) for line in _read(ndjson).splitlines()] == calendar
+    with gzip.open(gz, "rt", encoding="utf-8") as f:
+        assert f.read() == _read(ndjson)
+
+def test_empty_and_filtered_exports(calendar, tmp_path):
+    path = str(tmp_path / "lich.json")
+    assert exporter.export_to_json(path, fmt="compact", from_date="2025-03-12", to_date="2025-03-12")
+    assert [event["event_name"] for event in json.loads(_read(path))] == ["Họp \"quý\"\\1", "Ăn trưa"]
+    assert exporter.export_to_json(path, from_date="2020-01-01", to_date="2020-01-02")
+    assert _read(path) == "[]"
+    assert not exporter.export_to_json(path, fmt="yaml")
+
+# --- iCalendar (user-016) ---
+def _read_ics(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return f.read()
+
+def test_fold_splits_on_utf8_octets_without_breaking_characters():
+    line = "SUMMARY:" + "Họp bàn kế hoạch đường dài " * 8
+    folded = exporter._ics_fold(line)
+    physical = folded[:-2].split("\r\n")
+    assert folded.endswith("\r\n") and len(physical) > 1
+    assert all(len(part.encode("utf-8")) <= exporter.ICS_LINE_OCTETS for part in physical)
+    assert all(part.startswith(" ") for part in physical[1:])
+    assert "".join([physical[0]] + [part[1:] for part in physical[1:]]) == line
+    assert exporter._ics_fold("SUMMARY:ngắn") == "SUMMARY:ngắn\r\n"
+
+def test_escape_text_values():
+    assert exporter._ics_escape("a\\b;c,d\r\ne") == "a\\\\b\\;c\\,d\\ne"
+
+def test_ics_export_writes_crlf_events_and_round_trips(calendar, tmp_path, monkeypatch):
+    path = str(tmp_path / "lich.ics")
+    assert exporter.export_to_ics(path)
+    text = _read_ics(path)
+
+    assert text.startswith("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n") and text.endswith("END:VCALENDAR\r\n")
+    assert "\n" not in text.replace("\r\n", "")
+    assert "X-WR-TIMEZONE:Asia/Ho_Chi_Minh\r\n" in text
+    assert text.count("BEGIN:VEVENT") == 3
+    assert 'SUMMARY:Họp "quý"\\\\1\r\n' in text
+    assert "DTSTART:20250312T090000\r\nDTEND:20250312T100000\r\n" in text
+    assert "TRIGGER:-PT15M\r\n" in text and "RRULE:FREQ=WEEKLY\r\n" in text
+
+    # Nhập lại vào 1 CSDL mới phải ra đúng các sự kiện ban đầu
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "nhap_lai.db"))
+    database.init_db()
+    assert importer.import_from_ics(path)["inserted"] == 3
+    fields = ("event_name", "start_time", "end_time", "location", "reminder_minutes", "rrule")
+    imported = [event.to_dict() for event in database.iter_events()]
+    assert [[e[key] for key in fields] for e in imported] == [[e[key] for key in fields] for e in calendar]
+
+# --- Xuất phần thay đổi (user-017) ---
+def _export_changes(tmp_path, name, **kwargs):
+    path = str(tmp_path / name)
+    watermark = exporter.export_changes(path, **kwargs)
+    return watermark, path
+
+def test_delta_export_resumes_from_saved_watermark(db, tmp_path):
+    database.init_db()
+    kept = database.add_event("Họp", "2025-03-12 09:00:00", None, None, 0)
+    dropped = database.add_event("Ăn trưa", "2025-03-12 12:00:00", None, None, 0)
+    first, path = _export_changes(tmp_path, "lan1.json", target="lich-nha")
+    full = json.loads(_read(path))
+    assert (full["since"], full["watermark"]) == (0, first)
+    assert [e["id"] for e in full["changed"]] == [kept.id, dropped.id] and full["deleted"] == []
+
+    edited = database.update_event(kept.id, "Họp dời giờ", "2025-03-12 10:00:00", None, None, 0)
+    # Event trả về mang sẵn bộ đếm sau khi trigger chạy
+    assert (edited.sequence, edited.change_seq) == (1, database.get_change_watermark())
+    database.delete_event(dropped.id)
+    added = database.add_event("Đá bóng", "2025-03-14 17:30:00", None, None, 0)
+    assert added.change_seq == database.get_change_watermark()
+    database.mark_event_as_reminded(added.id)   # đánh dấu đã nhắc không tính là thay đổi
+
+    second, path = _export_changes(tmp_path, "lan2.json", target="lich-nha")
+    delta = json.loads(_read(path))
+    assert delta["since"] == first and second > first
+    assert [(e["id"], e["event_name"], e["sequence"]) for e in delta["changed"]] == [
+        (kept.id, "Họp dời giờ", 1), (added.id, "Đá bóng", 0)]
+    assert [(d["id"], d["event_name"]) for d in delta["deleted"]] == [(dropped.id, "Ăn trưa")]
+
+    third, path = _export_changes(tmp_path, "lan3.json", target="lich-nha")
+    assert third == second
+    assert json.loads(_read(path))["changed"] == json.loads(_read(path))["deleted"] == []
+
+def test_delta_ics_cancels_deleted_events(db, tmp_path):
+    database.init_db()
+    event = database.add_event("Họp", "2025-03-12 09:00:00", None, None, 0)
+    since = database.get_change_watermark()
+    database.update_event(event.id, "Họp", "2025-03-12 09:30:00", None, None, 0)
+    database.delete_event(event.id)
+
+    _, path = _export_changes(tmp_path, "delta.ics", since=since)
+
+    text = _read_ics(path)
+    assert text.count("BEGIN:VEVENT") == 1
+    assert f"UID:event-{event.id}@trolylichtrinh\r\n" in text
+    assert "SEQUENCE:2\r\nSTATUS:CANCELLED\r\n" in text
+    # Lịch đích bỏ sự kiện đã hủy khi nhập lại
+    assert importer.import_from_ics(path)["read"] == 0
@@ -0,0 +1,82 @@
+"""core.importer trên CSDL tạm: JSON/NDJSON, ICS, CSV, chống trùng và chạy thử (dry-run)."""
+import json
+
+from core import database, importer
+
+def _write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+def _stored(event):
+    return event.event_name, event.start_time, event.end_time, event.location, event.reminder_minutes
+
+def test_json_array_dedupes_against_db_and_within_file(db, tmp_path):
+    database.init_db()
+    database.add_event("Họp", "2025-03-12 09:00:00", None, None, 0)
+    path = _write(tmp_path, "lich.json", json.dumps([
+        {"event_name": "Họp", "start_time": "2025-03-12T09:00:00"},           # trùng CSDL
+        {"event_name": "Ăn trưa", "start_time": "12/03/2025 12:00", "location": "Căng tin"},
+        {"event_name": "Ăn trưa", "start_time": "2025-03-12 12:00:00"},        # trùng trong file
+        {"event_name": "", "start_time": "2025-03-12 13:00:00"},               # thiếu tên
+        {"event_name": "Sai", "start_time": "2025-03-12 15:00", "end_time": "2025-03-12 14:00"},
+    ], ensure_ascii=False))
+
+    report = importer.import_from_json(path)
+
+    assert {key: report[key] for key in ("read", "new", "duplicates", "invalid", "inserted")} == {
+        "read": 5, "new": 1, "duplicates": 2, "invalid": 2, "inserted": 1}
+    assert len(report["errors"]) == 2
+    assert [_stored(e) for e in database.get_all_events()][1] == ("Ăn trưa", "2025-03-12 12:00:00", None, "Căng tin", 0)
+
+def test_dry_run_reports_without_writing(db, tmp_path):
+    database.init_db()
+    path = _write(tmp_path, "lich.ndjson", "\n".join(json.dumps(
+        {"event": f"Sự kiện {i}", "start_time": f"2025-03-{10 + i} 09:00", "reminder_minutes": 5}) for i in range(3)))
+
+    report = importer.import_from_json(path, dry_run=True)
+
+    assert (report["new"], report["inserted"], report["dry_run"]) == (3, 0, True)
+    assert database.get_all_events() == []
+
+def test_ics_reads_folded_lines_alarm_timezone_and_skips_cancelled(db, tmp_path):
+    database.init_db()
+    path = _write(tmp_path, "lich.ics", "\r\n".join([
+        "BEGIN:VCALENDAR",
+        "BEGIN:VEVENT",
+        "SUMMARY:Họp nhóm\\, dự án",
+        "  rất dài",
+        "DTSTART:20250312T020000Z",
+        "DTEND;TZID=Asia/Ho_Chi_Minh:20250312T100000",
+        "LOCATION:Phòng 3",
+        "RRULE:FREQ=WEEKLY;BYDAY=WE",
+        "EXDATE:20250319T090000",
+        "BEGIN:VALARM",
+        "TRIGGER:-PT15M",
+        "END:VALARM",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "SUMMARY:Đã hủy",
+        "DTSTART:20250313T090000",
+        "STATUS:CANCELLED",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]))
+
+    report = importer.import_from_ics(path)
+
+    assert report["inserted"] == 1
+    (event,) = database.get_all_events()
+    assert _stored(event) == ("Họp nhóm, dự án rất dài", "2025-03-12 09:00:00", "2025-03-12 10:00:00", "Phòng 3", 15)
+    assert (event.rrule, event.exdates) == ("FREQ=WEEKLY;BYDAY=WE", "2025-03-19 09:00:00")
+
+def test_csv_sniffs_semicolon_dialect(db, tmp_path):
+    database.init_db()
+    path = _write(tmp_path, "lich.csv", "Event_Name;Start_Time;Location;Reminder_Minutes\n"
+                                        "Khám răng;2025-03-14 16:00;Nha khoa;30\n"
+                                        "Sai nhắc;2025-03-15 16:00;;abc\n")
+
+    report = importer.import_from_csv(path)
+
+    assert (report["inserted"], report["invalid"]) == (1, 1)
+    assert [_stored(e) for e in database.get_all_events()] == [("Khám răng", "2025-03-14 16:00:00", None, "Nha khoa", 30)]
@@ -0,0 +1,56 @@
+"""core.metrics: thống kê cuộn, bật/tắt bọc hàm CSDL và process_nlp, log JSON."""
+import json
+import logging
+from datetime import datetime
+
+import pytest
+
+from core import database, metrics, nlp_parser
+
+@pytest.fixture
+def metrics_log(tmp_path, monkeypatch):
+    """Log ghi vào thư mục tạm; tắt đo và bỏ handler file sau mỗi test."""
+    monkeypatch.setattr(metrics, "LOG_PATH", str(tmp_path / "metrics.log"))
+    monkeypatch.setattr(metrics, "_logger", None)
+    metrics.reset()
+    yield metrics.LOG_PATH
+    metrics.disable()
+    metrics.reset()
+    logger = logging.getLogger("trolylichtrinh.metrics")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+def test_rolling_stats_keeps_window_but_counts_everything():
+    stats = metrics.RollingStats(window=4)
+    for ms in (100, 1, 2, 3, 4):
+        stats.add(ms / 1000)
+    assert stats.summary() == {"count": 5, "p50_ms": 3.0, "p95_ms": 4.0, "max_ms": 100.0, "total_ms": 110.0}
+    assert metrics.RollingStats().summary()["p50_ms"] is None
+
+def test_disabled_recording_is_a_no_op(metrics_log):
+    metrics.record("db.get_all_events", 1.0)
+    metrics.incr("reminder.due")
+    assert metrics.snapshot() == {"timings": {}, "counters": {}}
+
+def test_enable_wraps_database_and_nlp_then_disable_restores(db, metrics_log):
+    originals = database.get_all_events, database.fold_text, nlp_parser.process_nlp
+    metrics.enable()
+    assert database.get_all_events is not originals[0] and database.fold_text is originals[1]
+
+    database.init_db()
+    database.add_event("Họp", "2025-03-12 09:00:00", None, None, 0)
+    assert len(database.get_all_events()) == 1
+    assert len(list(database.iter_events())) == 1
+    nlp_parser.process_nlp("đo metrics họp nhóm lúc 9h sáng mai", now=datetime(2025, 3, 12, 8, 0))
+
+    timings = metrics.snapshot()["timings"]
+    assert timings["db.get_all_events"]["count"] == timings["db.iter_events"]["count"] == 1
+    assert timings["nlp.process_nlp"]["count"] == 1
+    assert {"nlp.clean", "nlp.tokenize", "nlp.cleanup"} <= set(timings)
+
+    metrics.disable()
+    assert (database.get_all_events, database.fold_text, nlp_parser.process_nlp) == originals
+    with open(metrics_log, encoding="utf-8") as f:
+        kinds = [json.loads(line)["kind"] for line in f]
+    assert kinds == ["enabled", "summary"]
@@ -0,0 +1,152 @@
+"""
+Hồi quy của nlp_parser trên golden corpus (benchmarks/nlp_corpus.jsonl).
+
+Các câu đang sai được ghi trong tests/nlp_expected_failures.json ({id: [các trường sai]}).
+Test hỏng khi có câu mới sai và cả khi 1 câu trong danh sách đã đúng hoặc sai khác đi:
+sửa được câu nào thì cập nhật file đó, lấy từ mục "failures" của
+    python -m benchmarks.nlp_benchmark --output ket_qua.json
+"""
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from benchmarks import nlp_benchmark
+from core import nlp_parser, settings
+
+EXPECTED_FAILURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlp_expected_failures.json")
+
+@pytest.fixture(scope="module")
+def corpus():
+    """(header, cases) với múi giờ hệ thống và của lịch được ghim như nlp_benchmark; trả lại sau khi xong."""
+    header, cases = nlp_benchmark.load_corpus()
+    saved_tz = os.environ.get("TZ")
+    saved = (settings.SETTINGS_PATH, settings._settings, settings._timezone)
+    settings._settings = None
+    nlp_benchmark._pin_timezone(header["timezone"])
+    yield header, cases
+    settings.SETTINGS_PATH, settings._settings, settings._timezone = saved
+    if saved_tz is None:
+        os.environ.pop("TZ", None)
+    else:
+        os.environ["TZ"] = saved_tz
+    if hasattr(time, "tzset"):
+        time.tzset()
+
+@pytest.fixture(scope="module")
+def failures(corpus):
+    header, cases = corpus
+    now = datetime.strptime(header["now"], nlp_benchmark.TIME_FORMAT)
+    return nlp_benchmark.evaluate(cases, now)[1]
+
+def test_corpus_matches_expected_failures(failures):
+    with open(EXPECTED_FAILURES_PATH, encoding="utf-8") as f:
+        expected = json.load(f)
+    regressions = {case_id: wrong for case_id, wrong in failures.items() if expected.get(case_id) != wrong}
+    fixed = sorted(set(expected) - set(failures))
+    assert not regressions, f"{len(regressions)} câu sai mới hoặc sai khác đi: {dict(list(regressions.items())[:20])}"
+    assert not fixed, f"{len(fixed)} câu đã đúng, xóa khỏi {EXPECTED_FAILURES_PATH}: {fixed[:20]}"
+
+def test_near_midnight_cases_pass(corpus, failures):
+    # Lệnh gõ lúc gần nửa đêm (giờ địa phương) không được ra thời điểm đã qua hay "hôm nay" cho thứ trong tuần
+    midnight = [case["id"] for case in corpus[1] if "near_midnight" in case["tags"]]
+    assert midnight
+    assert [case_id for case_id in midnight if case_id in failures] == []
+
+# --- Dạng thời gian giải không cần dateparser (user-010) ---
+# Thứ 4, 10:00 giờ Việt Nam
+FAST_NOW = datetime(2025, 3, 12, 10, 0, tzinfo=ZoneInfo("Asia/Ho_Chi_Minh"))
+
+@pytest.fixture
+def without_dateparser(app_settings, monkeypatch):
+    def unavailable():
+        raise AssertionError("dạng thời gian này không được cần tới dateparser")
+    monkeypatch.setattr(nlp_parser, "_get_dateparser", unavailable)
+    nlp_parser.PARSE_CACHE.clear()
+    yield
+    nlp_parser.PARSE_CACHE.clear()
+
+@pytest.mark.parametrize("text, start_time", [
+    ("họp lúc 14:30", "2025-03-12 14:30:00"),
+    ("họp lúc 14h30", "2025-03-12 14:30:00"),
+    ("họp lúc 10:00", "2025-03-12 10:00:00"),      # đúng bằng giờ hiện tại: vẫn là hôm nay
+    ("họp lúc 8 giờ", "2025-03-13 08:00:00"),      # đã qua: ngày mai
+    ("họp thứ 4", "2025-03-19 00:00:00"),          # trùng hôm nay: tuần sau
+    ("họp thứ hai", "2025-03-17 00:00:00"),
+    ("họp lúc 9:00 thứ 6", "2025-03-14 09:00:00"),
+])
+def test_fast_path_forms(without_dateparser, text, start_time):
+    assert nlp_parser.process_nlp(text, FAST_NOW)["start_time"] == start_time
+
+def test_fast_path_uses_calendar_timezone(without_dateparser):
+    # 20:00 UTC = 03:00 hôm sau ở Việt Nam: "2:00" đã qua -> 2:00 của ngày kế tiếp nữa
+    now = datetime(2025, 3, 11, 20, 0, tzinfo=ZoneInfo("UTC"))
+    assert nlp_parser.process_nlp("họp lúc 2:00", now)["start_time"] == "2025-03-13 02:00:00"
+    assert nlp_parser.process_nlp("họp thứ 4", now)["start_time"] == "2025-03-19 00:00:00"
+
+# --- Tách token 1 lần và trích xuất trên dãy token (user-011) ---
+def test_tokenize_keeps_spans_and_gaps():
+    tokens = nlp_parser._tokenize("hop  o phong 3, luc 9h30")
+    assert [(t.kind, t.text, t.gap) for t in tokens] == [
+        ("word", "hop", 0), ("word", "o", 2), ("word", "phong", 1), ("num", "3", 1), ("punct", ",", 0),
+        ("word", "luc", 1), ("num", "9", 1), ("word", "h", 0), ("num", "30", 0)]
+    assert [(t.start, t.end) for t in tokens][:2] == [(0, 3), (5, 6)]
+
+def test_extracts_every_field_from_one_command(without_dateparser):
+    result = nlp_parser.process_nlp("Nhắc tôi họp nhóm ở Phòng 3, lúc 14h30 nhắc trước 15 phút!!", FAST_NOW)
+    assert result == {"event": "họp nhóm", "start_time": "2025-03-12 14:30:00", "end_time": "2025-03-12 15:30:00",
+                      "location": "Phòng 3", "reminder_minutes": 15, "rrule": None}
+
+def test_reminder_in_hours_and_location_stops_before_time(without_dateparser):
+    result = nlp_parser.process_nlp("đặt lịch khám răng tại nha khoa Kim vào lúc 16:00 báo trước 2 tiếng", FAST_NOW)
+    assert (result["event"], result["location"], result["reminder_minutes"]) == ("khám răng", "nha khoa Kim", 120)
+
+# --- Nhớ đệm kết quả phân tích (user-012) ---
+def test_cache_hit_is_resolved_against_the_new_now(without_dateparser):
+    text = "họp lúc 9:00 thứ 6"
+    first = nlp_parser.process_nlp(text, FAST_NOW)
+    week_later = nlp_parser.process_nlp(f"  {text}!! ", FAST_NOW + timedelta(days=7))
+    assert nlp_parser.PARSE_CACHE.stats()["hits"] == 1
+    assert (first["start_time"], week_later["start_time"]) == ("2025-03-14 09:00:00", "2025-03-21 09:00:00")
+
+def test_cache_evicts_least_recently_used():
+    cache = nlp_parser.ParseCache(maxsize=2)
+    entry = nlp_parser._CachedParse("họp", None, 0, None)
+    cache.put("a", entry)
+    cache.put("b", entry)
+    assert cache.get("a") is entry
+    cache.put("c", entry)
+    assert (cache.get("b"), cache.get("a"), cache.get("c")) == (None, entry, entry)
+    assert cache.stats()["size"] == 2
+
+# --- Câu lệnh lặp lại (user-021) ---
+@pytest.mark.parametrize("text, start_time, rrule", [
+    ("họp lúc 9h30 mỗi thứ 2 và thứ 4", "2025-03-17 09:30:00", "FREQ=WEEKLY;BYDAY=MO,WE"),
+    ("tập thể dục hằng ngày", "2025-03-13 08:00:00", "FREQ=DAILY"),   # không có giờ: 8h, hôm nay đã qua
+    ("họp lúc 14h hàng tuần", "2025-03-12 14:00:00", "FREQ=WEEKLY"),
+])
+def test_recurring_command_starts_at_first_occurrence(without_dateparser, text, start_time, rrule):
+    result = nlp_parser.process_nlp(text, FAST_NOW)
+    assert (result["start_time"], result["rrule"]) == (start_time, rrule)
+
+BATCH_NOW = datetime(2025, 3, 12, 10, 0)
+
+def test_batch_parallel_matches_serial_in_order():
+    texts = [f"họp nhóm {i} lúc {i % 24}h" for i in range(120)] + ["", "   "]
+    serial = list(nlp_parser.process_nlp_batch(texts, BATCH_NOW, processes=1))
+    parallel = list(nlp_parser.process_nlp_batch(iter(texts), BATCH_NOW, processes=2, chunk_size=25))
+    assert parallel == serial
+    assert [line for line, _ in serial] == [text for text in texts if text.strip()]
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_batch_reads_input_lazily(processes):
+    # Nguồn vô hạn: phải ra kết quả đầu tiên mà không đọc hết đầu vào
+    results = nlp_parser.process_nlp_batch(itertools.cycle(["họp lúc 9h"]), BATCH_NOW,
+                                           processes=processes, chunk_size=10)
+    line, data = next(results)
+    results.close()
+    assert (line, data["event"]) == ("họp lúc 9h", "họp")
@@ -0,0 +1,80 @@
+"""NotificationDispatcher và các backend thông báo (không cần CSDL)."""
+import sys
+import threading
+import time
+import types
+
+from core.notifier import NotificationDispatcher, Notifier, RecordingNotifier, WindowsSoundNotifier
+
+class Reminder:
+    def __init__(self, event_name):
+        self.event_name = event_name
+
+class BlockingNotifier(Notifier):
+    """Chặn ở lần gửi đầu tiên cho tới khi được thả."""
+    name = "blocking"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def notify(self, event):
+        self.started.set()
+        self.release.wait(5)
+
+class FailingNotifier(Notifier):
+    name = "failing"
+
+    def notify(self, event):
+        raise OSError("không có loa")
+
+def test_delivers_in_submit_order_off_the_caller_thread():
+    notifier = RecordingNotifier()
+    dispatcher = NotificationDispatcher(notifier)
+    dispatcher.start()
+    events = [Reminder(f"Nhắc {i}") for i in range(5)]
+    for event in events:
+        assert dispatcher.submit(event)
+    dispatcher.stop()
+
+    assert [event for _, event in notifier.deliveries] == events
+    assert dispatcher.stats()["delivered"] == 5
+
+def test_slow_backend_does_not_block_submit_and_full_queue_drops():
+    notifier = BlockingNotifier()
+    dispatcher = NotificationDispatcher(notifier, maxsize=2)
+    dispatcher.start()
+    assert dispatcher.submit(Reminder("đang phát"))
+    assert notifier.started.wait(5)
+
+    started = time.monotonic()
+    accepted = [dispatcher.submit(Reminder(f"chờ {i}")) for i in range(3)]
+    assert time.monotonic() - started < 0.5
+    assert accepted == [True, True, False]
+    assert dispatcher.dropped == 1
+
+    notifier.release.set()
+    dispatcher.stop()
+    assert dispatcher.delivered == 3
+
+def test_backend_error_is_counted_and_dispatch_continues():
+    dispatcher = NotificationDispatcher(FailingNotifier())
+    dispatcher.start()
+    dispatcher.submit(Reminder("a"))
+    dispatcher.submit(Reminder("b"))
+    dispatcher.stop()
+    assert (dispatcher.failed, dispatcher.delivered) == (2, 0)
+
+def test_sound_beeps_for_every_reminder_by_default(monkeypatch):
+    # winsound chỉ có trên Windows: thay bằng module ghi lại các lần Beep
+    beeps = []
+    monkeypatch.setitem(sys.modules, "winsound", types.SimpleNamespace(Beep=lambda freq, ms: beeps.append(freq)))
+    notifier = WindowsSoundNotifier(repeat=1, pause_seconds=0)
+    notifier.notify(Reminder("a"))
+    notifier.notify(Reminder("b"))
+    assert len(beeps) == 2
+
+    cooled = WindowsSoundNotifier(repeat=1, pause_seconds=0, cooldown_seconds=60)
+    cooled.notify(Reminder("a"))
+    cooled.notify(Reminder("b"))
+    assert len(beeps) == 3
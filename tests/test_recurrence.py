@@ -0,0 +1,50 @@
+"""core.recurrence: đọc luật RRULE và sinh lần lặp trong khoảng (không cần CSDL)."""
+from datetime import datetime
+from itertools import islice
+
+import pytest
+
+from core.recurrence import RecurrenceRule, iter_occurrences, last_occurrence, parse_rule
+
+def _days(rule, dtstart, *window, **kwargs):
+    return [dt.strftime("%Y-%m-%d %H:%M") for dt in iter_occurrences(parse_rule(rule), dtstart, *window, **kwargs)]
+
+def test_parse_normalizes_and_round_trips():
+    rule = RecurrenceRule.parse("RRULE:freq=monthly;byday=-1fr,1mo;interval=2;until=20251231")
+    assert str(rule) == "FREQ=MONTHLY;INTERVAL=2;BYDAY=1MO,-1FR;UNTIL=20251231T235959"
+    assert str(RecurrenceRule.parse(str(rule))) == str(rule)
+
+@pytest.mark.parametrize("text", ["FREQ=YEARLY", "FREQ=WEEKLY;BYDAY=1MO", "FREQ=DAILY;INTERVAL=0",
+                                  "FREQ=DAILY;BYHOUR=9", "FREQ=WEEKLY;WKST=SU", "BYDAY=MO", "FREQ"])
+def test_parse_rejects_unsupported_rules(text):
+    with pytest.raises(ValueError):
+        RecurrenceRule.parse(text)
+
+def test_weekly_multiple_days_with_exdates():
+    start = datetime(2025, 3, 3, 9, 0)   # Thứ 2
+    assert _days("FREQ=WEEKLY;BYDAY=MO,WE", start, None, datetime(2025, 3, 12, 23, 59),
+                 exdates={datetime(2025, 3, 5, 9, 0)}) == [
+        "2025-03-03 09:00", "2025-03-10 09:00", "2025-03-12 09:00"]
+
+def test_monthly_skips_missing_days_and_supports_last_weekday():
+    assert _days("FREQ=MONTHLY;COUNT=3", datetime(2025, 1, 31, 8, 0)) == [
+        "2025-01-31 08:00", "2025-03-31 08:00", "2025-05-31 08:00"]
+    assert _days("FREQ=MONTHLY;BYDAY=-1FR;COUNT=3", datetime(2025, 1, 1, 17, 0)) == [
+        "2025-01-31 17:00", "2025-02-28 17:00", "2025-03-28 17:00"]
+
+def test_window_far_from_start_jumps_ahead():
+    start = datetime(2000, 1, 1, 7, 0)
+    # 9202 ngày sau dtstart là 2025-03-12 -> các lần lặp rơi vào 11, 14, 17
+    assert _days("FREQ=DAILY;INTERVAL=3", start, datetime(2025, 3, 12), datetime(2025, 3, 18)) == [
+        "2025-03-14 07:00", "2025-03-17 07:00"]
+
+def test_until_count_and_last_occurrence():
+    start = datetime(2025, 3, 10, 9, 0)
+    assert _days("FREQ=DAILY;UNTIL=20250312", start) == ["2025-03-10 09:00", "2025-03-11 09:00", "2025-03-12 09:00"]
+    assert last_occurrence(parse_rule("FREQ=WEEKLY;COUNT=4"), start) == datetime(2025, 3, 31, 9, 0)
+    assert last_occurrence(parse_rule("FREQ=WEEKLY"), start) is None
+
+def test_rule_that_never_matches_terminates():
+    # Cách 7 ngày nhưng chỉ nhận Thứ 3, bắt đầu từ Thứ 2: không bao giờ có lần lặp
+    rule = parse_rule("FREQ=DAILY;INTERVAL=7;BYDAY=TU")
+    assert list(islice(iter_occurrences(rule, datetime(2025, 3, 10, 9, 0)), 1)) == []
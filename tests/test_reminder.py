@@ -0,0 +1,64 @@
+"""ReminderThread: heap theo thời điểm nhắc, đánh thức khi lịch thay đổi (CSDL tạm, backend RecordingNotifier)."""
+from datetime import datetime, timedelta
+from queue import Queue
+
+import pytest
+
+from core import database
+from core.notifier import RecordingNotifier
+from core.reminder import ReminderThread
+from core.settings import get_timezone
+
+def _local(minutes):
+    """Giờ địa phương của lịch, cách bây giờ `minutes` phút, dạng lưu trong CSDL."""
+    return (datetime.now(get_timezone()) + timedelta(minutes=minutes)).strftime(database.DB_TIME_FORMAT)
+
+def _add(name, start_minutes, reminder_minutes):
+    return database.add_event(name, _local(start_minutes), None, None, reminder_minutes)
+
+def _drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+@pytest.fixture
+def reminders(db):
+    database.init_db()
+    queue = Queue()
+    woken = []
+    thread = ReminderThread(queue, check_interval_seconds=60, batch_size=2,
+                            notifier=RecordingNotifier(), on_due=lambda: woken.append(True))
+    yield thread, queue, woken
+    thread.stop()
+
+def test_fires_due_reminders_in_order_and_marks_them(reminders):
+    thread, queue, woken = reminders
+    later = _add("Sau 1 giờ", 120, 60)      # nhắc sau 60 phút
+    second = _add("Nhắc 2", 5, 10)          # nhắc 5 phút trước
+    first = _add("Nhắc 1", 5, 20)           # nhắc 15 phút trước
+    third = _add("Nhắc 3", 5, 6)            # nhắc 1 phút trước (quá batch_size=2: phải nạp tiếp)
+
+    thread.dispatcher.start()
+    delay = thread.check_for_reminders()
+    thread.dispatcher.stop()
+
+    assert [event.id for event in _drain(queue)] == [first.id, second.id, third.id]
+    assert woken == [True]
+    assert 59 * 60 < delay <= 60 * 60
+    assert [event.id for event in database.get_upcoming_reminders()] == [later.id]
+    assert [event.id for _, event in thread.dispatcher.notifier.deliveries] == [first.id, second.id, third.id]
+
+def test_nothing_due_returns_delay_without_waking_gui(reminders):
+    thread, queue, woken = reminders
+    assert thread.check_for_reminders() is None
+    _add("Sau nửa giờ", 60, 30)
+    assert 29 * 60 < thread.check_for_reminders() <= 30 * 60
+    assert queue.empty() and woken == []
+
+def test_schedule_change_wakes_sleeping_thread(reminders):
+    thread, queue, woken = reminders
+    thread.start()
+    # Luồng đang ngủ tối đa 60 giây; thêm sự kiện đã đến hạn nhắc phải đánh thức nó ngay
+    event = _add("Đến hạn", 5, 10)
+    assert queue.get(timeout=5).id == event.id
@@ -0,0 +1,28 @@
+"""Khởi động nhanh: module nặng chỉ được nạp khi dùng hoặc khi warm_up chạy."""
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("dateparser", "ics", "core.exporter", "core.importer")
+
+def _loaded_after(code):
+    """Chạy `code` trong tiến trình Python mới, trả về các module nặng đã nạp sau đó."""
+    script = f"import json, sys\n{code}\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+def test_opening_the_window_module_loads_nothing_heavy():
+    assert _loaded_after("import gui.main_window, core.reminder") == []
+
+def test_fast_path_commands_do_not_need_dateparser():
+    assert _loaded_after("from datetime import datetime\n"
+                         "from core import nlp_parser\n"
+                         "nlp_parser.process_nlp('họp nhóm lúc 9h sáng mai', datetime(2025, 3, 12, 8, 0))") == []
+
+def test_warm_up_loads_dateparser_without_filling_the_cache():
+    assert _loaded_after("from core import nlp_parser\n"
+                         "nlp_parser.warm_up()\n"
+                         "assert nlp_parser.PARSE_CACHE.stats()['size'] == 0") == ["dateparser"]
@@ -0,0 +1,69 @@
+"""TaskRunner với widget giả: after() chỉ ghi lại callback, test tự chạy chúng như vòng lặp Tk."""
+import threading
+import time
+
+from gui.task_runner import TaskRunner
+
+class FakeWidget:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+    def run_until_idle(self, timeout=5):
+        """Chạy các callback đã hẹn (trên luồng gọi, như luồng Tk) cho tới khi không còn gì hẹn."""
+        deadline = time.monotonic() + timeout
+        while self.scheduled:
+            assert time.monotonic() < deadline, "TaskRunner vẫn hẹn giờ sau khi hết việc"
+            callbacks, self.scheduled = self.scheduled, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.001)
+
+def test_work_runs_off_thread_and_callbacks_on_caller_thread():
+    widget = FakeWidget()
+    runner = TaskRunner(widget)
+    seen = {}
+    runner.submit("nlp", lambda: threading.get_ident(),
+                  on_success=lambda worker: seen.update(worker=worker, callback=threading.get_ident()),
+                  on_finally=lambda: seen.update(finally_=True))
+    assert runner.is_pending("nlp")
+
+    widget.run_until_idle()
+
+    assert seen["worker"] != threading.get_ident()
+    assert seen["callback"] == threading.get_ident()
+    assert seen["finally_"] and not runner.is_pending("nlp")
+    runner.shutdown()
+
+def test_newer_task_on_same_key_wins():
+    widget = FakeWidget()
+    runner = TaskRunner(widget, max_workers=1)
+    gate = threading.Event()
+    results = []
+    runner.submit("filter", lambda: gate.wait(5) and "cũ", on_success=results.append)
+    runner.submit("filter", lambda: "mới", on_success=results.append)
+    gate.set()
+
+    widget.run_until_idle()
+
+    assert results == ["mới"]
+    runner.shutdown()
+
+def test_error_goes_to_on_error_and_idle_runner_stops_polling():
+    widget = FakeWidget()
+    runner = TaskRunner(widget)
+    errors, finished = [], []
+
+    def fail():
+        raise ValueError("Thời gian bắt đầu không hợp lệ")
+
+    runner.submit("update", fail, on_success=lambda _: finished.append("success"),
+                  on_error=errors.append, on_finally=lambda: finished.append("finally"))
+    widget.run_until_idle()
+
+    assert [str(error) for error in errors] == ["Thời gian bắt đầu không hợp lệ"]
+    assert finished == ["finally"]
+    assert widget.scheduled == []
+    runner.shutdown()